@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compares the build time and the size of a Debian package with the
+different payload compression settings, using the native backend."""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).absolute().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# name, compression, level, threads
+SETTINGS = [
+        ("none", "none", None, 1),
+        ("gzip -9", "gzip", None, 1),
+        ("zstd -1", "zstd", 1, 1),
+        ("zstd -3 -T0", "zstd", 3, 0),
+        ("zstd -19 -T0", "zstd", 19, 0),
+        ("xz -6 -T1", "xz", 6, 1),
+        ("xz -6 -T0", "xz", 6, 0),
+        ]
+
+
+def getargs() -> argparse.Namespace:
+    """Parses the command line arguments.
+    :returns:
+        argparse.Namespace: The parsed arguments
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=64, help="Size of the package content in MiB")
+    parser.add_argument("--runs", type=int, default=3, help="Number of runs per setting")
+
+    return parser.parse_args()
+
+
+def write_payload(path: Path, size: int) -> None:
+    """Writes package content that compresses like typical binaries and
+    text, half of it is random data and half repeated text.
+
+    Args:
+        path (Path): Directory to write the files to.
+        size (int): Total size in MiB.
+
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    rand = random.Random(0)
+    words = [bytes(rand.choice(b"abcdefghijklmnopqrstuvwxyz")
+        for _ in range(rand.randint(2, 10))) for _ in range(2000)]
+
+    for num in range(size):
+        with open(path / "file{}".format(num), 'wb') as stream:
+            if num % 2:
+                stream.write(rand.getrandbits(8 << 20).to_bytes(1 << 20,
+                    "little"))
+            else:
+                text = b" ".join(rand.choice(words) for _ in range(200000))
+                stream.write(text[:1 << 20])
+
+
+def write_metadata(path: Path) -> None:
+    """Writes a project with one dist per compression setting. The package
+    files end up in the dists directory of the current working directory,
+    so the benchmark runs in the project directory.
+
+    Args:
+        path (Path): Directory of the project.
+
+    """
+    with open(path / "metadata.yaml", 'w') as stream:
+        stream.write("packages:\n    payload:\n        Version: 1.0.0\n\n"
+                "dists:\n")
+        for num, (_, compression, level, threads) in enumerate(SETTINGS):
+            stream.write("    setting{}:\n        backend: native\n"
+                    "        compression: {}\n        compression-threads: {}\n"
+                    .format(num, compression, threads))
+            if level is not None:
+                stream.write("        compression-level: {}\n".format(level))
+
+
+def main(args: argparse.Namespace) -> None:
+    """Builds the package with every setting and prints a summary.
+
+    """
+    from packateerlib import Dist, Metadata, Package, PkgCreater
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        os.environ["PACKATEER_CACHE"] = str(root / "cache")
+        # the package files are written to ./dists
+        os.chdir(str(root))
+        try:
+            write_payload(root / "packages" / "payload" / "files" /
+                    "alldists" / "usr" / "share" / "payload", args.size)
+            write_metadata(root)
+
+            meta = Metadata(str(root / "metadata.yaml"))
+            print("content: {} MiB, half random, half text".format(
+                args.size))
+            print("{:<16} {:>10} {:>12} {:>8}".format("compression",
+                "time (s)", "size (MiB)", "ratio"))
+
+            for num, (name, compression, _, _) in enumerate(SETTINGS):
+                pkg = Package("payload", Dist("setting{}".format(num), meta),
+                        meta)
+                pkgcreater = PkgCreater.for_package(pkg)
+                pkg.build()
+
+                times = list()
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    pkgcreater.build()
+                    times.append(time.perf_counter() - start)
+
+                size = pkgcreater.artifact.stat().st_size
+                print("{:<16} {:>10.2f} {:>12.1f} {:>8.2f}".format(name,
+                    min(times), size / (1 << 20), size / (args.size << 20)))
+
+        finally:
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    main(getargs())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Measures how packateer scales with the number of packages, dists and the
+depth of the dist hierarchy on a synthetic project. The results are compared
+with baselines that were measured earlier on the same machine, so that
+regressions are caught. Absolute times of different machines can't be
+compared, so the baselines are kept in the cache directory and not in the
+repository."""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+ROOT = Path(__file__).absolute().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from synthetic import add_arguments, generate, install_stubs
+from packateerlib.filecache import cache_home
+
+BASELINES = cache_home() / "benchmarks" / "baselines.json"
+
+
+def getargs() -> argparse.Namespace:
+    """Parses the command line arguments.
+    :returns:
+        argparse.Namespace: The parsed arguments
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    parser.add_argument("--jobs", type=int, default=4, help="Number of parallel jobs for the pipeline run")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per measurement")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed factor over the baseline before a measurement counts as regression")
+    parser.add_argument("--baselines", default=str(BASELINES), help="JSON file with the baseline times in ms of this machine (default: %(default)s)")
+    parser.add_argument("--update-baselines", action="store_true", help="Store the measured times as new baselines")
+
+    return parser.parse_args()
+
+
+def measure(func: Callable[[], None], runs: int,
+        before: Callable[[], None] = None) -> float:
+    """Runs a function several times and returns the fastest wall time,
+    which varies less with the load of the machine than the median.
+
+    Args:
+        func (callable): Function to measure.
+        runs (int): Number of runs.
+        before (callable): Called before every run, not measured.
+
+    Returns:
+        float: Fastest wall time in ms.
+
+    """
+    times = list()
+    for _ in range(runs):
+        if before:
+            before()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def run_benchmarks(args: argparse.Namespace, tmp: Path) -> Dict[str, float]:
+    """Generates the project and measures every step.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+        tmp (Path): Directory for the project and all output, the current
+            working directory is changed to the project in it.
+
+    Returns:
+        dict: Fastest time in ms per benchmark.
+
+    """
+    from packateerlib import Dist, Metadata, Package, PkgCreater
+    from packateerlib.overlay import assemble
+
+    metadata = generate(tmp / "project", args.packages, args.dists,
+            args.depth, args.files, args.filesize)
+    # package files and repositories are written to ./dists and ./repos
+    os.chdir(str(tmp / "project"))
+    install_stubs(tmp / "bin")
+    cache = tmp / "cache"
+    os.environ["PACKATEER_CACHE"] = str(cache)
+    os.environ["PATH"] = "{}:{}".format(tmp / "bin", os.environ["PATH"])
+
+    def drop_cache():
+        shutil.rmtree(str(cache), ignore_errors=True)
+
+    def resolve():
+        meta = Metadata(str(metadata))
+        dists = [Dist(name, meta) for name in meta.dists]
+        return [Package(pkgname, dist, meta) for dist in dists
+                for pkgname in meta.packages]
+
+    packages = resolve()
+    deepest = [pkg for pkg in packages if pkg.dist_name == "dist0"]
+    target = tmp / "workdir"
+
+    def clean_target():
+        shutil.rmtree(str(target), ignore_errors=True)
+
+    def assemble_all():
+        for pkg in deepest:
+            workdir = target / pkg.metadata['Name']
+            workdir.mkdir(parents=True)
+            assemble([pkg.filespath / dist for dist in reversed(pkg.dist_order)],
+                    workdir)
+
+    def arguments():
+        for pkg in packages:
+            PkgCreater.for_package(pkg).arguments
+
+    def pipeline():
+        result = subprocess.run([sys.executable, str(ROOT / "packateer"),
+            "-m", str(metadata), "-j", str(args.jobs), "-f"], cwd=str(tmp / "project"),
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        if result.returncode or result.stderr:
+            raise RuntimeError("Pipeline run failed: " + result.stderr)
+
+    return {
+            "resolve": measure(resolve, args.runs, before=drop_cache),
+            "resolve, from snapshot": measure(resolve, args.runs),
+            "assemble": measure(assemble_all, args.runs, before=clean_target),
+            "fpm arguments": measure(arguments, args.runs),
+            "pipeline": measure(pipeline, max(1, args.runs // 2)),
+            }
+
+
+def main(args: argparse.Namespace) -> bool:
+    """Runs all benchmarks, prints a summary and compares the results with
+    the baselines of the same project size.
+
+    """
+    config = "{}p-{}d-{}deep-{}x{}".format(args.packages, args.dists,
+            args.depth, args.files, args.filesize)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            results = run_benchmarks(args, Path(tmp))
+        finally:
+            os.chdir(cwd)
+
+    baselines = dict()
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as stream:
+            baselines = json.load(stream)
+    expected = baselines.get(config, dict())
+
+    print("project: {}".format(config))
+    ok = True
+    for name, ms in results.items():
+        status = "no baseline"
+        if name in expected:
+            regression = ms > expected[name] * args.tolerance
+            ok = ok and not regression
+            status = "{:+.0f}% {}".format((ms / expected[name] - 1) * 100,
+                    "REGRESSION" if regression else "ok")
+        print("{:<30} {:>10.1f} ms   {}".format(name, ms, status))
+
+    if args.update_baselines:
+        baselines[config] = {name: round(ms, 1) for name, ms in results.items()}
+        os.makedirs(os.path.dirname(args.baselines), exist_ok=True)
+        with open(args.baselines, 'w') as stream:
+            json.dump(baselines, stream, indent=4, sort_keys=True)
+            stream.write("\n")
+        print("Updated baselines in " + args.baselines)
+        return True
+
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(getargs()) else 1)
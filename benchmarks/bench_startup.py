@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Measures the startup time of packateer for a small invocation on a large
+metadata file, with and without the compiled metadata snapshot."""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).absolute().parent.parent
+
+# resolves one (dist, package) pair, like a `-d dist0 -p pkg0` run does
+RESOLVE = """
+from packateerlib import Dist, Metadata, Package
+meta = Metadata({path!r}, "dist0", "pkg0")
+Package("pkg0", Dist("dist0", meta), meta)
+"""
+
+
+def getargs() -> argparse.Namespace:
+    """Parses the command line arguments.
+    :returns:
+        argparse.Namespace: The parsed arguments
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packages", type=int, default=20000, help="Number of packages in the generated metadata file")
+    parser.add_argument("--dists", type=int, default=20, help="Number of dists in the generated metadata file")
+    parser.add_argument("--runs", type=int, default=10, help="Number of runs per measurement")
+    parser.add_argument("--target", type=float, default=100, help="Target startup time in ms for the snapshot case, on top of the interpreter startup")
+
+    return parser.parse_args()
+
+
+def write_metadata(path: Path, packages: int, dists: int) -> None:
+    """Writes a large metadata file.
+
+    Args:
+        path (Path): Path of the metadata file.
+        packages (int): Number of packages.
+        dists (int): Number of dists, each one is the parent of the next.
+
+    """
+    with open(path, 'w') as stream:
+        stream.write("vars:\n    pkgpath: ./packages/\n\npackages:\n")
+        for pkg in range(packages):
+            stream.write("    pkg{0}:\n        Version: 1.{0}.0\n"
+                    "        Depends: pkg{1}, libc6 (>= 2.4)\n"
+                    "        vars:\n            url: https://example.com/{0}\n"
+                    .format(pkg, pkg + 1))
+
+        stream.write("\ndists:\n")
+        for dist in range(dists):
+            stream.write("    dist{}:\n        distname: dist{}\n"
+                    .format(dist, dist))
+            if dist:
+                stream.write("        parent: dist{}\n".format(dist - 1))
+
+
+def measure(cmd: list, env: dict, runs: int, before=None) -> float:
+    """Runs a command several times and returns the median wall time.
+
+    Args:
+        cmd (list): Command to run.
+        env (dict): Environment of the command.
+        runs (int): Number of runs.
+        before (callable): Called before every run.
+
+    Returns:
+        float: Median wall time in ms.
+
+    """
+    times = list()
+    for _ in range(runs):
+        if before:
+            before()
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main(args: argparse.Namespace) -> bool:
+    """Runs all measurements and prints a summary.
+
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        metadata = Path(tmp) / "metadata.yaml"
+        write_metadata(metadata, args.packages, args.dists)
+        cache = Path(tmp) / "cache"
+
+        env = dict(os.environ, PYTHONPATH=str(ROOT), PACKATEER_CACHE=str(cache))
+        resolve = [sys.executable, "-c", RESOLVE.format(path=str(metadata))]
+
+        def drop_snapshots():
+            subprocess.run(["rm", "-rf", str(cache)], check=True)
+
+        results = [
+                ("python interpreter only", measure(
+                    [sys.executable, "-c", "pass"], env, args.runs)),
+                ("packateer --help", measure(
+                    [sys.executable, str(ROOT / "packateer"), "--help"],
+                    env, args.runs)),
+                ("resolve, parsing metadata", measure(
+                    resolve, env, args.runs, before=drop_snapshots)),
+                ("resolve, from snapshot", measure(resolve, env, args.runs)),
+                ]
+
+    print("metadata: {} packages, {} dists".format(args.packages, args.dists))
+    for name, ms in results:
+        print("{:<30} {:>8.1f} ms".format(name, ms))
+
+    # the interpreter startup itself is outside of packateer's control
+    overhead = results[-1][1] - results[0][1]
+    ok = overhead <= args.target
+    print("snapshot startup on top of the interpreter: {:.1f} ms, target "
+            "{:.0f} ms: {}".format(overhead, args.target,
+                "ok" if ok else "MISSED"))
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(getargs()) else 1)
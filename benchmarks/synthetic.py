@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Generates a synthetic packateer project and stub helper programs, so that
+benchmarks run offline and without fpm or reprepro installed."""
+
+import argparse
+import os
+from pathlib import Path
+
+# creates a minimal deb at the --package path, like fpm does
+FPM_STUB = """#!/usr/bin/env python3
+import io, sys, tarfile, time
+
+args = dict(zip(sys.argv[1:], sys.argv[2:]))
+control = "Package: {}\\nVersion: {}\\nArchitecture: {}\\n".format(
+        args.get("--name"), args.get("--version", "1.0"),
+        args.get("--architecture", "all")).encode()
+
+tar = io.BytesIO()
+with tarfile.open(fileobj=tar, mode="w:gz") as archive:
+    info = tarfile.TarInfo("./control")
+    info.size = len(control)
+    archive.addfile(info, io.BytesIO(control))
+
+with open(args["--package"], "wb") as deb:
+    deb.write(b"!<arch>\\n")
+    for name, data in (("debian-binary", b"2.0\\n"),
+            ("control.tar.gz", tar.getvalue()), ("data.tar.gz", b"")):
+        deb.write("{:<16}{:<12}0     0     100644  {:<10}`\\n".format(
+            name, int(time.time()), len(data)).encode())
+        deb.write(data + b"\\n" * (len(data) % 2))
+"""
+
+REPREPRO_STUB = """#!/bin/sh
+exit 0
+"""
+
+BUILDPKG = """#!/bin/sh
+echo "$Name" > "$workdir/built-by-{}"
+"""
+
+
+def getargs() -> argparse.Namespace:
+    """Parses the command line arguments.
+    :returns:
+        argparse.Namespace: The parsed arguments
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("target", help="Directory for the generated project")
+    add_arguments(parser)
+
+    return parser.parse_args()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the arguments that describe the size of a project.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser to add the arguments to.
+
+    """
+    parser.add_argument("--packages", type=int, default=50, help="Number of packages")
+    parser.add_argument("--dists", type=int, default=4, help="Number of concrete dists")
+    parser.add_argument("--depth", type=int, default=3, help="Number of abstract parent dists above every concrete dist")
+    parser.add_argument("--files", type=int, default=20, help="Number of files per package and layer")
+    parser.add_argument("--filesize", type=int, default=4096, help="Size of every file in bytes")
+
+
+def generate(root: Path, packages: int, dists: int, depth: int, files: int,
+        filesize: int) -> Path:
+    """Writes a project with a metadata file and package directories. Every
+    concrete dist has its own chain of abstract parents and every dist of a
+    chain has a control.yaml, a buildpkg script and a files layer for every
+    package. Like in every project, the package files and repositories are
+    written to the dists and repos directories of the working directory.
+
+    Args:
+        root (Path): Directory of the project, created if missing.
+        packages (int): Number of packages.
+        dists (int): Number of concrete dists.
+        depth (int): Number of abstract parents of every concrete dist.
+        files (int): Number of files per package and layer.
+        filesize (int): Size of every file in bytes.
+
+    Returns:
+        Path: Path of the metadata file.
+
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    layers = ["alldists"]
+    metadata = root / "metadata.yaml"
+
+    with open(metadata, 'w') as stream:
+        stream.write("vars:\n    pkgpath: {}\n\npackages:\n".format(
+            root / "packages"))
+        for pkg in range(packages):
+            stream.write("    pkg{0}:\n        Version: 1.{0}.0\n"
+                    "        Description: synthetic package {0}\n"
+                    "        vars:\n            index: {0}\n".format(pkg))
+
+        stream.write("\ndists:\n")
+        for dist in range(dists):
+            parent = None
+            for level in range(depth):
+                name = "base{}-{}".format(dist, level)
+                stream.write("    {}:\n        abstract: true\n".format(name))
+                if parent:
+                    stream.write("        parent: {}\n".format(parent))
+                layers.append(name)
+                parent = name
+
+            name = "dist{}".format(dist)
+            stream.write("    {0}:\n        distname: {0}\n".format(name))
+            if parent:
+                stream.write("        parent: {}\n".format(parent))
+            layers.append(name)
+
+    content = b"x" * filesize
+    for pkg in range(packages):
+        pkgpath = root / "packages" / "pkg{}".format(pkg)
+        for layer in layers:
+            metapath = pkgpath / "metadata" / layer
+            metapath.mkdir(parents=True, exist_ok=True)
+            (metapath / "control.yaml").write_text(
+                    "Depends: libc6 (>= 2.4)\nvars:\n    layer: {}\n"
+                    .format(layer))
+            (metapath / "buildpkg").write_text(BUILDPKG.format(layer))
+            (metapath / "buildpkg").chmod(0o755)
+
+            filespath = pkgpath / "files" / layer / "usr" / "share" / \
+                    "pkg{}".format(pkg)
+            filespath.mkdir(parents=True, exist_ok=True)
+            for num in range(files):
+                (filespath / "file{}".format(num)).write_bytes(content)
+
+    return metadata
+
+
+def install_stubs(bindir: Path) -> None:
+    """Writes stub fpm and reprepro programs.
+
+    Args:
+        bindir (Path): Directory for the programs, to be put on PATH.
+
+    """
+    bindir.mkdir(parents=True, exist_ok=True)
+    for name, content in (("fpm", FPM_STUB), ("reprepro", REPREPRO_STUB)):
+        (bindir / name).write_text(content)
+        (bindir / name).chmod(0o755)
+
+
+if __name__ == "__main__":
+    args = getargs()
+    path = generate(Path(args.target).absolute(), args.packages, args.dists,
+            args.depth, args.files, args.filesize)
+    install_stubs(Path(args.target).absolute() / "bin")
+    print("Generated {}, put {} on PATH to use the stub programs".format(
+        path, Path(args.target).absolute() / "bin"))
@@ -1,5 +1,31 @@
-from .metadata import Metadata
-from packateerlib.dist import Dist
-from packateerlib.package import Package
-from .pkgcreater import PkgCreater
-from .repocreater import RepoCreater
+import importlib
+
+# modules are imported on first use to keep the startup of the command fast
+_modules = {
+        'Metadata' : '.metadata',
+        'Dist' : '.dist',
+        'Package' : '.package',
+        'PkgCreater' : '.pkgcreater',
+        'DebCreater' : '.deb',
+        'RepoCreater' : '.repocreater',
+        'AptRepoCreater' : '.aptrepo',
+        'RpmRepoCreater' : '.rpmrepo',
+        'Builder' : '.builder',
+        'BuildError' : '.builder',
+        }
+
+__all__ = list(_modules)
+
+
+def __getattr__(name: str):
+    if name not in _modules:
+        raise AttributeError("module {!r} has no attribute {!r}"
+                .format(__name__, name))
+
+    value = getattr(importlib.import_module(_modules[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,164 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from packateerlib import Dist, Metadata
+from packateerlib.filecache import load_yaml
+
+# directories of a package that only contain build output
+OUTPUT_DIRS = ("workdir", "storage", "sources")
+
+
+def affected_pairs(conf: Metadata, dists: List[Dist],
+        paths: Iterable[str]) -> List[Tuple[Dist, str]]:
+    """Maps changed files of the package directories to the (dist, package)
+    pairs that have to be rebuilt. A change in the metadata or files layer of
+    a dist affects that dist and all dists that inherit from it. Changes of
+    the metadata file itself are not covered.
+
+    Args:
+        conf (Metadata): Metadata configuration of this project.
+        dists (list): Distributions that are built.
+        paths (iterable): Changed, created or deleted files and directories.
+
+    Returns:
+        list: The affected pairs, in the order of dists and packages.
+
+    """
+    pkgpath = conf.pkgpath.absolute()
+    changed = set()
+
+    for path in paths:
+        try:
+            parts = Path(path).absolute().relative_to(pkgpath).parts
+        except ValueError:
+            continue # not part of a package
+
+        if not parts:
+            # the whole package directory, all layers of all packages
+            changed.add((None, None))
+        elif len(parts) > 1 and parts[1] in OUTPUT_DIRS:
+            continue
+        elif len(parts) > 2 and parts[1] in ("metadata", "files"):
+            changed.add((parts[0], parts[2]))
+        else:
+            # a package directory itself or other content, all layers
+            changed.add((parts[0], None))
+
+    return [(dist, pkgname) for dist in dists
+            for pkgname in dict.fromkeys(conf.packages)
+            if (None, None) in changed or (pkgname, None) in changed
+            or any((pkgname, layer) in changed for layer in dist.order)]
+
+
+def metadata_pairs(conf: Metadata, dists: List[Dist],
+        old: Dict[str, Any]) -> List[Tuple[Dist, str]]:
+    """Maps the changes of the metadata file to the (dist, package) pairs
+    that have to be rebuilt. Changed vars or other top level keys affect
+    everything, a changed package entry all dists of the package and a
+    changed dist entry that dist and all dists that inherit from it.
+
+    Args:
+        conf (Metadata): Metadata configuration of this project.
+        dists (list): Distributions that are built.
+        old (dict): Earlier data of the metadata file, None if it didn't
+            exist.
+
+    Returns:
+        list: The affected pairs, in the order of dists and packages.
+
+    """
+    new = conf.data
+    if not isinstance(old, dict):
+        return [(dist, pkgname) for dist in dists
+                for pkgname in dict.fromkeys(conf.packages)]
+
+    def section(data: Dict[str, Any], name: str) -> Dict[str, Any]:
+        return data.get(name) or dict()
+
+    # (layer, package), None for all of them
+    changed: Set[Tuple[str, str]] = set()
+    for key in set(old) | set(new):
+        if key not in ("packages", "dists") and old.get(key) != new.get(key):
+            changed.add((None, None))
+
+    old_packages, new_packages = section(old, "packages"), section(new,
+            "packages")
+    for pkgname in set(old_packages) | set(new_packages):
+        if old_packages.get(pkgname) != new_packages.get(pkgname):
+            changed.add((None, pkgname))
+
+    old_dists, new_dists = section(old, "dists"), section(new, "dists")
+    for distname in set(old_dists) | set(new_dists):
+        old_dist = dict(old_dists.get(distname) or dict())
+        new_dist = dict(new_dists.get(distname) or dict())
+        old_overrides = old_dist.pop("packages", None) or dict()
+        new_overrides = new_dist.pop("packages", None) or dict()
+        if old_dist != new_dist:
+            changed.add((distname, None))
+        for pkgname in set(old_overrides) | set(new_overrides):
+            if old_overrides.get(pkgname) != new_overrides.get(pkgname):
+                changed.add((distname, pkgname))
+
+    return [(dist, pkgname) for dist in dists
+            for pkgname in dict.fromkeys(conf.packages)
+            if any((layer, name) in changed
+                for layer in [None] + dist.order for name in (None, pkgname))]
+
+
+def _git(args: List[str], cwd: Path) -> bytes:
+    """Runs a git command.
+
+    Raises:
+        ValueError: If the command fails, like for an unknown revision.
+
+    """
+    result = subprocess.run(["git"] + args, cwd=str(cwd),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode:
+        raise ValueError("git {} failed: {}".format(args[0],
+            result.stderr.decode(errors="replace").strip()))
+    return result.stdout
+
+
+def changed_pairs(conf: Metadata, dists: List[Dist],
+        revision: str) -> List[Tuple[Dist, str]]:
+    """Finds the (dist, package) pairs affected by the changes since a git
+    revision, including uncommitted and untracked files.
+
+    Args:
+        conf (Metadata): Metadata configuration of this project.
+        dists (list): Distributions that are built.
+        revision (str): Git revision to compare with, like origin/master.
+
+    Returns:
+        list: The affected pairs, in the order of dists and packages.
+
+    Raises:
+        ValueError: If git fails, for example outside of a repository.
+
+    """
+    cwd = conf.path.absolute().parent
+    root = Path(os.fsdecode(_git(["rev-parse", "--show-toplevel"],
+        cwd).strip()))
+    paths = [root / os.fsdecode(path) for path in
+            _git(["diff", "--name-only", "--no-renames", "-z", revision,
+                "--"], root).split(b"\0") +
+            _git(["ls-files", "--others", "--exclude-standard", "-z"], root)
+                .split(b"\0") if path]
+
+    metapath = conf.path.absolute().resolve()
+    try:
+        relpath = metapath.relative_to(root.resolve())
+        old = load_yaml(_git(["show", "{}:{}".format(revision,
+            relpath.as_posix())], root))
+    except ValueError:
+        old = None # not part of the revision
+
+    affected = set(affected_pairs(conf, dists, paths))
+    if metapath in {path.resolve() for path in paths}:
+        affected.update(metadata_pairs(conf, dists, old))
+    return [(dist, pkgname) for dist in dists
+            for pkgname in dict.fromkeys(conf.packages)
+            if (dist, pkgname) in affected]
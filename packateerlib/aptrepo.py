@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import lzma
+import os
+import sys
+from email.utils import formatdate
+from glob import glob
+from pathlib import Path
+from typing import Dict, List
+
+from packateerlib import Dist, Metadata, RepoCreater
+from packateerlib.deb import parse_control, read_control
+from packateerlib.indexcache import IndexCache
+from packateerlib.trace import run
+
+
+class AptRepoCreater(RepoCreater):
+
+    """Creates an apt repository without reprepro by writing the Packages and
+    Release indices directly."""
+
+    _checksums: Dict[str, str] = {
+            "MD5Sum" : "md5",
+            "SHA1" : "sha1",
+            "SHA256" : "sha256",
+            }
+
+    def __init__(self, dist: Dist, conf: Metadata) -> None:
+        """Initializes all variables that are needed to create the Repository.
+
+        Args:
+            dist (Dist): Distribution to build the repository for.
+            conf (Metadata): Metadata configuration of this project.
+
+
+        """
+        super().__init__(dist=dist, conf=conf)
+        self._cache = IndexCache(self._repopath / "db" / "packages.json")
+
+    def _scan(self, deb: str) -> Dict[str, str]:
+        """Extracts the control stanza and checksums of a package, unchanged
+        packages are served from the cache.
+
+        Args:
+            deb (str): Path to the package file.
+
+        Returns:
+            dict: The control stanza, size and checksums of the package.
+
+        """
+        entry = self._cache.get(deb)
+        if entry:
+            return entry
+
+        hashes = {field: hashlib.new(name)
+                for field, name in self._checksums.items()}
+        with open(deb, 'rb') as stream:
+            for chunk in iter(lambda: stream.read(1 << 20), b""):
+                for hasher in hashes.values():
+                    hasher.update(chunk)
+
+        entry = {field: hasher.hexdigest() for field, hasher in hashes.items()}
+        entry['Size'] = str(os.path.getsize(deb))
+        entry['control'] = read_control(deb).strip("\n")
+        self._cache.put(deb, entry)
+        return entry
+
+    def _write_index(self, path: Path, content: bytes) -> List[Path]:
+        """Writes an index file in plain and compressed form.
+
+        Args:
+            path (Path): Path to the uncompressed index.
+            content (bytes): Content of the index.
+
+        Returns:
+            list: Paths to all written files.
+
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        variants = {
+                path : content,
+                path.with_name(path.name + ".gz") :
+                    gzip.compress(content, mtime=0),
+                path.with_name(path.name + ".xz") : lzma.compress(content),
+                }
+
+        for variant, data in variants.items():
+            variant.write_bytes(data)
+        return list(variants)
+
+    def _write_release(self, distdir: Path, indices: List[Path]) -> None:
+        """Writes the Release file and signs it when a key is configured.
+
+        Args:
+            distdir (Path): Directory of the distribution inside the repo.
+            indices (list): Paths to all index files.
+
+        """
+        release = dict(self._repodata)
+        release.pop('SignWith', None)
+        release['Date'] = formatdate(usegmt=True)
+
+        lines = ["{}: {}".format(key, val) for key, val in release.items()]
+        for field, name in self._checksums.items():
+            lines.append(field + ":")
+            for index in indices:
+                data = index.read_bytes()
+                lines.append(" {} {:>16} {}".format(
+                    hashlib.new(name, data).hexdigest(), len(data),
+                    index.relative_to(distdir)))
+
+        release_file = distdir / "Release"
+        release_file.write_text("\n".join(lines) + "\n")
+
+        if self._repodata.get('SignWith'):
+            gpg = ["gpg", "--batch", "--yes", "--local-user",
+                    self._repodata['SignWith']]
+            run(gpg + ["--armor", "--detach-sign", "--output",
+                str(distdir / "Release.gpg"), str(release_file)], check=True)
+            run(gpg + ["--clearsign", "--output", str(distdir / "InRelease"),
+                str(release_file)], check=True)
+        else:
+            # would no longer match the Release file
+            for name in ("Release.gpg", "InRelease"):
+                if (distdir / name).exists():
+                    (distdir / name).unlink()
+
+    def build(self, force: bool = False) -> None:
+        """Creates the repository. Without configured architectures the
+        repository has the default ones and every architecture that was
+        built, packages of other architectures are skipped with a warning.
+
+        Args:
+            force (bool): Read all packages again instead of using the cached
+                control stanzas and checksums.
+
+        """
+        if force:
+            self._cache.clear()
+
+        codename = self._repodata['Codename']
+        components = self._repodata['Components'].split()
+        architectures = self._repodata['Architectures'].split()
+        distdir = self._repopath / "dists" / codename
+
+        # every package goes into the first component of the repo
+        pool = self._repopath / "pool" / components[0]
+        stanzas: Dict[str, List[str]] = {arch: list() for arch in architectures}
+        published = set()
+
+        debs = [(deb, self._scan(deb))
+                for deb in sorted(glob(str(self._dist.distpath / "*.deb")))]
+        if 'architectures' not in self._dist.metadata:
+            for _, entry in debs:
+                arch = parse_control(entry['control']).get('Architecture')
+                if arch and arch != "all" and arch not in architectures:
+                    architectures.append(arch)
+                    stanzas[arch] = list()
+            self._repodata['Architectures'] = " ".join(architectures)
+
+        for deb, entry in debs:
+            arch = parse_control(entry['control']).get('Architecture')
+            if arch != "all" and arch not in architectures:
+                print("Skipping {}: architecture {} is not one of {}".format(
+                    deb, arch, " ".join(architectures)), file=sys.stderr)
+                continue
+
+            poolfile = pool / os.path.basename(deb)
+            self._publish(deb, poolfile)
+            published.add(poolfile.name)
+
+            stanza = entry['control'] + "\n"
+            stanza += "Filename: {}\n".format(
+                    poolfile.relative_to(self._repopath))
+            stanza += "".join("{}: {}\n".format(field, entry[field])
+                    for field in ['Size'] + list(self._checksums))
+
+            for cur_arch in architectures:
+                if arch in ("all", cur_arch):
+                    stanzas[cur_arch].append(stanza)
+
+        # drop packages that are no longer built
+        if pool.exists():
+            for poolfile in pool.iterdir():
+                if poolfile.name not in published:
+                    poolfile.unlink()
+
+        indices: List[Path] = list()
+        for component in components:
+            for arch in architectures:
+                content = "\n".join(stanzas[arch]) \
+                        if component == components[0] else ""
+                indices.extend(self._write_index(distdir / component /
+                    "binary-{}".format(arch) / "Packages", content.encode()))
+
+        self._write_release(distdir, indices)
+        self._cache.save()
+
@@ -0,0 +1,248 @@
+import os
+import shutil
+import tempfile
+import urllib.error
+import urllib.request
+from contextlib import suppress
+from pathlib import Path
+from typing import List, Tuple
+
+
+class ArtifactCacheError(Exception):
+
+    """Raised when the artifact cache can't be read or written."""
+
+
+def _put_file(src: Path, dst: Path) -> None:
+    """Copies a file so that readers never see it half written."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(dst.parent), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as stream, open(str(src), 'rb') as source:
+            shutil.copyfileobj(source, stream, 1 << 20)
+        os.replace(tmp, str(dst))
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+class LocalStore(object):
+
+    """Artifact cache in a directory, which may be on a shared filesystem.
+    When it grows beyond its size cap, the least recently used package files
+    are deleted."""
+
+    def __init__(self, root: Path, max_size: int = None) -> None:
+        """Initializes the store.
+
+        Args:
+            root (Path): Directory of the store.
+            max_size (int): Size cap in bytes, unlimited if None.
+
+        """
+        self._root = Path(root)
+        self._max_size = max_size
+
+    def path(self, key: str) -> Path:
+        """Path of a package file inside the store.
+
+        Args:
+            key (str): Build key of the package file.
+
+        Returns:
+            Path: Where the package file is stored.
+
+        """
+        return self._root / key[:2] / key
+
+    def get(self, key: str, artifact: Path) -> bool:
+        """Puts a cached package file at the artifact path.
+
+        Args:
+            key (str): Build key of the package file.
+            artifact (Path): Where to put the package file.
+
+        Returns:
+            bool: False if the store doesn't have the package file.
+
+        """
+        path = self.path(key)
+        try:
+            # the modification time records the last use
+            os.utime(str(path))
+        except FileNotFoundError:
+            return False
+        try:
+            _put_file(path, artifact)
+        except FileNotFoundError:
+            return False # evicted meanwhile
+        return True
+
+    def put(self, key: str, artifact: Path) -> None:
+        """Stores a package file and evicts old ones beyond the size cap.
+
+        Args:
+            key (str): Build key of the package file.
+            artifact (Path): The package file.
+
+        """
+        _put_file(artifact, self.path(key))
+        if self._max_size is not None:
+            self.evict(self._max_size)
+
+    def _entries(self) -> List[Tuple[int, int, Path]]:
+        """Last use, size and path of all package files."""
+        entries = list()
+        with suppress(FileNotFoundError):
+            for subdir in self._root.iterdir():
+                for path in subdir.iterdir():
+                    if path.name.startswith("."):
+                        continue # being written
+                    with suppress(FileNotFoundError):
+                        stat = path.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def evict(self, max_size: int) -> None:
+        """Deletes the least recently used package files until the store is
+        at most max_size bytes.
+
+        Args:
+            max_size (int): Size in bytes.
+
+        """
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in entries:
+            if size <= max_size:
+                break
+            with suppress(FileNotFoundError):
+                path.unlink()
+            size -= entry_size
+
+
+class HttpStore(object):
+
+    """Artifact cache on an HTTP server that answers GET and PUT requests for
+    <url>/<key>, like nginx with WebDAV. The server is responsible for the
+    size cap."""
+
+    def __init__(self, url: str, timeout: float = 30) -> None:
+        """Initializes the store.
+
+        Args:
+            url (str): Base url of the store.
+            timeout (float): Timeout of every request in seconds.
+
+        """
+        self._url = url.rstrip("/")
+        self._timeout = timeout
+
+    def get(self, key: str, artifact: Path) -> bool:
+        """Downloads a cached package file to the artifact path.
+
+        Args:
+            key (str): Build key of the package file.
+            artifact (Path): Where to put the package file.
+
+        Returns:
+            bool: False if the store doesn't have the package file.
+
+        """
+        fd, tmp = tempfile.mkstemp(dir=str(artifact.parent), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as stream, urllib.request.urlopen(
+                    "{}/{}".format(self._url, key),
+                    timeout=self._timeout) as response:
+                shutil.copyfileobj(response, stream, 1 << 20)
+            os.replace(tmp, str(artifact))
+            return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return False
+            raise
+        finally:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp)
+
+    def put(self, key: str, artifact: Path) -> None:
+        """Uploads a package file.
+
+        Args:
+            key (str): Build key of the package file.
+            artifact (Path): The package file.
+
+        """
+        with open(str(artifact), 'rb') as stream:
+            request = urllib.request.Request("{}/{}".format(self._url, key),
+                    data=stream, method="PUT", headers={
+                        'Content-Length': str(os.fstat(stream.fileno())
+                            .st_size),
+                        'Content-Type': "application/octet-stream"})
+            urllib.request.urlopen(request, timeout=self._timeout).close()
+
+
+class ArtifactCache(object):
+
+    """Cache for finished package files, shared by all machines that build
+    the same packages. Package files are stored by their build key, which
+    covers the resolved metadata and vars, the input files and the arguments
+    of the package creator. Errors of the store are reported as
+    ArtifactCacheError, so builds can carry on without the cache."""
+
+    def __init__(self, location: str, max_size: int = None) -> None:
+        """Opens a store.
+
+        Args:
+            location (str): Directory or http(s) url of the store.
+            max_size (int): Size cap in bytes of a directory store.
+
+        """
+        self._location = location
+        if location.startswith(("http://", "https://")):
+            self._store = HttpStore(location)
+        else:
+            self._store = LocalStore(Path(location), max_size)
+
+    @property
+    def location(self) -> str:
+        """Directory or url of the store."""
+        return self._location
+
+    def get(self, key: str, artifact: Path) -> bool:
+        """Puts a cached package file at the artifact path.
+
+        Args:
+            key (str): Build key of the package.
+            artifact (Path): Where to put the package file.
+
+        Returns:
+            bool: True on a cache hit.
+
+        Raises:
+            ArtifactCacheError: If the store can't be read.
+
+        """
+        try:
+            return self._store.get(key, Path(artifact))
+        except (OSError, ValueError) as e:
+            raise ArtifactCacheError("Can't read the artifact cache {}: {}"
+                    .format(self._location, e)) from e
+
+    def put(self, key: str, artifact: Path) -> None:
+        """Stores a freshly built package file.
+
+        Args:
+            key (str): Build key of the package.
+            artifact (Path): The package file.
+
+        Raises:
+            ArtifactCacheError: If the store can't be written.
+
+        """
+        try:
+            self._store.put(key, Path(artifact))
+        except (OSError, ValueError) as e:
+            raise ArtifactCacheError("Can't write the artifact cache {}: {}"
+                    .format(self._location, e)) from e
@@ -0,0 +1,379 @@
+import os
+import sys
+import threading
+from contextlib import suppress
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+        wait)
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from packateerlib import Dist, Metadata, Package, PkgCreater
+from packateerlib.artifactcache import ArtifactCache, ArtifactCacheError
+from packateerlib.depgraph import DepGraph
+from packateerlib.fingerprint import (build_key, fingerprint, is_current,
+        write_manifest)
+from packateerlib.jobserver import JobServer
+from packateerlib.overlay import materialize
+from packateerlib.sources import SourceError, check_sources
+from packateerlib.trace import span
+
+
+class BuildError(Exception):
+
+    """Raised after a run in which at least one package failed to build."""
+
+    def __init__(self, failures: Dict[Tuple[str, str], str]) -> None:
+        """Collects all failed builds of a run.
+
+        Args:
+            failures (dict): Error message per (dist, package) pair.
+
+        """
+        self.failures = failures
+        super().__init__("{} package build(s) failed: {}".format(
+            len(failures),
+            ", ".join("{}/{}".format(*pair) for pair in failures)))
+
+
+class Builder(object):
+
+    """Builds all packages of one or more distributions, optionally in
+    parallel. Packages are built after the packages of the same run they
+    depend on."""
+
+    def __init__(
+            self,
+            conf: Metadata,
+            dists: List[Dist],
+            jobs: int = 1,
+            logpath: Path = None,
+            force: bool = False,
+            pairs: List[Tuple[Dist, str]] = None,
+            remote=None,
+            keep_workdirs: bool = False,
+            cache: ArtifactCache = None
+            ) -> None:
+        """Collects all (dist, package) pairs that have to be built.
+
+        Args:
+            conf (Metadata): Metadata configuration of this project.
+            dists (list): Distributions to build the packages for.
+            jobs (int): Number of packages to build at the same time.
+            logpath (Path): Directory for the per package build logs, only
+                used when building in parallel.
+            force (bool): Rebuild packages even if their build inputs didn't
+                change since the last build.
+            pairs (list): Only build these (dist, package name) pairs instead
+                of all packages of the dists.
+            remote (Coordinator): Builds the packages on workers instead of
+                locally, jobs is the number of packages handed out at the
+                same time.
+            keep_workdirs (bool): Keep the workdirs after the package files
+                were created, instead of deleting them in the background.
+            cache (ArtifactCache): Takes package files with the same build
+                inputs from this cache instead of building them and stores
+                the built ones.
+
+        """
+        self._conf = conf
+        self._dists = dists
+        self._jobs = max(1, jobs)
+        self._logpath = logpath if logpath else Path("./logs")
+        self._force = force
+        self._remote = remote
+        self._keep_workdirs = keep_workdirs
+        self._cache = cache
+        self._print_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+        # every pair is built only once, even if it was requested twice
+        self._pairs: List[Tuple[Dist, str]] = list()
+        if pairs is not None:
+            self._pairs = list(dict.fromkeys(pairs))
+        else:
+            for dist in dists:
+                for pkgname in dict.fromkeys(conf.packages):
+                    self._pairs.append((dist, pkgname))
+
+        self._failures: Dict[Tuple[str, str], str] = dict()
+        self._jobserver: JobServer = None
+        self._builds: Dict[str, Tuple[str, str, Path, threading.Event]] = dict()
+        self._source_errors: Dict[str, str] = dict()
+
+    @property
+    def failures(self) -> Dict[Tuple[str, str], str]:
+        """Error messages of all failed (dist, package) pairs."""
+        return self._failures
+
+    def failed(self, dist: Dist) -> bool:
+        """Checks if any package of the given distribution failed to build.
+
+        Args:
+            dist (Dist): Distribution to check.
+
+        Returns:
+            bool: True if at least one package of the dist failed.
+
+        """
+        return any(distname == dist.name for distname, _ in self._failures)
+
+    def build(self) -> None:
+        """Builds all packages and collects the failed ones.
+
+        Raises:
+            BuildError: If at least one package failed to build.
+
+        """
+        # shared output directories are created upfront, not by the jobs
+        for dist in self._dists:
+            dist.distpath.mkdir(parents=True, exist_ok=True)
+            if self._jobs > 1:
+                (self._logpath / dist.name).mkdir(parents=True, exist_ok=True)
+
+        self._prefetch()
+
+        # make, cmake and ninja of all build scripts share the jobs
+        self._jobserver = JobServer(self._jobs)
+        try:
+            self._schedule(DepGraph(self._conf, self._pairs))
+        finally:
+            self._jobserver.close()
+
+        if self._failures:
+            raise BuildError(self._failures)
+
+    def _schedule(self, graph: DepGraph) -> None:
+        """Builds every pair after all pairs it depends on. Independent
+        pairs are built in parallel, pairs whose dependencies failed or
+        depend on each other are not built at all.
+
+        Args:
+            graph (DepGraph): Dependencies between the pairs.
+
+        """
+        pending = {node: set(graph.dependencies(node)) for node in graph.nodes}
+
+        def skip(node: Tuple[Dist, str], reason: str) -> None:
+            todo = [(node, reason)]
+            while todo:
+                node, reason = todo.pop()
+                if pending.pop(node, None) is None:
+                    continue
+                dist, pkgname = node
+                self._failures[(dist.name, pkgname)] = reason
+                self._print("Skipped: {}/{}: {}".format(dist.name, pkgname,
+                    reason), file=sys.stderr)
+                todo.extend((dependent, "Dependency failed: {}/{}".format(
+                    dist.name, pkgname)) for dependent in graph.dependents(node))
+
+        for cycle in graph.cycles():
+            names = " -> ".join(pkgname for _, pkgname in cycle + cycle[:1])
+            for node in cycle:
+                skip(node, "Dependency cycle: " + names)
+
+        ready = deque(node for node, deps in pending.items() if not deps)
+        running: Dict[Future, Tuple[Dist, str]] = dict()
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            while ready or running:
+                while ready and len(running) < self._jobs:
+                    node = ready.popleft()
+                    if node in pending:
+                        running[executor.submit(self._build_pair, *node)] = node
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    pending.pop(node, None)
+                    dist, pkgname = node
+                    if (dist.name, pkgname) in self._failures:
+                        for dependent in graph.dependents(node):
+                            skip(dependent, "Dependency failed: {}/{}"
+                                    .format(dist.name, pkgname))
+                        continue
+
+                    for dependent in graph.dependents(node):
+                        deps = pending.get(dependent)
+                        if deps is not None:
+                            deps.discard(node)
+                            if not deps:
+                                ready.append(dependent)
+
+    def _prefetch(self) -> None:
+        """Downloads the sources of all packages at the same time, before
+        any package is built. Failed downloads are reported by the packages
+        that need them.
+
+        """
+        sources = list()
+        for dist, pkgname in self._pairs:
+            with suppress(Exception): # reported when building the package
+                declared = self._conf.resolver.package_vars(
+                        pkgname, dist.order).get('sources') or list()
+                check_sources(declared)
+                sources.extend(declared)
+
+        if sources:
+            with span("sources", "sources"):
+                self._source_errors = self._conf.sources.prefetch(sources)
+
+    def _print(self, *args, **kwargs) -> None:
+        """Prints without interleaving the output of parallel jobs."""
+        with self._print_lock:
+            print(*args, **kwargs)
+
+    def _build_pair(self, dist: Dist, pkgname: str) -> None:
+        """Builds and creates a single package, remembering failures. Packages
+        whose build inputs didn't change since the last build are skipped.
+
+        Args:
+            dist (Dist): Distribution to build the package for.
+            pkgname (str): Name of the package.
+
+        """
+        log = None
+        built = None
+        pair = dict(dist=dist.name, package=pkgname)
+        try:
+            with span("package", "package", **pair):
+                with span("resolve", "config", **pair):
+                    pkg = Package(pkgname=pkgname, dist=dist, conf=self._conf)
+                    pkgcreater = PkgCreater.for_package(pkg)
+                for source in pkg.sources:
+                    error = self._source_errors.get(source['sha256'].lower())
+                    if error:
+                        raise SourceError(error)
+
+                with span("fingerprint", "fingerprint", **pair):
+                    digest = fingerprint(pkg, pkgcreater)
+                if not self._force and is_current(pkgcreater.artifact, digest):
+                    self._print("Up to date: {}/{}".format(dist.name, pkgname))
+                    return
+
+                # dists with the same build inputs share one package file
+                key = build_key(pkg, pkgcreater)
+                with self._lock:
+                    leader = self._builds.setdefault(key, (dist.name, pkgname,
+                        pkgcreater.artifact, threading.Event()))
+                if leader[:2] != (dist.name, pkgname):
+                    self._print("Sharing: {}/{} from {}/{}".format(dist.name,
+                        pkgname, *leader[:2]))
+                    with span("share", "share", **pair):
+                        self._share(leader, pkgcreater.artifact)
+                    write_manifest(pkgcreater.artifact, digest)
+                    return
+                built = leader[3]
+
+                # a package file shared with other dists must not be
+                # overwritten in place
+                with suppress(FileNotFoundError):
+                    if pkgcreater.artifact.stat().st_nlink > 1:
+                        pkgcreater.artifact.unlink()
+
+                if self._from_cache(key, pkgcreater.artifact, pair):
+                    self._print("Cached: {}/{}".format(dist.name, pkgname))
+                    write_manifest(pkgcreater.artifact, digest)
+                    return
+
+                self._print("Building: {}/{}".format(dist.name, pkgname))
+                if self._jobs > 1:
+                    log = open(self._logpath / dist.name / "{}.log"
+                            .format(pkgname), 'w')
+
+                with self._jobserver.slot():
+                    if self._remote:
+                        with span("remote", "remote", **pair) as current:
+                            self._remote.build(pkg, pkgcreater, log=log)
+                            current['bytes'] += (pkgcreater.artifact.stat()
+                                    .st_size)
+                    else:
+                        pkg.build(log=log, jobserver=self._jobserver)
+                        with span("create", "create", **pair) as current:
+                            pkgcreater.build(log=log)
+                            current['bytes'] += (pkgcreater.artifact.stat()
+                                    .st_size)
+                        if not self._keep_workdirs:
+                            pkg.clean()
+                write_manifest(pkgcreater.artifact, digest)
+                self._to_cache(key, pkgcreater.artifact, pair)
+        except Exception as e:
+            self._failures[(dist.name, pkgname)] = str(e)
+            self._print("Failed: {}/{}: {}".format(dist.name, pkgname, e),
+                    file=sys.stderr)
+            if log:
+                self._print("See the build log: " + log.name, file=sys.stderr)
+        finally:
+            if built:
+                built.set()
+            if log:
+                log.close()
+
+    def _from_cache(self, key: str, artifact: Path, pair: Dict[str, str]
+            ) -> bool:
+        """Takes a package file from the artifact cache.
+
+        Args:
+            key (str): Build key of the package.
+            artifact (Path): Where to put the package file.
+            pair (dict): Dist and package name for the trace.
+
+        Returns:
+            bool: True if the package file was in the cache.
+
+        """
+        if not self._cache:
+            return False
+        with span("cache get", "cache", **pair) as current:
+            try:
+                found = self._cache.get(key, artifact)
+            except ArtifactCacheError as e:
+                self._print(e, file=sys.stderr)
+                return False
+            if found:
+                current['bytes'] += artifact.stat().st_size
+        return found
+
+    def _to_cache(self, key: str, artifact: Path, pair: Dict[str, str]
+            ) -> None:
+        """Stores a built package file in the artifact cache, if there is
+        one. Errors are only reported, the package file is built anyway.
+
+        Args:
+            key (str): Build key of the package.
+            artifact (Path): The package file.
+            pair (dict): Dist and package name for the trace.
+
+        """
+        if not self._cache:
+            return
+        with span("cache put", "cache", **pair):
+            try:
+                self._cache.put(key, artifact)
+            except ArtifactCacheError as e:
+                self._print(e, file=sys.stderr)
+
+    def _share(self, leader: Tuple[str, str, Path, threading.Event],
+            artifact: Path) -> None:
+        """Waits until another dist built the same package file and puts it
+        at the artifact path of this dist, hardlinked if possible.
+
+        Args:
+            leader (tuple): Dist and package name, artifact path and done
+                event of the build to share.
+            artifact (Path): Path to put the package file at.
+
+        Raises:
+            RuntimeError: If the shared build failed.
+
+        """
+        distname, pkgname, source, done = leader
+        done.wait()
+        if (distname, pkgname) in self._failures:
+            raise RuntimeError("Same build as {}/{}, which failed".format(
+                distname, pkgname))
+
+        tmp = artifact.with_name(artifact.name + ".tmp")
+        with suppress(FileNotFoundError):
+            os.unlink(str(tmp))
+        materialize(source, tmp, hardlink=True)
+        os.replace(str(tmp), str(artifact))
@@ -0,0 +1,191 @@
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from packateerlib import Dist, Metadata, Package, PkgCreater, RepoCreater
+from packateerlib.resolver import DistError
+
+# package compressions of the native backend that run an external program
+_compressors = ("xz", "zstd")
+
+
+class CheckError(Exception):
+
+    """Raised when the configuration has problems that would fail builds."""
+
+    def __init__(self, problems: List[str]) -> None:
+        """Collects all problems.
+
+        Args:
+            problems (list): Description of every problem.
+
+        """
+        self.problems = problems
+        super().__init__("{} problem(s) found:\n{}".format(len(problems),
+            "\n".join("  " + problem for problem in problems)))
+
+
+class Checker(object):
+
+    """Validates all (dist, package) pairs of a run before anything is
+    built, so that configuration errors show up at once instead of after
+    the first packages were built. The pairs are resolved in parallel, all
+    pairs of a package in the same job so they share the memoized parent
+    data."""
+
+    def __init__(self, conf: Metadata, jobs: int = 8) -> None:
+        """Initializes the checker.
+
+        Args:
+            conf (Metadata): Metadata configuration of this project, with the
+                dists and packages to check.
+            jobs (int): Number of packages to check at the same time.
+
+        """
+        self._conf = conf
+        self._jobs = max(1, jobs)
+        self._lock = threading.Lock()
+        self._tools: Dict[str, bool] = dict()
+        self._files: Dict[str, str] = dict()
+
+    def _tool(self, name: str) -> bool:
+        """Checks if a program is installed, once per program."""
+        with self._lock:
+            if name not in self._tools:
+                self._tools[name] = shutil.which(name) is not None
+            return self._tools[name]
+
+    def _check_file(self, path, check) -> None:
+        """Checks a file of a package once, even if several dists use it.
+
+        Args:
+            path (Path): The file.
+            check (callable): Returns a problem with the file or None.
+
+        """
+        with self._lock:
+            if str(path) in self._files:
+                return
+            self._files[str(path)] = None
+        problem = check(path)
+        with self._lock:
+            self._files[str(path)] = problem
+
+    def _check_control(self, path) -> str:
+        try:
+            control = self._conf.files.yaml(path)
+        except Exception as e:
+            return "{}: {}".format(path, e)
+        if control is not None and not isinstance(control, dict):
+            return "{}: contains no key-value data".format(path)
+        return None
+
+    @staticmethod
+    def _check_buildpkg(path) -> str:
+        try:
+            with open(str(path), 'rb') as stream:
+                start = stream.read(4)
+        except OSError as e:
+            return "{}: {}".format(path, e)
+        # the script is made executable before it runs, but can't be
+        # started without interpreter line
+        if not start.startswith(b"#!") and start != b"\x7fELF":
+            return "{}: no #! line".format(path)
+        return None
+
+    def _check_dist(self, dist: Dist) -> List[str]:
+        """Checks the tools that a dist needs.
+
+        Returns:
+            list: Problems of the dist.
+
+        """
+        problems = list()
+        metadata = dist.metadata
+
+        tools = list()
+        backend = metadata.get('backend', "fpm")
+        if backend == "fpm":
+            tools.append("fpm")
+        elif metadata.get('compression') in _compressors:
+            tools.append(metadata['compression'])
+
+        try:
+            repo = RepoCreater.for_dist(dist=dist, conf=self._conf)
+            if type(repo) is RepoCreater:
+                tools.append("reprepro")
+        except ValueError as e:
+            problems.append(str(e))
+        if metadata.get('signwith'):
+            tools.append("gpg")
+
+        problems.extend("'{}' is not installed".format(tool)
+                for tool in tools if not self._tool(tool))
+        return ["{}: {}".format(dist.name, problem) for problem in problems]
+
+    def _check_package(self, dists: List[Dist], pkgname: str) -> List[str]:
+        """Checks a package for all dists.
+
+        Returns:
+            list: Problems of the package.
+
+        """
+        if not (self._conf.pkgpath / pkgname).is_dir():
+            return ["{}: unknown package".format(pkgname)]
+
+        problems = list()
+        for dist in dists:
+            pair = "{}/{}: ".format(dist.name, pkgname)
+            try:
+                pkg = Package(pkgname=pkgname, dist=dist, conf=self._conf)
+                pkg.sources # checks the declarations
+                PkgCreater.for_package(pkg)
+            except Exception as e:
+                problems.append(pair + str(e))
+                continue
+
+            if not pkg.metadata.get('Version'):
+                problems.append(pair + "no Version")
+
+            for cur_dist in dist.order:
+                control_file = pkg.index.meta_file(cur_dist, "control.yaml")
+                if control_file:
+                    self._check_file(control_file, self._check_control)
+                build_file = pkg.index.meta_file(cur_dist, "buildpkg")
+                if build_file:
+                    self._check_file(build_file, self._check_buildpkg)
+        return problems
+
+    def check(self) -> List[str]:
+        """Checks all dists and packages.
+
+        Returns:
+            list: Description of every problem, empty if there are none.
+
+        """
+        try:
+            self._conf.resolver
+        except DistError as e:
+            return [str(e), "Packages are checked once the dists are fixed"]
+
+        problems = list()
+        configured = self._conf.data.get('dists') or dict()
+        for name in self._conf.dists:
+            if name not in configured:
+                problems.append("{}: unknown dist".format(name))
+        dists = [Dist(name=name, conf=self._conf) for name in self._conf.dists
+                if name in configured]
+
+        with ThreadPoolExecutor(self._jobs) as executor:
+            for dist_problems in executor.map(self._check_dist, dists):
+                problems.extend(dist_problems)
+            pkgnames = list(dict.fromkeys(self._conf.packages))
+            for pkg_problems in executor.map(
+                    lambda pkgname: self._check_package(dists, pkgname),
+                    pkgnames):
+                problems.extend(pkg_problems)
+
+        problems.extend(sorted(problem for problem in self._files.values()
+            if problem))
+        return problems
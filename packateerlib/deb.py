@@ -0,0 +1,388 @@
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, BinaryIO, Dict, Iterator, List, Tuple
+
+from packateerlib import Package, PkgCreater
+
+AR_MAGIC = b"!<arch>\n"
+
+
+def write_ar_member(stream: BinaryIO, name: str, data: BinaryIO,
+        size: int) -> None:
+    """Appends a member to an ar archive.
+
+    Args:
+        stream (BinaryIO): The ar archive, positioned at its end.
+        name (str): Name of the member.
+        data (BinaryIO): Content of the member, read from its current
+            position.
+        size (int): Number of bytes to copy from data.
+
+    """
+    header = "{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n".format(
+            name, int(time.time()), 0, 0, "100644", size)
+    stream.write(header.encode("ascii"))
+    shutil.copyfileobj(data, stream)
+    if size % 2:
+        stream.write(b"\n")
+
+
+def read_ar_members(stream: BinaryIO) -> Iterator[Tuple[str, int]]:
+    """Iterates over the members of an ar archive without reading their
+    content.
+
+    Args:
+        stream (BinaryIO): The ar archive. After each member is yielded, the
+            stream is positioned at the start of its content.
+
+    Yields:
+        tuple: Name and size of each member.
+
+    Raises:
+        ValueError: If the stream isn't an ar archive.
+
+    """
+    if stream.read(len(AR_MAGIC)) != AR_MAGIC:
+        raise ValueError("Not an ar archive")
+
+    offset = len(AR_MAGIC)
+    while True:
+        stream.seek(offset)
+        header = stream.read(60)
+        if len(header) < 60:
+            return
+
+        name = header[:16].decode("ascii").strip().rstrip("/")
+        size = int(header[48:58].decode("ascii"))
+        yield name, size
+        offset += 60 + size + size % 2
+
+
+def parse_control(control: str) -> Dict[str, str]:
+    """Parses the fields of a control file, continuation lines are kept as
+    part of their field.
+
+    Args:
+        control (str): Content of the control file.
+
+    Returns:
+        dict: The value of every field.
+
+    """
+    fields: Dict[str, str] = dict()
+    field = None
+    for line in control.splitlines():
+        if line[:1] in (" ", "\t") and field:
+            fields[field] += "\n" + line
+        elif ":" in line:
+            field, value = line.split(":", 1)
+            fields[field] = value.strip()
+
+    return fields
+
+
+def read_control(path: Path) -> str:
+    """Extracts the control file of a Debian package.
+
+    Args:
+        path (Path): Path to the package file.
+
+    Returns:
+        str: Content of the control file.
+
+    Raises:
+        ValueError: If the package has no control file.
+
+    """
+    with open(str(path), 'rb') as stream:
+        for name, size in read_ar_members(stream):
+            if not name.startswith("control.tar"):
+                continue
+
+            data = stream.read(size)
+            if name.endswith(".zst"):
+                # the standard library has no zstd support
+                data = subprocess.run(["zstd", "-dc"], input=data,
+                        stdout=subprocess.PIPE, check=True).stdout
+
+            with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+                for member in tar:
+                    if member.name in ("./control", "control"):
+                        return tar.extractfile(member).read().decode()
+
+    raise ValueError("No control file in {}".format(path))
+
+
+class _HashingReader(object):
+
+    """File wrapper that calculates the md5sum of everything read from it."""
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self._stream = stream
+        self.md5 = hashlib.md5()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.md5.update(data)
+        return data
+
+
+# file name suffixes of the data archive, by compression
+_suffixes: Dict[str, str] = {"gzip" : ".gz", "xz" : ".xz", "zstd" : ".zst",
+        "none" : ""}
+
+
+@contextmanager
+def _compressor(stream: BinaryIO, compression: str, level: int = None,
+        threads: int = 0) -> Iterator[BinaryIO]:
+    """Compresses everything that is written to the yielded file. xz and
+    zstd run as external programs, which can use several threads.
+
+    Args:
+        stream (BinaryIO): File to write the compressed data to.
+        compression (str): gzip, xz, zstd or none.
+        level (int): Compression level, the default of the method if None.
+        threads (int): Number of threads, 0 for one per CPU.
+
+    Yields:
+        BinaryIO: File to write the uncompressed data to.
+
+    Raises:
+        subprocess.CalledProcessError: If the compression program fails.
+
+    """
+    if compression == "none":
+        yield stream
+    elif compression == "gzip":
+        with gzip.GzipFile(fileobj=stream, mode='wb',
+                compresslevel=9 if level is None else int(level)) as sink:
+            yield sink
+    elif compression in ("xz", "zstd"):
+        cmd = [compression, "-c", "-q", "-T{}".format(int(threads))]
+        if level is not None:
+            cmd.append("-{}".format(int(level)))
+            if compression == "zstd" and int(level) > 19:
+                cmd.append("--ultra")
+
+        stream.flush()
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=stream)
+        try:
+            yield process.stdin
+        finally:
+            process.stdin.close()
+            process.wait()
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+        # the program wrote behind the back of the file object
+        stream.seek(0, os.SEEK_END)
+    else:
+        raise ValueError("Unsupported compression: {}".format(compression))
+
+
+class DebCreater(PkgCreater):
+
+    """Creates a Debian package directly, without calling fpm. The control
+    fields are generated from the same metadata that is passed to fpm."""
+
+    # control fields in the order they are written
+    _fields: List[str] = [
+            'Package',
+            'Version',
+            'License',
+            'Vendor',
+            'Architecture',
+            'Maintainer',
+            'Installed-Size',
+            'Depends',
+            'Conflicts',
+            'Breaks',
+            'Provides',
+            'Replaces',
+            'Section',
+            'Priority',
+            'Homepage',
+            'Tag',
+            'Description',
+            ]
+
+    def __init__(self, pkg: Package) -> None:
+        """Initializes all package information.
+
+        Args:
+            pkg (Package): Package object to build a package file from.
+
+        Raises:
+            ValueError: If the distribution doesn't use Debian packages.
+
+        """
+        super().__init__(pkg)
+
+        if self._pkgformat != "deb":
+            raise ValueError("The native backend can't create {} packages"
+                    .format(self._pkgformat))
+
+    def _control(self, installed_size: int) -> str:
+        """Generates the content of the control file.
+
+        Args:
+            installed_size (int): Size of all package files in bytes.
+
+        Returns:
+            str: The control file.
+
+        """
+        metadata = self._pkg.metadata
+        fields: Dict[str, str] = dict()
+
+        for metainfo in self._mapping.values():
+            if metadata.get(metainfo):
+                fields[metainfo] = str(metadata[metainfo])
+
+        for metainfo in ('Breaks', 'Tag'):
+            if metainfo in metadata:
+                fields[metainfo] = str(metadata[metainfo])
+
+        # same defaults as fpm, except for the Maintainer, which fpm takes
+        # from the user and host and would make packages of different
+        # machines differ
+        fields['Package'] = fields.pop('Name')
+        fields['Version'] = self._version
+        fields['Architecture'] = self._architecture
+        fields.setdefault('Maintainer', "<packateer@localhost>")
+        fields.setdefault('Priority', "extra")
+        fields.setdefault('Description', "no description given")
+        fields['Installed-Size'] = str((installed_size + 1023) // 1024)
+
+        # continuation lines of multiline fields are indented
+        description = fields['Description'].strip("\n").split("\n")
+        fields['Description'] = "\n".join(description[:1]
+                + [" " + (line if line.strip() else ".")
+                    for line in description[1:]])
+
+        return "".join("{}: {}\n".format(field, fields[field])
+                for field in self._fields if field in fields)
+
+    def _write_data(self, stream: BinaryIO) -> Tuple[Dict[str, str], int]:
+        """Writes the compressed data archive with all files of the workdir.
+
+        Args:
+            stream (BinaryIO): File to write the archive to.
+
+        Returns:
+            tuple: md5sums of all regular files and the size of all files.
+
+        """
+        workdir = str(self._pkg.vars['workdir'])
+        md5sums: Dict[str, str] = dict()
+        installed_size = 0
+
+        with _compressor(stream, self._compression or "gzip",
+                self._compression_level, self.compression_threads) as sink, \
+                tarfile.open(fileobj=sink, mode="w|",
+                        format=tarfile.GNU_FORMAT) as tar:
+            for dirpath, dirnames, filenames in os.walk(workdir):
+                dirnames.sort()
+                for name in [""] + sorted(filenames) + dirnames:
+                    path = os.path.join(dirpath, name)
+                    relpath = os.path.relpath(path, workdir)
+                    arcname = "./" if relpath == "." else "./" + relpath
+
+                    info = tar.gettarinfo(path, arcname)
+                    info.uid = info.gid = 0
+                    info.uname = info.gname = "root"
+                    if info.isdir() and name:
+                        continue # directories are added by os.walk
+                    if info.isreg():
+                        with open(path, 'rb') as data:
+                            reader = _HashingReader(data)
+                            tar.addfile(info, reader)
+                        md5sums[relpath] = reader.md5.hexdigest()
+                        installed_size += info.size
+                    else:
+                        tar.addfile(info)
+
+        return md5sums, installed_size
+
+    def _write_control(self, stream: BinaryIO, md5sums: Dict[str, str],
+            installed_size: int) -> None:
+        """Writes the compressed control archive.
+
+        Args:
+            stream (BinaryIO): File to write the archive to.
+            md5sums (dict): md5sums of all regular files of the package.
+            installed_size (int): Size of all package files in bytes.
+
+        """
+        members: List[Tuple[str, bytes, int]] = list()
+        members.append(("control",
+            self._control(installed_size).encode(), 0o644))
+        members.append(("md5sums", "".join("{}  {}\n".format(md5, path)
+            for path, md5 in sorted(md5sums.items())).encode(), 0o644))
+
+        if self._conffiles:
+            members.append(("conffiles", "".join(
+                "/{}\n".format(conf.lstrip("/"))
+                for conf in self._conffiles).encode(), 0o644))
+
+        for metafile, script in self._scripts.items():
+            members.append((metafile, Path(script).read_bytes(), 0o755))
+
+        with tarfile.open(fileobj=stream, mode="w:gz",
+                format=tarfile.GNU_FORMAT) as tar:
+            info = tarfile.TarInfo("./")
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            info.mtime = int(time.time())
+            tar.addfile(info)
+
+            for name, data, mode in members:
+                info = tarfile.TarInfo("./" + name)
+                info.size = len(data)
+                info.mode = mode
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+
+    def build(self, log: IO = None) -> None:
+        """Creates the package file from the workdir.
+
+        Args:
+            log (IO): Unused, the package is created without helper programs.
+
+        Returns: None
+
+        """
+        distpath = str(self._artifact.parent)
+        os.makedirs(distpath, exist_ok=True)
+
+        with tempfile.TemporaryFile(dir=distpath) as data, \
+                tempfile.TemporaryFile(dir=distpath) as control:
+            # the control archive needs the md5sums of the data archive
+            md5sums, installed_size = self._write_data(data)
+            self._write_control(control, md5sums, installed_size)
+
+            fd, tmpname = tempfile.mkstemp(dir=distpath, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as deb:
+                    deb.write(AR_MAGIC)
+                    write_ar_member(deb, "debian-binary",
+                            io.BytesIO(b"2.0\n"), 4)
+                    for name, member in (("control.tar.gz", control),
+                            ("data.tar" + _suffixes[self._compression
+                                or "gzip"], data)):
+                        size = member.tell()
+                        member.seek(0)
+                        write_ar_member(deb, name, member, size)
+                os.chmod(tmpname, 0o644)
+                os.replace(tmpname, str(self._artifact))
+            except BaseException:
+                os.unlink(tmpname)
+                raise
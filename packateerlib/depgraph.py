@@ -0,0 +1,146 @@
+import re
+from contextlib import suppress
+from typing import Any, Dict, Hashable, List, Tuple, Union
+
+from packateerlib import Dist, Metadata
+
+# metadata keys whose packages have to be built first
+_relations = ('Pre-Depends', 'Depends', 'build-depends')
+
+# version constraints and architecture qualifiers of a relation
+_qualifiers = re.compile(r"\(.*?\)|\[.*?\]|<.*?>|:\S+")
+
+
+def parse_relations(value: Union[str, List[str], None]) -> List[str]:
+    """Extracts the package names of a relationship field like Depends. All
+    alternatives are included.
+
+    Args:
+        value: Field value, like "foo (>= 1.0), bar | baz", or a list of
+            such values.
+
+    Returns:
+        list: Names of all related packages.
+
+    """
+    if not value:
+        return list()
+    if isinstance(value, list):
+        value = ", ".join(str(item) for item in value)
+
+    names: List[str] = list()
+    for relation in re.split(r"[,|]", str(value)):
+        name = _qualifiers.sub("", relation).strip()
+        if name:
+            names.append(name)
+    return names
+
+
+class DepGraph(object):
+
+    """Build order of (dist, package) pairs. A package depends on the other
+    packages of the same run and dist that it names in its Pre-Depends,
+    Depends or build-depends metadata, directly or through their Provides."""
+
+    def __init__(self, conf: Metadata, pairs: List[Tuple[Dist, str]]) -> None:
+        """Collects the dependencies between all pairs.
+
+        Args:
+            conf (Metadata): Metadata configuration of this project.
+            pairs (list): (dist, package name) pairs of this run.
+
+        """
+        self._nodes = list(pairs)
+        self._deps: Dict[Hashable, List[Tuple[Dist, str]]] = {
+                node: list() for node in self._nodes}
+        self._dependents: Dict[Hashable, List[Tuple[Dist, str]]] = {
+                node: list() for node in self._nodes}
+
+        metadata: Dict[Hashable, Dict[str, Any]] = dict()
+        providers: Dict[Tuple[str, str], List[Tuple[Dist, str]]] = dict()
+        for node in self._nodes:
+            dist, pkgname = node
+            metadata[node] = dict()
+            with suppress(Exception): # reported when building the package
+                metadata[node] = conf.resolver.package_metadata(pkgname,
+                        dist.order)
+
+            names = [pkgname, metadata[node].get('Name')] + \
+                    parse_relations(metadata[node].get('Provides'))
+            for name in dict.fromkeys(names):
+                if name:
+                    providers.setdefault((dist.name, name), list()).append(node)
+
+        for node in self._nodes:
+            dist, _ = node
+            for key in _relations:
+                for name in parse_relations(metadata[node].get(key)):
+                    for provider in providers.get((dist.name, name), list()):
+                        if provider != node and \
+                                provider not in self._deps[node]:
+                            self._deps[node].append(provider)
+                            self._dependents[provider].append(node)
+
+    @property
+    def nodes(self) -> List[Tuple[Dist, str]]:
+        """All pairs in the order they were given."""
+        return self._nodes
+
+    def dependencies(self, node: Tuple[Dist, str]) -> List[Tuple[Dist, str]]:
+        """Pairs that have to be built before the given one."""
+        return self._deps[node]
+
+    def dependents(self, node: Tuple[Dist, str]) -> List[Tuple[Dist, str]]:
+        """Pairs that can only be built after the given one."""
+        return self._dependents[node]
+
+    def cycles(self) -> List[List[Tuple[Dist, str]]]:
+        """Finds all groups of pairs that depend on each other.
+
+        Returns:
+            list: The pairs of every cycle, in the order of the graph.
+
+        """
+        # Tarjan's algorithm for strongly connected components, iterative
+        index: Dict[Hashable, int] = dict()
+        lowlink: Dict[Hashable, int] = dict()
+        stack: List[Tuple[Dist, str]] = list()
+        onstack = set()
+        cycles: List[List[Tuple[Dist, str]]] = list()
+
+        for root in self._nodes:
+            if root in index:
+                continue
+            work = [(root, iter(self._deps[root]))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            onstack.add(root)
+
+            while work:
+                node, deps = work[-1]
+                for dep in deps:
+                    if dep not in index:
+                        index[dep] = lowlink[dep] = len(index)
+                        stack.append(dep)
+                        onstack.add(dep)
+                        work.append((dep, iter(self._deps[dep])))
+                        break
+                    if dep in onstack:
+                        lowlink[node] = min(lowlink[node], index[dep])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = list()
+                        while True:
+                            member = stack.pop()
+                            onstack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1:
+                            cycles.append(list(reversed(component)))
+
+        return cycles
@@ -1,5 +1,4 @@
 from contextlib import suppress
-from itertools import product
 from pathlib import Path
 from typing import Dict, List
 
@@ -14,9 +13,15 @@ class Dist():
             "origin",
             "label",
             "architecture",
+            "architectures",
             "component",
             "description",
             "signwith",
+            "backend",
+            "repobackend",
+            "compression",
+            "compression-level",
+            "compression-threads",
             ]
 
     def __init__(self, name: str, conf: Metadata) -> None:
@@ -31,17 +36,8 @@ class Dist():
         self._name = name
         self._conf = conf
 
-        # build dist hierarchy
-        self._order: List[str] = [name]
-        curdist = name
-
-        # generate parent structure
-        while conf.data.get("dists", dict()).get(curdist, dict()).get("parent"):
-            curdist = conf.data["dists"][curdist]["parent"]
-            self._order.append(curdist)
-
-        # alldists is the base of all dists
-        self._order.append("alldists")
+        # dist hierarchy, alldists is the base of all dists
+        self._order: List[str] = conf.resolver.order(name)
 
         self._metadata: Dict[str, str] = self._build_metadata()
 
@@ -49,17 +45,18 @@ class Dist():
         with suppress(KeyError):
             self._distpath = Path("{}/{}".format(self._metadata['distpath'], name))
 
-    def build(self) -> None:
+    def build(self, jobs: int = 1) -> None:
         """Creates and builds all Packages of the distribution.
+
+        Args:
+            jobs (int): Number of packages to build at the same time.
+
         Returns: None
 
         """
-        from packateerlib import Package # avoid circular dependency
-        for pkgname in self._conf.packages:
-            print("Building: " + pkgname)
-            pkg = Package(pkgname=pkgname, dist=self, conf=self._conf)
-            pkg.build()
-            pkg.create()
+        from packateerlib import Builder # avoid circular dependency
+        builder = Builder(conf=self._conf, dists=[self], jobs=jobs)
+        builder.build()
 
 
     def _build_metadata(self):
@@ -68,12 +65,8 @@ class Dist():
             dict: Distribution specific variables
 
         """
-        data: Dict[str, str] = dict()
-        for cur_dist, dist_key in product(reversed(self._order), self.distkeys):
-            with suppress(KeyError):
-                data.update({
-                    dist_key : self._conf.data['dists'][cur_dist][dist_key]
-                    })
+        data: Dict[str, str] = dict(
+                self._conf.resolver.dist_metadata(self._order))
 
         if not data.get("pkgformat"):
             data["pkgformat"] = "deb" # default do debian distribution
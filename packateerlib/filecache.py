@@ -0,0 +1,305 @@
+import os
+import threading
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Tuple, Union
+
+# suffixes of sizes like 512M or 10G
+_units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def load_yaml(stream: Union[IO, bytes, str]) -> Any:
+    """Loads yaml data, with the fast loader of libyaml when available.
+
+    Args:
+        stream: Open file or content to load.
+
+    Returns:
+        The loaded data.
+
+    """
+    import yaml # slow to import and not needed for cached data
+    return yaml.load(stream, Loader=getattr(yaml, "CSafeLoader",
+        yaml.SafeLoader))
+
+
+def cache_home() -> Path:
+    """Directory for all data that packateer caches between runs, can be set
+    with the PACKATEER_CACHE environment variable.
+
+    Returns:
+        Path: The cache directory.
+
+    """
+    if os.environ.get("PACKATEER_CACHE"):
+        return Path(os.environ["PACKATEER_CACHE"])
+
+    xdg_cache = os.environ.get("XDG_CACHE_HOME") or \
+            os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(xdg_cache) / "packateer"
+
+
+def parse_size(value: str) -> int:
+    """Parses a size like 512M or 10G.
+
+    Args:
+        value (str): Number of bytes, optionally with a K, M, G or T suffix.
+
+    Returns:
+        int: The size in bytes.
+
+    Raises:
+        ValueError: If the value is no valid size.
+
+    """
+    value = str(value).strip().upper().rstrip("B")
+    if value and value[-1] in _units:
+        return int(float(value[:-1]) * _units[value[-1]])
+    return int(value)
+
+
+class PackageIndex(object):
+
+    """Directory listing of a package, read with one scandir per directory,
+    so that lookups of metadata files and files layers need no stat
+    calls. The modification times of the listed directories tell if the
+    listing is still current."""
+
+    def __init__(self, path: Path) -> None:
+        """Lists the metadata and files directories of a package.
+
+        Args:
+            path (Path): Directory of the package.
+
+        """
+        self._path = Path(path)
+        self._metafiles: Dict[str, Dict[str, Path]] = dict()
+        self._layers: List[str] = list()
+        # taken before the listing, so changes while listing are noticed
+        self._mtimes: Dict[str, int] = dict()
+
+        for distdir in self._scandir(self._path / "metadata"):
+            if distdir.is_dir():
+                self._metafiles[distdir.name] = {entry.name: Path(entry.path)
+                        for entry in self._scandir(Path(distdir.path))
+                        if not entry.is_dir()}
+
+        self._layers = [entry.name for entry in
+                self._scandir(self._path / "files") if entry.is_dir()]
+
+    @staticmethod
+    def _mtime(path: str) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scandir(self, path: Path) -> List[os.DirEntry]:
+        self._mtimes[str(path)] = self._mtime(str(path))
+        try:
+            with os.scandir(str(path)) as entries:
+                return list(entries)
+        except OSError:
+            return list()
+
+    def current(self) -> bool:
+        """Checks if no file was added to or removed from the listed
+        directories since they were listed.
+
+        Returns:
+            bool: True if the listing is still current.
+
+        """
+        return all(self._mtime(path) == mtime
+                for path, mtime in self._mtimes.items())
+
+    def meta_file(self, dist: str, name: str) -> Path:
+        """Looks up a metadata file of a distribution.
+
+        Args:
+            dist (str): Name of the distribution.
+            name (str): Name of the file, like control.yaml or buildpkg.
+
+        Returns:
+            Path: Path to the file, None if it doesn't exist.
+
+        """
+        return self._metafiles.get(dist, dict()).get(name)
+
+    def has_files(self, dist: str) -> bool:
+        """Checks if the package has a files layer for a distribution.
+
+        Args:
+            dist (str): Name of the distribution.
+
+        Returns:
+            bool: True if the files directory of the dist exists.
+
+        """
+        return dist in self._layers
+
+
+class FileCache(object):
+
+    """Reads and parses files at most once per run. Parsed files are keyed by
+    their path, modification time and size, so changed files are read
+    again after the cache was refreshed. Directory listings of packages are
+    listed again once their directories changed."""
+
+    def __init__(self) -> None:
+        """Creates an empty cache.
+
+        """
+        self._lock = threading.Lock()
+        self._stats: Dict[str, os.stat_result] = dict()
+        self._indexes: Dict[str, PackageIndex] = dict()
+        self._parsed: Dict[Tuple[str, str], Tuple[int, int, Any, Exception]] \
+                = dict()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        """Number of lookups that were answered from the cache."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """Number of lookups that had to read and parse the file."""
+        return self._misses
+
+    def refresh(self) -> None:
+        """Forgets all file states, so that changed files are read again on
+        the next lookup. Unchanged files are still served from the cache.
+        Directory listings don't need a refresh.
+
+        """
+        with self._lock:
+            self._stats.clear()
+            self._indexes.clear()
+
+    def stat(self, path: Path) -> os.stat_result:
+        """Looks up the state of a file.
+
+        Args:
+            path (Path): Path to the file.
+
+        Returns:
+            os.stat_result: State of the file, None if it doesn't exist.
+
+        """
+        key = str(path)
+        with self._lock:
+            if key in self._stats:
+                return self._stats[key]
+
+        try:
+            stat = os.stat(key)
+        except OSError:
+            stat = None
+
+        with self._lock:
+            self._stats[key] = stat
+        return stat
+
+    def index(self, path: Path) -> PackageIndex:
+        """Looks up the directory listing of a package, which is listed
+        again if a file was added or removed since.
+
+        Args:
+            path (Path): Directory of the package.
+
+        Returns:
+            PackageIndex: Listing of the metadata and files directories.
+
+        """
+        key = str(path)
+        with self._lock:
+            index = self._indexes.get(key)
+        if index is not None and index.current():
+            return index
+
+        index = PackageIndex(path)
+        with self._lock:
+            self._indexes[key] = index
+        return index
+
+    def exists(self, path: Path) -> bool:
+        """Checks if a file exists.
+
+        Args:
+            path (Path): Path to the file.
+
+        Returns:
+            bool: True if the file exists.
+
+        """
+        return self.stat(path) is not None
+
+    def _load(self, path: Path, kind: str, parser: Callable[[Any], Any]):
+        """Parses a file or returns the cached result of an unchanged file.
+
+        Args:
+            path (Path): Path to the file.
+            kind (str): Name of the parser, a file can be parsed differently.
+            parser (callable): Function that parses an open file.
+
+        Returns:
+            Parsed content of the file.
+
+        Raises:
+            OSError: If the file can't be read.
+
+        """
+        stat = self.stat(path)
+        if stat is None:
+            raise FileNotFoundError("No such file: {}".format(path))
+
+        key = (str(path), kind)
+        with self._lock:
+            cached = self._parsed.get(key)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._hits += 1
+                if cached[3]:
+                    raise cached[3]
+                return cached[2]
+            self._misses += 1
+
+        value, error = None, None
+        try:
+            with open(str(path)) as stream:
+                value = parser(stream)
+        except Exception as e:
+            error = e
+
+        with self._lock:
+            self._parsed[key] = (stat.st_mtime_ns, stat.st_size, value, error)
+
+        if error:
+            raise error
+        return value
+
+    def yaml(self, path: Path) -> Any:
+        """Loads a yaml file. The returned data is shared and must not be
+        modified.
+
+        Args:
+            path (Path): Path to the yaml file.
+
+        Returns:
+            The loaded data.
+
+        """
+        return self._load(path, "yaml", load_yaml)
+
+    def lines(self, path: Path) -> List[str]:
+        """Reads all stripped lines of a file.
+
+        Args:
+            path (Path): Path to the file.
+
+        Returns:
+            list: The lines of the file.
+
+        """
+        return self._load(path, "lines",
+                lambda stream: [line.strip() for line in stream.readlines()])
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+from packateerlib import Package, PkgCreater
+from packateerlib.overlay import overlay
+
+# increase whenever the fingerprint covers different inputs
+FINGERPRINT_VERSION = 1
+
+# dist keys that change the package file, the others only the repository
+_package_distkeys = ('pkgformat', 'architecture', 'backend', 'compression',
+        'compression-level', 'compression-threads')
+
+# vars with paths that differ between the dists of a package
+_path_vars = ('workdir', 'storage')
+
+
+def _hash_tree(hasher, root: Path, with_mode: bool = True) -> None:
+    """Feeds names, permissions and contents of all files below a directory
+    into a hash.
+
+    Args:
+        hasher: Hash object to update.
+        root (Path): Directory to hash, ignored when missing.
+        with_mode (bool): Also hash the permissions of the files.
+
+    """
+    for dirpath, dirnames, filenames in os.walk(str(root)):
+        dirnames.sort()
+        for name in [""] + sorted(filenames):
+            path = os.path.join(dirpath, name) if name else dirpath
+            relpath = os.path.relpath(path, str(root))
+            hasher.update(relpath.encode() + b"\0")
+
+            stat = os.lstat(path)
+            if with_mode:
+                hasher.update(oct(stat.st_mode).encode() + b"\0")
+
+            if os.path.islink(path):
+                hasher.update(os.readlink(path).encode() + b"\0")
+            elif name:
+                with open(path, 'rb') as stream:
+                    for chunk in iter(lambda: stream.read(1 << 20), b""):
+                        hasher.update(chunk)
+                hasher.update(b"\0")
+
+
+def fingerprint(pkg: Package, pkgcreater: PkgCreater) -> str:
+    """Calculates a hash over all inputs of a package build.
+
+    Args:
+        pkg (Package): Package to calculate the fingerprint for.
+        pkgcreater (PkgCreater): Package creator that builds the package file.
+
+    Returns:
+        str: Hex digest of the build inputs.
+
+    """
+    hasher = hashlib.sha256()
+    hasher.update(str(FINGERPRINT_VERSION).encode() + b"\0")
+
+    for data in (pkg.dist_metadata, pkg.metadata, pkg.vars,
+            pkgcreater.arguments):
+        hasher.update(json.dumps(data, sort_keys=True, default=str).encode())
+        hasher.update(b"\0")
+
+    for cur_dist in reversed(pkg.dist_order):
+        hasher.update(cur_dist.encode() + b"\0")
+        if pkg.index.has_files(cur_dist):
+            _hash_tree(hasher, pkg.filespath / cur_dist)
+        # build scripts are made executable on every build, ignore the mode
+        _hash_tree(hasher, pkg.metapath / cur_dist, with_mode=False)
+
+    return hasher.hexdigest()
+
+
+def _hash_file(path: str) -> str:
+    """Hashes the content of a file.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str: Hex digest of the content.
+
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def build_key(pkg: Package, pkgcreater: PkgCreater) -> str:
+    """Calculates a hash over the build inputs of a package that doesn't
+    depend on the dist it is built for. Packages of different dists with the
+    same key result in the same package file, so it only has to be built
+    once. Unlike the fingerprint it covers the merged files of all layers
+    and the content of the scripts instead of the layers themselves.
+
+    Args:
+        pkg (Package): Package to calculate the key for.
+        pkgcreater (PkgCreater): Package creator that builds the package file.
+
+    Returns:
+        str: Hex digest of the build inputs.
+
+    """
+    hasher = hashlib.sha256()
+    hasher.update(str(FINGERPRINT_VERSION).encode() + b"\0")
+
+    dist_metadata = {key: val for key, val in pkg.dist_metadata.items()
+            if key in _package_distkeys}
+    pkgvars = {key: val for key, val in pkg.vars.items()
+            if key not in _path_vars}
+
+    # paths are replaced by what they stand for
+    metapath = str(pkg.metapath) + os.sep
+    arguments = list()
+    for arg in pkgcreater.arguments:
+        if arg == str(pkg.vars['workdir']):
+            arg = "{workdir}"
+        elif arg == str(pkgcreater.artifact):
+            arg = "{artifact}"
+        elif arg.startswith(metapath) and os.path.isfile(arg):
+            arg = "sha256:" + _hash_file(arg)
+        arguments.append(arg)
+
+    for data in (dist_metadata, pkg.metadata, pkgvars, arguments,
+            pkg.conffiles, pkgcreater.artifact.name):
+        hasher.update(json.dumps(data, sort_keys=True, default=str).encode())
+        hasher.update(b"\0")
+
+    files, dirs = overlay([pkg.filespath / cur_dist
+        for cur_dist in reversed(pkg.dist_order)
+        if pkg.index.has_files(cur_dist)])
+    for reldir in sorted(dirs):
+        hasher.update(reldir.encode() + b"\0")
+    for relpath in sorted(files):
+        hasher.update(relpath.encode() + b"\0")
+        hasher.update(oct(files[relpath].stat().st_mode).encode() + b"\0")
+        hasher.update(_hash_file(str(files[relpath])).encode() + b"\0")
+
+    for cur_dist in reversed(pkg.dist_order):
+        build_file = pkg.index.meta_file(cur_dist, "buildpkg")
+        if build_file:
+            hasher.update(_hash_file(str(build_file)).encode() + b"\0")
+
+    return hasher.hexdigest()
+
+
+def manifest_path(artifact: Path) -> Path:
+    """Path of the manifest that belongs to a package file.
+
+    Args:
+        artifact (Path): Path to the package file.
+
+    Returns:
+        Path: Path to the manifest next to the package file.
+
+    """
+    return artifact.with_name(artifact.name + ".manifest")
+
+
+def is_current(artifact: Path, digest: str) -> bool:
+    """Checks if a package file was built from the given inputs and wasn't
+    changed since.
+
+    Args:
+        artifact (Path): Path to the package file.
+        digest (str): Fingerprint of the current build inputs.
+
+    Returns:
+        bool: True if the package file doesn't need to be rebuilt.
+
+    """
+    try:
+        with open(manifest_path(artifact)) as stream:
+            manifest: Dict = json.load(stream)
+        stat = artifact.stat()
+    except (OSError, ValueError):
+        return False
+
+    return (manifest.get('fingerprint') == digest
+            and manifest.get('size') == stat.st_size
+            and manifest.get('mtime') == stat.st_mtime_ns)
+
+
+def write_manifest(artifact: Path, digest: str) -> None:
+    """Records the fingerprint of a freshly built package file.
+
+    Args:
+        artifact (Path): Path to the package file.
+        digest (str): Fingerprint of the build inputs.
+
+    """
+    stat = artifact.stat()
+    manifest = {
+            'fingerprint' : digest,
+            'artifact' : artifact.name,
+            'size' : stat.st_size,
+            'mtime' : stat.st_mtime_ns,
+            }
+
+    tmp = manifest_path(artifact).with_suffix(".tmp")
+    with open(tmp, 'w') as stream:
+        json.dump(manifest, stream, indent=4)
+    os.replace(str(tmp), str(manifest_path(artifact)))
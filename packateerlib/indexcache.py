@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict
+
+
+class IndexCache(object):
+
+    """Persistent cache for data that was extracted from package files. The
+    entries are keyed by the inode, size and modification time of the package
+    file, so unchanged packages never have to be opened again."""
+
+    def __init__(self, path: Path) -> None:
+        """Loads the cache from disk. A missing or broken cache file results
+        in an empty cache.
+
+        Args:
+            path (Path): Path to the cache file.
+
+        """
+        self._path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = dict()
+        self._used: Dict[str, Dict[str, Any]] = dict()
+
+        try:
+            with open(self._path) as stream:
+                self._entries = json.load(stream)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _key(stat: os.stat_result):
+        return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+    def get(self, path: Path) -> Any:
+        """Looks up the data of an unchanged package file.
+
+        Args:
+            path (Path): Path to the package file.
+
+        Returns:
+            The cached data, None if the file is unknown or has changed.
+
+        """
+        key = self._key(os.stat(str(path)))
+        with self._lock:
+            entry = self._entries.get(str(path))
+            if entry and entry['key'] == key:
+                self._used[str(path)] = entry
+                return entry['data']
+        return None
+
+    def put(self, path: Path, data: Any) -> None:
+        """Stores the data of a package file.
+
+        Args:
+            path (Path): Path to the package file.
+            data: JSON serializable data extracted from the file.
+
+        """
+        entry = {'key' : self._key(os.stat(str(path))), 'data' : data}
+        with self._lock:
+            self._entries[str(path)] = entry
+            self._used[str(path)] = entry
+
+    def clear(self) -> None:
+        """Forgets all entries, so that every package file is read again.
+
+        """
+        with self._lock:
+            self._entries.clear()
+            self._used.clear()
+
+    def unused(self) -> Dict[str, Any]:
+        """Looks up all entries that weren't used since the cache was loaded,
+        because their package file was removed or changed.
+
+        Returns:
+            dict: The cached data of each unused package file.
+
+        """
+        with self._lock:
+            return {path: entry['data'] for path, entry in self._entries.items()
+                    if path not in self._used}
+
+    def save(self) -> None:
+        """Writes all entries that were used since the cache was loaded back
+        to disk, entries of removed package files are dropped.
+
+        """
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._path.with_name(self._path.name + ".tmp")
+        with self._lock:
+            with open(tmp, 'w') as stream:
+                json.dump(self._used, stream)
+        os.replace(str(tmp), str(self._path))
@@ -0,0 +1,102 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+
+class JobServer(object):
+
+    """GNU make jobserver that shares one job budget between all build
+    scripts. The tokens are passed through a pipe, as described in the
+    MAKEFLAGS of every build script, so make, cmake and ninja started by
+    different packages at the same time together run at most the given
+    number of jobs.
+
+    Every package that is built holds one job slot itself, like a sub-make
+    does. The first package uses the implicit slot of packateer, all others
+    take a token from the pipe."""
+
+    def __init__(self, jobs: int) -> None:
+        """Creates the pipe with one token for every job but the first.
+
+        Args:
+            jobs (int): Total number of jobs.
+
+        """
+        self._jobs = max(1, jobs)
+        self._read, self._write = os.pipe()
+        self._lock = threading.Lock()
+        self._implicit = True # the implicit slot is free
+
+        tokens = self._jobs - 1
+        while tokens:
+            tokens -= os.write(self._write, b"+" * tokens)
+
+    @property
+    def fds(self) -> Tuple[int, int]:
+        """File descriptors of the pipe, build scripts have to inherit
+        them."""
+        return self._read, self._write
+
+    def environment(self, makeflags: str = None) -> Dict[str, str]:
+        """Environment variables that make the jobserver available.
+
+        Args:
+            makeflags (str): Existing MAKEFLAGS to extend.
+
+        Returns:
+            dict: The variables for the build scripts.
+
+        """
+        auth = "{},{}".format(self._read, self._write)
+        # make before 4.2 only knows the --jobserver-fds spelling
+        flags = "-j{} --jobserver-fds={} --jobserver-auth={}".format(
+                self._jobs, auth, auth)
+        if makeflags:
+            flags = "{} {}".format(makeflags, flags)
+        return dict(MAKEFLAGS=flags)
+
+    def acquire(self) -> bool:
+        """Takes a job slot, waits until one is free.
+
+        Returns:
+            bool: True if a token was taken from the pipe, False if the
+                implicit slot was taken.
+
+        """
+        with self._lock:
+            if self._implicit:
+                self._implicit = False
+                return False
+
+        # the pipe stays blocking, because make in the build scripts shares
+        # it, the read waits until a token is given back
+        os.read(self._read, 1)
+        return True
+
+    def release(self, token: bool) -> None:
+        """Gives a job slot back.
+
+        Args:
+            token (bool): What acquire returned for this slot.
+
+        """
+        if token:
+            os.write(self._write, b"+")
+        else:
+            with self._lock:
+                self._implicit = True
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Holds a job slot while the enclosed code runs."""
+        token = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def close(self) -> None:
+        """Closes the pipe."""
+        os.close(self._read)
+        os.close(self._write)
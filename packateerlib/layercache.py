@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from packateerlib import Package
+from packateerlib.fingerprint import (FINGERPRINT_VERSION, _hash_file,
+        _hash_tree, _path_vars)
+from packateerlib.overlay import materialize
+
+
+def layer_keys(pkg: Package) -> List[Tuple[str, str]]:
+    """Calculates a key for the state of the workdir after every layer of a
+    package, from the bottom to the top layer. The key of a layer covers its
+    files, its build script and the vars the script sees, and the key of the
+    layer below, so dists that share their parents share the keys of the
+    parent layers.
+
+    Args:
+        pkg (Package): Package to calculate the keys for.
+
+    Returns:
+        list: Name and key of every layer.
+
+    """
+    keys = list()
+    key = "layers {}".format(FINGERPRINT_VERSION)
+    for cur_dist in reversed(pkg.dist_order):
+        hasher = hashlib.sha256()
+        hasher.update(key.encode() + b"\0" + cur_dist.encode() + b"\0")
+
+        if pkg.index.has_files(cur_dist):
+            _hash_tree(hasher, pkg.filespath / cur_dist)
+        hasher.update(b"\0")
+        build_file = pkg.index.meta_file(cur_dist, "buildpkg")
+        if build_file:
+            hasher.update(_hash_file(str(build_file)).encode())
+        hasher.update(b"\0")
+
+        layer_vars = {name: val for name, val in
+                pkg.layer_vars(cur_dist).items() if name not in _path_vars}
+        hasher.update(json.dumps(layer_vars, sort_keys=True,
+            default=str).encode())
+
+        key = hasher.hexdigest()
+        keys.append((cur_dist, key))
+    return keys
+
+
+def _copy_tree(src: Path, dst: Path) -> int:
+    """Copies a directory tree into an existing directory, sharing the data
+    blocks where the file system can.
+
+    Returns:
+        int: Number of bytes that were copied.
+
+    """
+    size = 0
+
+    def copy(srcfile: str, dstfile: str) -> None:
+        nonlocal size
+        with suppress(FileNotFoundError):
+            os.unlink(dstfile)
+        materialize(Path(srcfile), Path(dstfile))
+        size += os.lstat(dstfile).st_size
+
+    shutil.copytree(str(src), str(dst), symlinks=True, copy_function=copy,
+            dirs_exist_ok=True)
+    return size
+
+
+class LayerCache(object):
+
+    """Snapshots of the workdirs and storages of packages after the build
+    script of a layer ran, like the layers of a container image. When the
+    least recently used snapshots exceed the size cap, they are deleted."""
+
+    def __init__(self, root: Path, max_size: int = None) -> None:
+        """Initializes the cache.
+
+        Args:
+            root (Path): Directory of the cache.
+            max_size (int): Size cap in bytes, unlimited if None.
+
+        """
+        self._root = Path(root)
+        self._max_size = max_size
+
+    def path(self, key: str) -> Path:
+        """Directory of a snapshot.
+
+        Args:
+            key (str): Key of the layer.
+
+        Returns:
+            Path: Where the snapshot is stored.
+
+        """
+        return self._root / key[:2] / key
+
+    def restore(self, key: str, directories: Dict[str, Path]) -> int:
+        """Copies a snapshot into directories.
+
+        Args:
+            key (str): Key of the layer.
+            directories (dict): Existing directory by name, like workdir and
+                storage. Files that aren't in the snapshot are kept.
+
+        Returns:
+            int: Number of bytes that were copied, None if there is no
+                snapshot.
+
+        """
+        path = self.path(key)
+        try:
+            # the modification time records the last use
+            os.utime(str(path))
+            return sum(_copy_tree(path / name, directory)
+                    for name, directory in directories.items())
+        except FileNotFoundError:
+            # evicted, maybe while copying
+            return None
+
+    def store(self, key: str, directories: Dict[str, Path]) -> int:
+        """Takes a snapshot of directories and evicts old snapshots beyond
+        the size cap.
+
+        Args:
+            key (str): Key of the layer.
+            directories (dict): Directory by name, like workdir and storage,
+                after the build script of the layer.
+
+        Returns:
+            int: Number of bytes that were copied.
+
+        """
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=str(path.parent), prefix=".tmp-"))
+        try:
+            size = sum(_copy_tree(directory, tmp / name)
+                    for name, directory in directories.items())
+            path.with_name(key + ".size").write_text(str(size))
+            try:
+                os.rename(str(tmp), str(path))
+            except OSError:
+                pass # stored meanwhile by another build
+        finally:
+            shutil.rmtree(str(tmp), ignore_errors=True)
+
+        if self._max_size is not None:
+            self.evict(self._max_size)
+        return size
+
+    def evict(self, max_size: int) -> None:
+        """Deletes the least recently used snapshots until the cache is at
+        most max_size bytes.
+
+        Args:
+            max_size (int): Size in bytes.
+
+        """
+        entries = list()
+        for sizefile in self._root.glob("*/*.size"):
+            path = sizefile.with_suffix("")
+            with suppress(OSError, ValueError):
+                entries.append((path.stat().st_mtime_ns,
+                    int(sizefile.read_text()), path))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= max_size:
+                break
+            shutil.rmtree(str(path), ignore_errors=True)
+            with suppress(FileNotFoundError):
+                path.with_name(path.name + ".size").unlink()
+            size -= entry_size
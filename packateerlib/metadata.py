@@ -1,9 +1,41 @@
 #!/usr/bin/python3
+import fnmatch
+import hashlib
 import os
+import pickle
 import sys
-import yaml
+from collections.abc import Mapping
+from contextlib import suppress
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, Iterator, List
+from packateerlib.filecache import FileCache, cache_home, load_yaml
+from packateerlib.resolver import Resolver
+from packateerlib.sources import SourceCache
+
+class _LazyPackages(Mapping):
+
+    """Package entries of a metadata snapshot. Every entry is unpickled on
+    first access, so runs that only build a few packages don't pay for
+    loading all of them."""
+
+    def __init__(self, blobs: Dict[str, bytes]) -> None:
+        self._blobs = blobs
+        self._entries: Dict[str, Any] = dict()
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._entries:
+            self._entries[name] = pickle.loads(self._blobs[name])
+        return self._entries[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._blobs)
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def __reduce__(self):
+        return (dict, (dict(self.items()),))
+
 
 class Metadata(object):
 
@@ -19,8 +51,11 @@ class Metadata(object):
 
         Args:
             path (str): Path to the metadata file.
-            dists (str): Space separated list of distributions to build.
-            packages (str): Space separated list of packages to build.
+            dists (str): Space separated list of distributions to build,
+                shell-style patterns like ubuntu* select all matching
+                dists that aren't abstract.
+            packages (str): Space separated list of packages to build, may
+                contain patterns as well.
 
         """
         try:
@@ -31,11 +66,13 @@ class Metadata(object):
         if not self._path.exists():
             raise FileNotFoundError("Metadata file not found")
 
+        # parsed package files are shared by all dists and packages
+        self._files = FileCache()
+        self._resolver: Resolver = None
+        self._sources: SourceCache = None
+
         # load all data from metadata file
-        with open(self._path) as stream:
-            self._data = yaml.safe_load(stream)
-            if not self._data:
-                self._data = dict()
+        self._data = self._load()
 
 
         # get the path to the package directories
@@ -47,8 +84,10 @@ class Metadata(object):
 
 
         # load dists from metadata file or command line
+        configured = self._data.get("dists") or dict()
         if dists:
-            self._dists = dists.split(" ")
+            self._dists = self._expand(dists, [dist for dist in configured
+                if not configured[dist].get("abstract") == True])
         elif self._data.get("dists"):
             self._dists = [dist for dist in self._data.get("dists")
                     if not self._data["dists"][dist].get("abstract") == True]
@@ -58,12 +97,112 @@ class Metadata(object):
 
         # load packages from metadata file or command line
         if packages:
-            self._packages = packages.split(" ")
+            self._packages = self._expand(packages,
+                    list(self._data.get("packages") or dict()))
         elif self._data.get("packages"):
             self._packages = [pkg for pkg in self._data.get("packages")]
         else:
             self._packages = list()
 
+    @staticmethod
+    def _expand(names: str, configured: List[str]) -> List[str]:
+        """Expands the patterns of a space separated list of names. Names
+        without pattern characters are kept as they are, so unknown names
+        still show up in the checks.
+
+        Args:
+            names (str): Space separated list of names and patterns.
+            configured (list): Names that patterns are matched against.
+
+        Returns:
+            list: The names, every name once.
+
+        """
+        expanded = list()
+        for name in names.split(" "):
+            if any(char in name for char in "*?["):
+                expanded.extend(fnmatch.filter(configured, name))
+            else:
+                expanded.append(name)
+        return list(dict.fromkeys(expanded))
+
+    def _load(self) -> Dict:
+        """Loads the metadata file. The validated data is stored in a
+        snapshot keyed by the hash of the file, so later runs don't have to
+        parse the file again.
+
+        Returns:
+            dict: The loaded data.
+
+        """
+        content = self._path.read_bytes()
+        digest = hashlib.sha256(b"packateer-snapshot-2\0" + content)
+        snapshot = cache_home() / "metadata" / (digest.hexdigest() + ".pickle")
+
+        with suppress(Exception): # a missing or broken snapshot is recreated
+            with open(snapshot, 'rb') as stream:
+                data = pickle.load(stream)
+            if data.get('packages'):
+                data['packages'] = _LazyPackages(data['packages'])
+            return data
+
+        data = load_yaml(content)
+        if not data:
+            data = dict()
+        self._validate(data)
+
+        with suppress(OSError):
+            snapshot.parent.mkdir(parents=True, exist_ok=True)
+            tmp = snapshot.with_name("{}.{}.tmp".format(snapshot.name,
+                os.getpid()))
+            packed = dict(data)
+            if data.get('packages'):
+                packed['packages'] = {name: pickle.dumps(entry,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+                    for name, entry in data['packages'].items()}
+            with open(tmp, 'wb') as stream:
+                pickle.dump(packed, stream, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(str(tmp), str(snapshot))
+
+        return data
+
+    def _validate(self, data: Dict) -> None:
+        """Checks the structure of the loaded data. Empty sections and
+        entries are replaced with empty dicts.
+
+        Args:
+            data (dict): Loaded data from the metadata file.
+
+        Raises:
+            ValueError: If the data has an invalid structure.
+
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Invalid metadata file: no key-value data")
+
+        for section in ("vars", "packages", "dists"):
+            if data.get(section) is None:
+                continue
+            if not isinstance(data[section], dict):
+                raise ValueError("Invalid metadata file: {} is no mapping"
+                        .format(section))
+
+            if section == "vars":
+                continue
+            for name, entry in data[section].items():
+                if entry is None:
+                    data[section][name] = entry = dict()
+                if not isinstance(entry, dict):
+                    raise ValueError("Invalid metadata file: {} {} is no "
+                            "mapping".format(section, name))
+
+    @property
+    def path(self) -> Path:
+        """Path to the metadata file
+
+        """
+        return self._path
+
     @property
     def dists(self) -> List[str]:
         """List of all distributions to build for.
@@ -91,3 +230,29 @@ class Metadata(object):
 
         """
         return self._data
+
+    @property
+    def files(self) -> FileCache:
+        """Cache for all files that are read from the package directories
+
+        """
+        return self._files
+
+    @property
+    def resolver(self) -> Resolver:
+        """Resolved dist hierarchy, compiled on first use
+
+        """
+        if self._resolver is None:
+            self._resolver = Resolver(self._data, self._pkgpath, self._files)
+        return self._resolver
+
+    @property
+    def sources(self) -> SourceCache:
+        """Download cache for the sources of all packages, shared by all runs
+        on this machine
+
+        """
+        if self._sources is None:
+            self._sources = SourceCache(cache_home() / "sources")
+        return self._sources
@@ -0,0 +1,144 @@
+import errno
+import os
+import shutil
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# ioctl request to share the data blocks of two files (reflink)
+FICLONE = 0x40049409
+
+# errors that mean the file system can't do a fast copy
+_unsupported = (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL,
+        errno.ENOTTY, errno.EPERM, errno.EBADF)
+
+
+def overlay(layers: List[Path]) -> Tuple[Dict[str, Path], List[str]]:
+    """Combines several directory trees, files of later layers replace the
+    ones of earlier layers. Symbolic links are followed.
+
+    Args:
+        layers (list): Directories, from the bottom to the top layer. Missing
+            directories are ignored.
+
+    Returns:
+        tuple: Source path of every file by its relative path and the
+            relative paths of all directories.
+
+    """
+    files: Dict[str, Path] = dict()
+    dirs: Dict[str, None] = dict()
+
+    for layer in layers:
+        root = str(layer)
+        for dirpath, dirnames, filenames in os.walk(root, followlinks=True):
+            reldir = os.path.relpath(dirpath, root)
+            if reldir != ".":
+                dirs[reldir] = None
+            for name in filenames:
+                relpath = os.path.normpath(os.path.join(reldir, name))
+                files[relpath] = Path(dirpath) / name
+
+    return files, list(dirs)
+
+
+def _copy_data(src: int, dst: int, size: int) -> None:
+    """Copies the content of a file, sharing the data blocks when the file
+    system supports it.
+
+    Args:
+        src (int): File descriptor of the source file.
+        dst (int): File descriptor of the empty destination file.
+        size (int): Size of the source file.
+
+    """
+    try:
+        import fcntl
+        fcntl.ioctl(dst, FICLONE, src)
+        return
+    except (ImportError, OSError) as e:
+        if isinstance(e, OSError) and e.errno not in _unsupported:
+            raise
+
+    copied = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                count = os.copy_file_range(src, dst, size - copied)
+                if count == 0:
+                    break
+                copied += count
+        except OSError as e:
+            if e.errno not in _unsupported:
+                raise
+
+    # plain copy of everything the kernel didn't copy
+    os.lseek(src, copied, os.SEEK_SET)
+    os.lseek(dst, copied, os.SEEK_SET)
+    while True:
+        data = os.read(src, 1 << 20)
+        if not data:
+            break
+        os.write(dst, data)
+
+
+def materialize(src: Path, dst: Path, hardlink: bool = False) -> int:
+    """Puts a file at its destination as hardlink, reflink or copy, whatever
+    is possible first. Copies keep the permissions and times of the source.
+
+    Args:
+        src (Path): Source file.
+        dst (Path): Destination, must not exist yet.
+        hardlink (bool): Try to hardlink the file. Changes to the file in the
+            destination then also change the source.
+
+    Returns:
+        int: Number of bytes that were copied.
+
+    """
+    if hardlink:
+        try:
+            os.link(str(src), str(dst))
+            return 0
+        except OSError as e:
+            if e.errno not in _unsupported + (errno.EMLINK,):
+                raise
+
+    with open(str(src), 'rb') as source:
+        size = os.fstat(source.fileno()).st_size
+        with open(str(dst), 'wb') as destination:
+            _copy_data(source.fileno(), destination.fileno(), size)
+
+    shutil.copystat(str(src), str(dst))
+    return size
+
+
+def assemble(layers: List[Path], target: Path, hardlink: bool = False,
+        replace: bool = False) -> int:
+    """Creates the combined content of several directory trees in a target
+    directory, every file is put there only once.
+
+    Args:
+        layers (list): Directories, from the bottom to the top layer.
+        target (Path): Existing, empty target directory.
+        hardlink (bool): Hardlink files instead of copying them.
+        replace (bool): The target directory may have content already, its
+            files are replaced.
+
+    Returns:
+        int: Number of bytes that were copied.
+
+    """
+    files, dirs = overlay(layers)
+    target = Path(target)
+
+    for reldir in dirs:
+        (target / reldir).mkdir(parents=True, exist_ok=True)
+
+    copied = 0
+    for relpath, src in files.items():
+        if replace:
+            with suppress(FileNotFoundError):
+                os.unlink(str(target / relpath))
+        copied += materialize(src, target / relpath, hardlink=hardlink)
+    return copied
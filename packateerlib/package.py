@@ -1,13 +1,15 @@
 import os
-import shutil
 import sys
-from contextlib import suppress
-from distutils.dir_util import copy_tree
 from pathlib import Path
-from subprocess import run
-from typing import Dict, List
-import yaml
+from subprocess import STDOUT
+from typing import IO, Dict, List
 from packateerlib import Dist, Metadata
+from packateerlib.filecache import PackageIndex, cache_home, parse_size
+from packateerlib.jobserver import JobServer
+from packateerlib.overlay import assemble
+from packateerlib.scratch import remove_later, scratch_dir, tree_size
+from packateerlib.sources import check_sources
+from packateerlib.trace import run, span
 
 class Package(object):
 
@@ -26,6 +28,7 @@ class Package(object):
         self._pkgname = pkgname
         self._dist = dist
         self._conf = conf
+        self._index: PackageIndex = None
 
         # calculate paths
         self._path = self._conf.pkgpath / self._pkgname
@@ -70,48 +73,48 @@ class Package(object):
     def dist_metadata(self):
         return self._dist.metadata
 
+    @property
+    def dist_order(self):
+        return self._dist.order
 
-    def _build_vars(self):
-        """Updates the dict with all env variable information
-
-        Returns:
-            dict: The vars for this package.
+    @property
+    def sources(self) -> List[Dict[str, str]]:
+        """Files the build scripts need, declared with url and sha256 in the
+        `sources` var.
 
         """
-        data: Dict[str, str] = dict()
+        sources = self._vars.get('sources') or list()
+        check_sources(sources)
+        return sources
 
-        # get the general values
-        if self._conf.data.get("vars"):
-            data.update(self._conf.data["vars"])
+    @property
+    def index(self) -> PackageIndex:
+        """Listing of the metadata and files directories of the package,
+        taken on the first lookup, so later lookups need no stat calls."""
+        if self._index is None:
+            self._index = self._conf.files.index(self._path)
+        return self._index
 
-        with suppress(KeyError):
-            data.update(self._conf.data['packages'][self._pkgname]['vars'])
+    @property
+    def metapath(self) -> Path:
+        """Directory with the metadata files of all distributions."""
+        return self._metapath
 
+    @property
+    def filespath(self) -> Path:
+        """Directory with the package files of all distributions."""
+        return self._filespath
 
-        # get values for every distribution
-        for cur_dist in reversed(self._dist.order):
-            with suppress(KeyError): # distribution values
-                data.update(
-                    self._conf.data['dists'][cur_dist]["vars"])
-
-            with suppress(KeyError): # values from distribution package
-                data.update(
-                    self._conf.data
-                    ['dists'][cur_dist]["packages"][self._pkgname]['vars'])
-
-            # handle package specific control file
-            control_file = self._metapath / cur_dist / "control.yaml"
-            if (control_file).exists():
-                try:
-                    with open(control_file) as stream:
-                        loaded = yaml.safe_load(stream)
-                        if loaded.get('vars'):
-                            data.update(loaded['vars'])
-                except Exception as e:
-                    # there is no file with loadable data
-                    print(e, file=sys.stderr)
 
-        return data
+    def _build_vars(self):
+        """Updates the dict with all env variable information
+
+        Returns:
+            dict: The vars for this package.
+
+        """
+        return dict(self._conf.resolver.package_vars(
+            self._pkgname, self._dist.order))
 
 
     def _build_metadata(self):
@@ -121,30 +124,8 @@ class Package(object):
             dict: The metadata for this package.
 
         """
-        data: Dict[str, str] = dict()
-        with suppress(KeyError):
-            data.update(self._conf.data['packages'][self._pkgname])
-
-        for cur_dist in reversed(self._dist.order):
-            with suppress(KeyError):
-                data.update(
-                        self._conf.data
-                        ['dists'][cur_dist]["packages"][self._pkgname])
-
-            # handle package specific control file
-            control_file = self._metapath / cur_dist / "control.yaml"
-            if (control_file).exists():
-                try:
-                    with open(control_file) as stream:
-                        data.update(yaml.safe_load(stream))
-                except Exception as e:
-                    # there is no file with loadable data
-                    print(e, file=sys.stderr)
-
-        if data.get('vars'): # delete vars, they're handled separately
-            del data['vars']
-
-        return data
+        return dict(self._conf.resolver.package_metadata(
+            self._pkgname, self._dist.order))
 
     @property
     def conffiles(self):
@@ -155,12 +136,10 @@ class Package(object):
         """
         conffiles: List[str] = list()
         for cur_dist in self._dist.order:
-            dist_path = self._metapath / cur_dist / "conffiles"
-            if dist_path.exists():
+            dist_path = self.index.meta_file(cur_dist, "conffiles")
+            if dist_path:
                 try:
-                    with open(dist_path) as stream:
-                        conffiles.extend(
-                                [line.strip() for line in stream.readlines()])
+                    conffiles.extend(self._conf.files.lines(dist_path))
                 except Exception as e:
                     print(e, file=sys.stderr)
 
@@ -178,8 +157,8 @@ class Package(object):
 
         """
         for cur_dist in self._dist.order:
-            dist_path = self._metapath / cur_dist / fname
-            if dist_path.exists():
+            dist_path = self.index.meta_file(cur_dist, fname)
+            if dist_path:
                 return dist_path
         else:
             return None
@@ -201,38 +180,247 @@ class Package(object):
         """
         return self._metadata.get(key)
 
-    def build(self):
-        """Runs all build scripts to create all package files.
+    def flag(self, key: str) -> bool:
+        """Reads an on/off var. Values that come from the command line or
+        quoted yaml are strings, so "false" and "no" are off as well.
+
+        Args:
+            key (str): Name of the var.
+
+        Returns:
+            bool: True if the var is on, False if it is off or not set.
+
+        Raises:
+            ValueError: If the value is no on/off value.
+
+        """
+        value = self._vars.get(key)
+        if value is None or isinstance(value, bool):
+            return bool(value)
+        text = str(value).strip().lower()
+        if text in ("1", "true", "yes", "on"):
+            return True
+        if text in ("", "0", "false", "no", "off"):
+            return False
+        raise ValueError("Invalid value for {}: {}".format(key, value))
+
+    def build(self, log: IO = None, jobserver: JobServer = None):
+        """Runs all build scripts to create all package files. The files of
+        all distributions are copied into the workdir first, files of a
+        distribution replace the ones of its parents. With the `hardlinks`
+        var the files are hardlinked instead, build scripts must not change
+        them in place then. Declared sources are downloaded into the shared
+        source cache and linked into the directory in the `sources` var.
+        The workdir of the last build is deleted in the background. With the
+        `scratch` var the workdir is put below that directory, like a tmpfs,
+        and linked from its usual path, as long as the directory has space
+        for the files or for `scratch-size` bytes. With the `layer-cache`
+        var the package is built layer by layer, reusing snapshots of the
+        workdir, see _build_layers.
+
+        Args:
+            log (IO): File to write the output of the build scripts to,
+                defaults to the terminal.
+            jobserver (JobServer): Shares the jobs of make and similar tools
+                in the build scripts with other packages. The scripts must
+                not pass -j to make then.
 
         """
         #TODO: remember to make functions from maintainer scripts includeable!
         #TODO: multiarch support, build multiple packages with their dependencies
         #TODO: Define files directory
-        env = dict(PATH=os.environ['PATH'], **self._vars)
-        env['workdir'] = str(self._vars['workdir'])
-        env['storage'] = str(self._vars['storage'])
+        if self.sources:
+            self._conf.sources.link(self.sources, self._sourcespath)
 
-        shutil.rmtree(self._vars['workdir'], ignore_errors=True)
-        self._vars['workdir'].mkdir(parents=True, exist_ok=True)
+        layers = [self._filespath / cur_dist
+                for cur_dist in reversed(self._dist.order)
+                if self.index.has_files(cur_dist)]
+        self._make_workdir(layers, log)
         self._vars['storage'].mkdir(parents=True, exist_ok=True)
 
-        # copy files
-        for cur_dist in reversed(self._dist.order):
-            files_dir = self._filespath / cur_dist
-            if files_dir.exists():
-                copy_tree(str(files_dir), str(self._vars['workdir']))
+        if self.flag('layer-cache'):
+            self._build_layers(log, jobserver)
+            return
+
+        # copy files, every file is only put once into the workdir
+        with span("assemble", "files", dist=self._dist.name,
+                package=self._pkgname) as current:
+            current['bytes'] += assemble(layers, self._vars['workdir'],
+                hardlink=self.flag('hardlinks'))
 
         # execute build scripts
+        env = self._environment(self._vars, jobserver)
         for cur_dist in reversed(self._dist.order):
-            build_file = self._metapath / cur_dist / "buildpkg"
-            if build_file.exists():
-                build_file.chmod(0o755)
-                run([build_file], env=env)
+            build_file = self.index.meta_file(cur_dist, "buildpkg")
+            if build_file:
+                self._run_script(cur_dist, build_file, env, log, jobserver)
+
+    def _build_layers(self, log: IO = None, jobserver: JobServer = None
+            ) -> None:
+        """Builds layer by layer: the files of a layer are copied into the
+        workdir right before its build script runs, and the script only sees
+        the vars of its layer and the layers below. The workdir and the
+        storage are snapshotted after every build script, so dists with the same parent
+        layers continue from the snapshot of the topmost one instead of
+        running the scripts of the parents again. Build scripts must not
+        leave the path of the workdir or of the storage in the workdir then.
+
+        Args:
+            log (IO): File to write the output of the build scripts to,
+                defaults to the terminal.
+            jobserver (JobServer): Shares the jobs of make and similar tools.
+
+        """
+        # avoid circular dependency
+        from packateerlib.layercache import LayerCache, layer_keys
+
+        workdir = self._vars['workdir']
+        # the storage is per dist too, so it is part of the snapshots
+        directories = {'workdir': workdir, 'storage': self._vars['storage']}
+        cache = LayerCache(cache_home() / "layers", parse_size(
+            self._vars.get('layer-cache-size') or "5G"))
+        steps = layer_keys(self)
+
+        # continue after the topmost layer with a snapshot
+        start = 0
+        for num in reversed(range(len(steps))):
+            cur_dist, key = steps[num]
+            if not self.index.meta_file(cur_dist, "buildpkg"):
+                continue
+            with span("restore " + cur_dist, "layers", dist=self._dist.name,
+                    package=self._pkgname) as current:
+                restored = cache.restore(key, directories)
+            if restored is not None:
+                current['bytes'] += restored
+                print("Reusing layers up to " + cur_dist, file=log or sys.stdout)
+                start = num + 1
+                break
+            # evicted while copying, start over with an empty workdir
+            self._make_workdir(list(), log)
+
+        for cur_dist, key in steps[start:]:
+            if self.index.has_files(cur_dist):
+                with span("assemble", "files", dist=self._dist.name,
+                        package=self._pkgname) as current:
+                    current['bytes'] += assemble([self._filespath / cur_dist],
+                            workdir, hardlink=self.flag('hardlinks'),
+                            replace=True)
+
+            build_file = self.index.meta_file(cur_dist, "buildpkg")
+            if build_file:
+                env = self._environment(self.layer_vars(cur_dist), jobserver)
+                self._run_script(cur_dist, build_file, env, log, jobserver)
+                with span("snapshot " + cur_dist, "layers",
+                        dist=self._dist.name, package=self._pkgname) as current:
+                    current['bytes'] += cache.store(key, directories)
+
+    def layer_vars(self, cur_dist: str) -> Dict[str, str]:
+        """Vars that the build script of a layer sees when the package is
+        built layer by layer, the ones of the layer and the layers below.
+
+        Args:
+            cur_dist (str): Name of the layer, a dist of the dist order.
+
+        Returns:
+            dict: The vars, with the workdir, storage and sources of the
+                package, because every layer sees them.
+
+        """
+        order = self._dist.order
+        layer_vars = dict(self._conf.resolver.package_vars(self._pkgname,
+            order[order.index(cur_dist):]))
+        layer_vars['workdir'] = self._vars['workdir']
+        layer_vars['storage'] = self._vars['storage']
+        layer_vars.pop('sources', None)
+        if 'sources' in self._vars:
+            layer_vars['sources'] = self._vars['sources']
+        return layer_vars
+
+    @property
+    def _sourcespath(self) -> Path:
+        """Directory that the sources are linked into."""
+        return self._path / "sources" / self._dist.name
+
+    def _environment(self, pkgvars: Dict[str, str],
+            jobserver: JobServer = None) -> Dict[str, str]:
+        """Environment of the build scripts.
 
-    def create(self):
+        Args:
+            pkgvars (dict): Vars that are passed to the scripts.
+            jobserver (JobServer): Jobserver for make in the scripts.
+
+        Returns:
+            dict: The environment variables.
+
+        """
+        env = dict(PATH=os.environ['PATH'])
+        env.update({key: str(val) for key, val in pkgvars.items()})
+        if jobserver:
+            env.update(jobserver.environment(env.get('MAKEFLAGS')))
+        if self.sources:
+            env['sources'] = str(self._sourcespath)
+        return env
+
+    def _run_script(self, cur_dist: str, build_file: Path,
+            env: Dict[str, str], log: IO = None,
+            jobserver: JobServer = None) -> None:
+        """Runs the build script of a layer.
+
+        Raises:
+            CalledProcessError: If the script fails.
+
+        """
+        build_file.chmod(0o755)
+        with span("buildpkg " + cur_dist, "buildpkg", dist=self._dist.name,
+                package=self._pkgname):
+            run([build_file], env=env, stdout=log,
+                    stderr=STDOUT if log else None,
+                    pass_fds=jobserver.fds if jobserver else (), check=True)
+
+    def _make_workdir(self, layers: List[Path], log: IO = None) -> None:
+        """Replaces the workdir by an empty one, below the scratch root if
+        there is one with enough space.
+
+        Args:
+            layers (list): Files directories that are copied into the workdir.
+            log (IO): File to write a note to if the scratch root is full,
+                defaults to the terminal.
+
+        """
+        workdir = self._vars['workdir']
+        remove_later(workdir)
+
+        target = None
+        if self._vars.get('scratch'):
+            size = parse_size(self._vars.get('scratch-size') or
+                    tree_size(layers))
+            target = scratch_dir(self._vars['scratch'], self._path,
+                    self._dist.name, size)
+            if target is None:
+                print("Not enough space in {}, using {}".format(
+                    self._vars['scratch'], workdir), file=log or sys.stderr)
+
+        if target:
+            remove_later(target)
+            target.mkdir(parents=True)
+            workdir.parent.mkdir(parents=True, exist_ok=True)
+            workdir.symlink_to(target, target_is_directory=True)
+        else:
+            workdir.mkdir(parents=True)
+
+    def clean(self) -> None:
+        """Deletes the workdir in the background, once the package file was
+        created from it."""
+        remove_later(self._vars['workdir'])
+
+    def create(self, log: IO = None):
         """Creates a package with a helper program.
 
+        Args:
+            log (IO): File to write the output of the helper program to,
+                defaults to the terminal.
+
         """
         from packateerlib import PkgCreater # avoid circular dependencies
-        pkgcreater = PkgCreater(self)
-        pkgcreater.build()
+        pkgcreater = PkgCreater.for_package(self)
+        pkgcreater.build(log=log)
@@ -1,10 +1,13 @@
 import errno
+import os
+import platform
 from contextlib import suppress
 from packateerlib import Package as Package
 from pathlib import Path
 from shlex import split
-from subprocess import run
-from typing import Dict, List
+from subprocess import STDOUT
+from packateerlib.trace import run
+from typing import IO, Dict, List
 
 class PkgCreater(object):
     """Create a concrete package from a package object."""
@@ -31,6 +34,20 @@ class PkgCreater(object):
             "after-remove" : 'postrm',
             }
 
+    # names of the compression methods for fpm, by package format
+    _compressions: Dict[str, Dict[str, str]] = {
+            "deb" : {"gzip" : "gz", "xz" : "xz", "zstd" : "zst",
+                "none" : "none"},
+            "rpm" : {"gzip" : "gzip", "xz" : "xz", "bzip2" : "bzip2",
+                "none" : "none"},
+            }
+
+    _architectures: Dict[str, Dict[str, str]] = {
+            "deb" : {"x86_64" : "amd64", "aarch64" : "arm64", "i686" : "i386",
+                "noarch" : "all"},
+            "rpm" : {"amd64" : "x86_64", "arm64" : "aarch64", "all" : "noarch"},
+            }
+
     def __init__(self, pkg: Package) -> None:
         """Initializes variables for FPM.
 
@@ -43,16 +60,24 @@ class PkgCreater(object):
 
         args: List[str] = ["--input-type", "dir"]
 
-        pkgformat = "deb"
+        pkgformat = pkg.dist_metadata.get('pkgformat', "deb")
         with suppress(KeyError):
             pkgformat = pkg.vars['pkgformat']
         args.extend(["--output-type", pkgformat])
+        self._pkgformat = pkgformat
 
         args.extend(["--chdir", pkg.vars['workdir']])
 
+        # payload compression, fpm's default if not configured
+        self._compression = self._option(pkg, 'compression')
+        self._compression_level = self._option(pkg, 'compression-level')
+        self._compression_threads = self._option(pkg, 'compression-threads')
+        args.extend(self._compression_arguments())
+
         # generate Version String
         version = self._generate_version(pkg)
         args.extend(["--version", version])
+        self._version = version
 
         # map all fpm flags to the pkg metadata
         for flag, metainfo in self._mapping.items():
@@ -61,10 +86,13 @@ class PkgCreater(object):
                 args.append(pkg.metadata[metainfo])
 
         # add fpm flags for maintainer scripts
+        self._scripts: Dict[str, Path] = dict()
         for flag, metafile in self._metafiles.items():
-            if pkg.meta_file(metafile):
+            script = pkg.meta_file(metafile)
+            if script:
                 args.append("--" + flag)
-                args.append(str(pkg.meta_file(metafile)))
+                args.append(str(script))
+                self._scripts[metafile] = script
 
         # distribution specific fields
         if pkgformat == "deb":
@@ -78,18 +106,154 @@ class PkgCreater(object):
         with suppress(KeyError):
             args.extend(["--deb-field", "Tag: " + pkg.metadata['Tag']])
 
-        for conf in pkg.conffiles:
+        self._conffiles = pkg.conffiles
+        for conf in self._conffiles:
             args.extend(["--config-files", conf])
 
-        # create distribution directory for the packages
-        pkg.dist_path.mkdir(parents=True, exist_ok=True)
-
-        args.extend(["--package", pkg.dist_path])
+        self._architecture = self._generate_architecture(pkg, pkgformat)
+        self._artifact = pkg.dist_path / self._artifact_name(pkg)
+        args.extend(["--package", self._artifact])
         args.extend(["--log", 'error'])
         args.append("--force")
 
         self._fpm_arguments = args
 
+    @staticmethod
+    def _option(pkg: Package, key: str) -> str:
+        """Looks up a setting of the distribution that the vars of a package
+        can override.
+
+        Args:
+            pkg (Package): Package to look up the setting for.
+            key (str): Name of the setting.
+
+        Returns:
+            str: The setting, None if it isn't set.
+
+        """
+        value = pkg.dist_metadata.get(key)
+        with suppress(KeyError):
+            value = pkg.vars[key]
+        return value
+
+    def _compression_arguments(self) -> List[str]:
+        """Generates the fpm flags for the configured compression.
+
+        Returns:
+            list: The fpm flags.
+
+        Raises:
+            ValueError: If the compression isn't supported.
+
+        """
+        args: List[str] = list()
+        if self._compression is None:
+            return args
+
+        methods = self._compressions.get(self._pkgformat, dict())
+        if self._compression not in methods:
+            raise ValueError("Unsupported compression for {} packages: {}"
+                    .format(self._pkgformat, self._compression))
+
+        method = methods[self._compression]
+        # rpm has a multi-threaded variant of xz
+        if method == "xz" and self._pkgformat == "rpm" and \
+                self.compression_threads != 1:
+            method = "xzmt"
+        args.extend(["--{}-compression".format(self._pkgformat), method])
+
+        if self._compression_level is not None:
+            args.extend(["--{}-compression-level".format(self._pkgformat),
+                str(int(self._compression_level))])
+        return args
+
+    @property
+    def compression_threads(self) -> int:
+        """Number of threads for the compression, 0 for one per CPU."""
+        if self._compression_threads is None:
+            return 0
+        return int(self._compression_threads)
+
+    def _environment(self) -> Dict[str, str]:
+        """Environment for fpm, sets the threads of the xz and zstd programs
+        that fpm runs.
+
+        Returns:
+            dict: The environment.
+
+        """
+        env = dict(os.environ)
+        if self._compression in ("xz", "zstd"):
+            threads = str(self.compression_threads)
+            env['XZ_DEFAULTS'] = "-T{} {}".format(threads,
+                    env.get('XZ_DEFAULTS', "")).strip()
+            env['ZSTD_NBTHREADS'] = threads
+        return env
+
+    @property
+    def arguments(self) -> List[str]:
+        """All arguments that are passed to fpm."""
+        return [str(arg) for arg in self._fpm_arguments]
+
+    @property
+    def artifact(self) -> Path:
+        """Path to the package file that will be created."""
+        return self._artifact
+
+    @classmethod
+    def for_package(cls, pkg: Package) -> 'PkgCreater':
+        """Chooses the package creator for the backend that is configured for
+        the distribution of the package.
+
+        Args:
+            pkg (Package): Package object to build a package file from.
+
+        Returns:
+            PkgCreater: Package creator for the configured backend.
+
+        """
+        backend = pkg.dist_metadata.get('backend', "fpm")
+        if backend == "fpm":
+            return cls(pkg)
+        elif backend == "native":
+            from packateerlib import DebCreater # avoid circular dependency
+            return DebCreater(pkg)
+
+        raise ValueError("Unknown package backend: {}".format(backend))
+
+    def _generate_architecture(self, pkg: Package, pkgformat: str) -> str:
+        """Determines the architecture of the package in the naming scheme of
+        the package format, defaulting to the architecture of this machine.
+
+        Args:
+            pkg (Package): Package to determine the architecture for.
+            pkgformat (str): Format of the package file.
+
+        Returns:
+            str: Architecture of the package.
+
+        """
+        arch = pkg.metadata.get('Architecture') or platform.machine()
+        return self._architectures.get(pkgformat, dict()).get(arch, arch)
+
+    def _artifact_name(self, pkg: Package) -> str:
+        """Generates the file name of the package in the naming scheme of the
+        package format.
+
+        Args:
+            pkg (Package): Package to generate the file name for.
+
+        Returns:
+            str: File name of the package.
+
+        """
+        if self._pkgformat == "rpm":
+            return "{}-{}.{}.rpm".format(pkg.metadata['Name'], self._version,
+                    self._architecture)
+
+        return "{}_{}_{}.{}".format(pkg.metadata['Name'], self._version,
+                self._architecture, self._pkgformat)
+
     def _generate_version(self, pkg: Package) -> str:
         """Generates a version string with distribution specific separator and
         package revision.
@@ -116,13 +280,22 @@ class PkgCreater(object):
 
         return "{}{}{}".format(pkg_version, version_seperator, pkg_rev)
 
-    def build(self) -> None:
+    def build(self, log: IO = None) -> None:
         """Starts fpm with all generated flags and therefore creates a package.
+
+        Args:
+            log (IO): File to write the output of fpm to, defaults to the
+                terminal.
+
         Returns: None
 
         """
+        # create distribution directory for the packages
+        self._artifact.parent.mkdir(parents=True, exist_ok=True)
         try:
-            run(["fpm"] + self._fpm_arguments)
+            run(["fpm"] + self._fpm_arguments, stdout=log,
+                    stderr=STDOUT if log else None, env=self._environment(),
+                    check=True)
         except OSError as e:
             if e.errno == errno.ENOENT:
                 raise OSError("Package builder 'fpm' is not installed!")
@@ -0,0 +1,512 @@
+import collections
+import hmac
+import io
+import json
+import os
+import secrets
+import socket
+import struct
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import IO, Any, Deque, Dict, Tuple
+
+from packateerlib import Metadata, Package, PkgCreater
+from packateerlib.affected import OUTPUT_DIRS
+
+# length of the JSON header and of the binary payload of a message
+_FRAME = struct.Struct(">IQ")
+
+# size limit of a header before and after the token was checked
+_HELLO_SIZE = 4096
+_HEADER_SIZE = 64 << 20
+
+# payloads are copied in chunks, never read into memory as a whole
+_CHUNK_SIZE = 1 << 20
+
+# vars that are paths on the machine that builds the package
+_local_vars = ('workdir', 'storage', 'pkgpath', 'distpath', 'repopath')
+
+
+def parse_address(address: str, port: int = 7480) -> Tuple[str, int]:
+    """Splits an address like host:port.
+
+    Args:
+        address (str): Host, optionally with port.
+        port (int): Port if the address has none.
+
+    Returns:
+        tuple: Host and port.
+
+    """
+    host, _, portstr = address.rpartition(":")
+    if not host:
+        return portstr or "localhost", port
+    return host, int(portstr)
+
+
+def send_message(sock: socket.socket, header: Dict[str, Any],
+        payload: IO[bytes] = None) -> None:
+    """Sends a message with a JSON header and a binary payload.
+
+    Args:
+        sock (socket.socket): Connected socket.
+        header (dict): Type and content of the message.
+        payload (IO): Binary file with the attached data, like a package
+            file, it is sent from the start.
+
+    """
+    data = json.dumps(header, default=str).encode()
+    size = 0
+    if payload is not None:
+        size = payload.seek(0, io.SEEK_END)
+        payload.seek(0)
+    sock.sendall(_FRAME.pack(len(data), size) + data)
+    if size:
+        sock.sendfile(payload, 0, size)
+
+
+def _receive(sock: socket.socket, size: int) -> bytes:
+    """Reads exactly size bytes from a socket.
+
+    Raises:
+        ConnectionError: If the connection was closed before.
+
+    """
+    chunks = list()
+    while size:
+        chunk = sock.recv(min(size, _CHUNK_SIZE))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def receive_message(sock: socket.socket, payload: IO[bytes] = None,
+        max_header: int = _HEADER_SIZE) -> Dict[str, Any]:
+    """Receives a message sent with send_message.
+
+    Args:
+        sock (socket.socket): Connected socket.
+        payload (IO): Binary file the attached data is written to, messages
+            with data are refused if None.
+        max_header (int): Size limit of the header.
+
+    Returns:
+        dict: Header of the message.
+
+    Raises:
+        ConnectionError: If the connection was closed.
+        ValueError: If the header is too large or the data is refused.
+
+    """
+    header_size, payload_size = _FRAME.unpack(_receive(sock, _FRAME.size))
+    if header_size > max_header:
+        raise ValueError("Message header of {} bytes is too large"
+                .format(header_size))
+    if payload_size and payload is None:
+        raise ValueError("Unexpected message data")
+    header = json.loads(_receive(sock, header_size).decode())
+    while payload_size:
+        chunk = _receive(sock, min(payload_size, _CHUNK_SIZE))
+        payload.write(chunk)
+        payload_size -= len(chunk)
+    return header
+
+
+def pack_tree(path: Path, tree: IO[bytes]) -> None:
+    """Packs the input files of a package directory, without build output.
+
+    Args:
+        path (Path): Directory of the package.
+        tree (IO): Binary file the files are written to as tar.gz archive.
+
+    """
+    with tarfile.open(fileobj=tree, mode="w:gz") as tar:
+        if path.is_dir():
+            for entry in sorted(os.listdir(str(path))):
+                if entry not in OUTPUT_DIRS:
+                    tar.add(str(path / entry), entry)
+
+
+def unpack_tree(tree: IO[bytes], path: Path) -> None:
+    """Unpacks the input files of a package directory packed with pack_tree.
+    Symlinks may point anywhere, like in the files layers, but no member is
+    written outside of the directory.
+
+    Args:
+        tree (IO): Binary file with the files as tar.gz archive.
+        path (Path): Directory of the package.
+
+    Raises:
+        ValueError: If a member would be written outside of the directory.
+
+    """
+    root = os.path.realpath(str(path))
+    tree.seek(0)
+    with tarfile.open(fileobj=tree, mode="r:gz") as tar:
+        members = tar.getmembers()
+        symlinks = {os.path.normpath(member.name) for member in members
+                if member.issym()}
+        for member in members:
+            name = os.path.normpath(member.name)
+            # members below a symlink of the archive end up where it points
+            parents = Path(name).parents
+            if os.path.isabs(name) or any(str(parent) in symlinks
+                    for parent in parents) or not _inside(root, name) or (
+                    member.islnk() and not _inside(root, member.linkname)):
+                raise ValueError("Archive member outside of the package: {}"
+                        .format(member.name))
+
+        if hasattr(tarfile, "tar_filter"):
+            tar.extractall(root, members, filter="tar")
+        else:
+            tar.extractall(root, members)
+
+
+def _inside(root: str, name: str) -> bool:
+    """Checks if a relative path stays inside of a directory."""
+    target = os.path.realpath(os.path.join(root, name))
+    return os.path.commonpath([root, target]) == root
+
+
+class _Job(object):
+
+    """A package build that waits for a worker."""
+
+    def __init__(self, header: Dict[str, Any], tree: IO[bytes],
+            artifact: Path) -> None:
+        self.header = header
+        self.tree = tree
+        self.artifact = artifact
+        self.done = threading.Event()
+        self.error: str = None
+        self.log = ""
+
+
+class Coordinator(object):
+
+    """Hands package builds to worker processes that connect over TCP. Every
+    job carries the configuration of its package, the resolved metadata and
+    vars and the input files, the worker sends the package file back. Jobs
+    of a worker that disconnects are handed to the next free worker. Only
+    workers that know the token get jobs, because they see all vars and
+    their package files are published. Jobs fail once no worker was
+    connected for a while."""
+
+    def __init__(self, conf: Metadata, address: str = "127.0.0.1:7480",
+            token: str = None, timeout: float = 60) -> None:
+        """Starts listening for workers.
+
+        Args:
+            conf (Metadata): Metadata configuration of this project.
+            address (str): Host and port to listen on, port 0 picks a free
+                port.
+            token (str): Secret that workers have to send, a random one is
+                generated if None.
+            timeout (float): Seconds that jobs wait while no worker is
+                connected, before they fail.
+
+        """
+        self._conf = conf
+        self._token = token or secrets.token_urlsafe(24)
+        self._timeout = timeout
+        self._queue: Deque[_Job] = collections.deque()
+        self._ready = threading.Condition()
+        self._closed = False
+        self._workers = 0
+        self._idle_since = time.monotonic()
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(parse_address(address))
+        self._socket.listen()
+
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """Host and port the coordinator listens on."""
+        return self._socket.getsockname()
+
+    @property
+    def token(self) -> str:
+        """Secret that workers have to send."""
+        return self._token
+
+    @property
+    def workers(self) -> int:
+        """Number of connected workers."""
+        return self._workers
+
+    def _accept(self) -> None:
+        """Starts a thread for every worker that connects."""
+        while True:
+            try:
+                sock, _ = self._socket.accept()
+            except OSError:
+                return # closed
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            threading.Thread(target=self._serve, args=(sock,),
+                    daemon=True).start()
+
+    def _next_job(self) -> _Job:
+        """Waits for the next job, None once the coordinator is closed."""
+        with self._ready:
+            while not self._queue and not self._closed:
+                self._ready.wait()
+            return self._queue.popleft() if self._queue else None
+
+    def _serve(self, sock: socket.socket) -> None:
+        """Sends jobs to a worker until it disconnects.
+
+        Args:
+            sock (socket.socket): Connection to the worker.
+
+        """
+        job = None
+        connected = False
+        try:
+            hello = receive_message(sock, max_header=_HELLO_SIZE)
+            name = str(hello.get('name', "unknown worker"))
+            if not hmac.compare_digest(str(hello.get('token')).encode(),
+                    self._token.encode()):
+                print("Rejected worker with wrong token: " + name,
+                        file=sys.stderr)
+                send_message(sock, {'type': "rejected"})
+                return
+            with self._ready:
+                self._workers += 1
+            connected = True
+            print("Worker connected: " + name)
+
+            while True:
+                job = self._next_job()
+                if job is None:
+                    return
+                send_message(sock, job.header, job.tree)
+                tmp = job.artifact.with_name(job.artifact.name + ".tmp")
+                try:
+                    with open(str(tmp), 'wb') as artifact:
+                        result = receive_message(sock, artifact)
+                    if result.get('ok'):
+                        os.replace(str(tmp), str(job.artifact))
+                finally:
+                    with suppress(FileNotFoundError):
+                        tmp.unlink()
+
+                job.log = result.get('log', "")
+                if not result.get('ok'):
+                    job.error = "{} on {}".format(result.get('error'), name)
+                with self._ready:
+                    job.done.set()
+                    self._ready.notify_all()
+                job = None
+        except (OSError, ValueError) as e:
+            if job:
+                # the worker is gone, another one builds the package
+                print("Lost worker, requeueing {dist}/{package}: ".format(
+                    **job.header) + str(e), file=sys.stderr)
+                with self._ready:
+                    self._queue.appendleft(job)
+                    self._ready.notify()
+        finally:
+            if connected:
+                with self._ready:
+                    self._workers -= 1
+                    if not self._workers:
+                        # waiting jobs start to time out
+                        self._idle_since = time.monotonic()
+                        self._ready.notify_all()
+            sock.close()
+
+    def build(self, pkg: Package, pkgcreater: PkgCreater, log: IO = None
+            ) -> None:
+        """Builds a package on a worker and waits until its package file is
+        in the distpath.
+
+        Args:
+            pkg (Package): Package to build.
+            pkgcreater (PkgCreater): Package creator of the package.
+            log (IO): File to write the output of the worker to, defaults to
+                the terminal.
+
+        Raises:
+            RuntimeError: If the build failed on the worker or no worker was
+                connected for the timeout of the coordinator.
+
+        """
+        data = self._conf.data
+        name = pkg.metadata['Name']
+        pkgname = pkg.filespath.parent.name
+        config = {
+                'vars': data.get('vars') or dict(),
+                'dists': data.get('dists') or dict(),
+                'packages': {pkgname: (data.get('packages') or dict())
+                    .get(pkgname) or dict()},
+                }
+        header = {
+                'type': "job",
+                'dist': pkg.dist_name,
+                'package': pkgname,
+                'name': name,
+                'config': config,
+                'metadata': pkg.metadata,
+                'vars': {key: val for key, val in pkg.vars.items()
+                    if key not in _local_vars},
+                }
+
+        with tempfile.TemporaryFile() as tree:
+            pack_tree(pkg.filespath.parent, tree)
+            job = _Job(json.loads(json.dumps(header, default=str)), tree,
+                    pkgcreater.artifact)
+            with self._ready:
+                self._queue.append(job)
+                self._ready.notify()
+                while not job.done.is_set():
+                    idle = time.monotonic() - self._idle_since
+                    if self._workers:
+                        self._ready.wait()
+                    elif idle < self._timeout:
+                        self._ready.wait(self._timeout - idle)
+                    else:
+                        # without workers the job is still queued
+                        self._queue.remove(job)
+                        job.error = ("No worker connected for {} seconds"
+                                .format(self._timeout))
+                        break
+
+        if job.log:
+            (log or sys.stdout).write(job.log)
+        if job.error:
+            raise RuntimeError(job.error)
+
+    def close(self) -> None:
+        """Stops listening, connected workers are disconnected after their
+        current job."""
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+        self._socket.close()
+
+
+class Worker(object):
+
+    """Builds the packages that a coordinator sends, one at a time."""
+
+    def __init__(self, address: str, token: str, scratch: Path = None
+            ) -> None:
+        """Initializes the worker.
+
+        Args:
+            address (str): Host and port of the coordinator.
+            token (str): Secret of the coordinator.
+            scratch (Path): Directory for the builds, a temporary directory
+                if None.
+
+        """
+        self._address = parse_address(address)
+        self._token = token
+        self._scratch = scratch
+
+    def run(self) -> None:
+        """Builds packages until the coordinator closes the connection.
+
+        Raises:
+            PermissionError: If the coordinator rejected the token.
+
+        """
+        with socket.create_connection(self._address) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            send_message(sock, {'type': "hello", 'token': self._token,
+                'name': "{}:{}".format(socket.gethostname(), os.getpid())})
+
+            while True:
+                with tempfile.TemporaryFile(dir=self._scratch) as tree:
+                    try:
+                        job = receive_message(sock, tree)
+                    except ConnectionError:
+                        return
+                    if job.get('type') == "rejected":
+                        raise PermissionError("The coordinator rejected the "
+                                "token")
+                    print("Building: {dist}/{package}".format(**job))
+
+                    with tempfile.TemporaryDirectory(dir=self._scratch) as tmp:
+                        result, artifact = self._build(job, tree, Path(tmp))
+                        if artifact:
+                            with open(str(artifact), 'rb') as stream:
+                                send_message(sock, result, stream)
+                        else:
+                            send_message(sock, result)
+
+    def _build(self, job: Dict[str, Any], tree: IO[bytes],
+            root: Path) -> Tuple[Dict[str, Any], Path]:
+        """Builds a package in a scratch directory.
+
+        Args:
+            job (dict): The job sent by the coordinator.
+            tree (IO): Input files of the package as tar.gz archive.
+            root (Path): Empty scratch directory.
+
+        Returns:
+            tuple: Result message and the package file, None if the build
+                failed.
+
+        """
+        from packateerlib import Dist # avoid circular dependency
+        from packateerlib.scratch import wait_removals
+
+        logpath = root / "build.log"
+        cwd = os.getcwd()
+        pkg = None
+        try:
+            pkgpath = root / "packages" / job['package']
+            pkgpath.mkdir(parents=True)
+            unpack_tree(tree, pkgpath)
+
+            # without pkgpath the packages are next to the metadata file, and
+            # the file is the same for every job of a package, so they share
+            # one metadata snapshot
+            config = job['config']
+            config['vars'].pop('pkgpath', None)
+            # JSON is valid yaml
+            (root / "metadata.yaml").write_text(json.dumps(config))
+
+            # the package files are created below the current directory
+            os.chdir(str(root))
+            with open(str(logpath), 'w') as log:
+                conf = Metadata(str(root / "metadata.yaml"), job['dist'],
+                        job['package'])
+                pkg = Package(job['package'], Dist(job['dist'], conf), conf)
+                resolved = {key: val for key, val in pkg.vars.items()
+                        if key not in _local_vars}
+                if json.loads(json.dumps([pkg.metadata, resolved],
+                        default=str)) != [job['metadata'], job['vars']]:
+                    raise ValueError("The worker resolved different metadata "
+                            "or vars than the coordinator")
+
+                pkgcreater = PkgCreater.for_package(pkg)
+                pkg.build(log=log)
+                pkgcreater.build(log=log)
+                artifact = Path(pkgcreater.artifact).absolute()
+            result = {'type': "result", 'ok': True}
+        except Exception as e:
+            artifact = None
+            result = {'type': "result", 'ok': False, 'error': str(e)}
+        finally:
+            if pkg:
+                # the workdir may be on a scratch root outside of the root
+                pkg.clean()
+                wait_removals()
+            os.chdir(cwd)
+
+        if logpath.exists():
+            result['log'] = logpath.read_text(errors="replace")
+        return result, artifact
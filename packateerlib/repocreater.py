@@ -4,8 +4,9 @@ import shutil
 from contextlib import suppress
 from glob import glob
 from packateerlib import Dist, Metadata
+from packateerlib.indexcache import IndexCache
+from packateerlib.trace import run
 from pathlib import Path
-from subprocess import run
 from typing import Dict
 
 class RepoCreater(object):
@@ -67,25 +68,124 @@ class RepoCreater(object):
 
         self._repodata = repodata
 
-    def build(self) -> None:
-        """Creates the repository.
+    @classmethod
+    def for_dist(cls, dist: Dist, conf: Metadata) -> 'RepoCreater':
+        """Chooses the repository creator for the backend that is configured
+        for the distribution. Dists of rpm packages get a yum repository,
+        which only the native backend writes.
+
+        Args:
+            dist (Dist): Distribution to build the repository for.
+            conf (Metadata): Metadata configuration of this project.
+
+        Returns:
+            RepoCreater: Repository creator for the configured backend.
+
+        Raises:
+            ValueError: If the backend is unknown or can't hold the packages
+                of the dist.
+
+        """
+        if dist.metadata.get('pkgformat') == "rpm":
+            backend = dist.metadata.get('repobackend', "native")
+            if backend != "native":
+                raise ValueError("Repository backend {} can't hold rpm "
+                        "packages, use native".format(backend))
+            from packateerlib import RpmRepoCreater # avoid circular dependency
+            return RpmRepoCreater(dist=dist, conf=conf)
+
+        backend = dist.metadata.get('repobackend', "reprepro")
+        if backend == "reprepro":
+            return cls(dist=dist, conf=conf)
+        elif backend == "native":
+            from packateerlib import AptRepoCreater # avoid circular dependency
+            return AptRepoCreater(dist=dist, conf=conf)
+
+        raise ValueError("Unknown repository backend: {}".format(backend))
+
+    def _publish(self, path: str, poolfile: Path) -> None:
+        """Puts a package into the pool of a repository, hardlinked if
+        possible.
+
+        Args:
+            path (str): Path to the package file.
+            poolfile (Path): Path of the package inside the pool.
+
+        """
+        if poolfile.exists() and os.path.samefile(path, str(poolfile)):
+            return
+
+        poolfile.parent.mkdir(parents=True, exist_ok=True)
+        tmp = poolfile.with_name(poolfile.name + ".tmp")
+        with suppress(FileNotFoundError):
+            tmp.unlink()
+        try:
+            os.link(path, str(tmp))
+        except OSError: # different file systems
+            shutil.copy2(path, str(tmp))
+        os.replace(str(tmp), str(poolfile))
+
+    def _reprepro(self, command: str, *args: str) -> None:
+        """Runs a reprepro command on the repository.
+
+        Args:
+            command (str): The reprepro command.
+            *args (str): Arguments of the command.
+
+        """
+        cmd = ("reprepro --ask-passphrase --basedir {} {} {} {}"
+                .format(self._repopath, command, self._repodata['Codename'],
+                    " ".join(shlex.quote(arg) for arg in args)))
+
+        run(shlex.split(cmd), check=True)
+
+    def build(self, force: bool = False) -> None:
+        """Creates the repository or updates an existing one. Only new and
+        changed packages are included and packages that are no longer built
+        are removed. The repository is created from scratch when its
+        configuration changed.
+
+        Args:
+            force (bool): Always create the repository from scratch.
 
         """
-        # clean old repo
-        shutil.rmtree(self._repopath, ignore_errors=True)
-        (self._repopath / "conf").mkdir(parents=True, exist_ok=True)
-
-        # write repo configuration
-        with open(self._repopath / "conf" / "distributions", 'w') as f:
-            for key, val in self._repodata.items():
-                f.write("{}: {}\n".format(key, val))
-
-        # create and execute command for repo building
-        debs = glob(str(self._dist._distpath / "*.deb"))
-        print(debs)
-        cmd = ("reprepro --ask-passphrase --basedir {} includedeb {} {}"
-                .format(self._repopath,
-                    self._repodata['Codename'],
-                    " ".join(debs)))
-
-        run(shlex.split(cmd))
+        from packateerlib.deb import parse_control, read_control
+
+        distributions = "".join("{}: {}\n".format(key, val)
+                for key, val in self._repodata.items())
+        conf_file = self._repopath / "conf" / "distributions"
+        state_file = self._repopath / "db" / "packateer.json"
+
+        if (force or not state_file.exists() or not conf_file.exists()
+                or conf_file.read_text() != distributions):
+            # clean old repo
+            shutil.rmtree(self._repopath, ignore_errors=True)
+            (self._repopath / "conf").mkdir(parents=True, exist_ok=True)
+
+            # write repo configuration
+            with open(conf_file, 'w') as f:
+                f.write(distributions)
+
+        state = IndexCache(state_file)
+
+        names = {deb: state.get(deb)
+                for deb in sorted(glob(str(self._dist.distpath / "*.deb")))}
+
+        # changed packages are removed as well, because reprepro refuses to
+        # include the same version with a different checksum
+        removed = sorted(set(state.unused().values()))
+        if removed:
+            self._reprepro("remove", *removed)
+
+        # find new and changed packages, the others are already included.
+        # reprepro removes every architecture of a package, so the debs that
+        # share the name of a removed one are included again as well.
+        debs = [deb for deb, name in names.items()
+                if name is None or name in removed]
+
+        if debs:
+            self._reprepro("includedeb", *debs)
+            for deb in debs:
+                state.put(deb, parse_control(read_control(deb))['Package'])
+
+        state.save()
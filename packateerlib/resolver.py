@@ -0,0 +1,235 @@
+import sys
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from packateerlib.filecache import FileCache, PackageIndex
+
+
+class DistError(ValueError):
+
+    """Raised for a dist hierarchy with unknown parents or cycles."""
+
+
+class Resolver(object):
+
+    """Compiles the dist hierarchy of a metadata configuration once. Every
+    merge is memoized by the order of the dists it covers, so dists that share
+    parents also share the merged parent data and resolving a (dist, package)
+    pair becomes a dictionary lookup."""
+
+    def __init__(self, data: Dict, pkgpath: Path, files: FileCache) -> None:
+        """Resolves the order of all configured dists.
+
+        Args:
+            data (dict): Loaded data from the metadata file.
+            pkgpath (Path): Path to the directory with the packages.
+            files (FileCache): Cache for the control files of the packages.
+
+        Raises:
+            DistError: If a dist has an unknown parent or is its own ancestor.
+
+        """
+        self._data = data
+        self._pkgpath = pkgpath
+        self._files = files
+
+        self._orders: Dict[str, Tuple[str, ...]] = dict()
+        self._dist_metadata: Dict[Tuple[str, ...], Dict[str, Any]] = dict()
+        self._packages: Dict[Tuple[str, Tuple[str, ...]],
+                Tuple[Dict[str, Any], Dict[str, Any]]] = dict()
+        # listings of the packages, kept as long as their merged data
+        self._indexes: Dict[str, PackageIndex] = dict()
+
+        for name in self._dists():
+            self.order(name)
+
+    def _dists(self) -> Dict[str, Any]:
+        return self._data.get('dists') or dict()
+
+    def _dist(self, name: str) -> Dict[str, Any]:
+        return self._dists().get(name) or dict()
+
+    def order(self, name: str) -> List[str]:
+        """Hierarchical order of a distribution and all its parents.
+
+        Args:
+            name (str): Name of the distribution.
+
+        Returns:
+            list: The distribution, its parents and finally alldists.
+
+        Raises:
+            DistError: If a dist has an unknown parent or is its own ancestor.
+
+        """
+        chain: List[str] = list()
+        curdist = name
+        while curdist not in self._orders:
+            if curdist in chain:
+                raise DistError("Cyclic parents of dist {}: {}".format(
+                    name, " -> ".join(chain + [curdist])))
+            chain.append(curdist)
+
+            parent = self._dist(curdist).get("parent")
+            if not parent:
+                # alldists is the base of all dists
+                self._orders[curdist] = (curdist, "alldists")
+                chain.pop()
+                break
+            if parent not in self._dists() and parent != "alldists":
+                raise DistError("Unknown parent of dist {}: {}".format(
+                    curdist, parent))
+            curdist = parent
+
+        # the dists of the chain inherit the order of the last one
+        for dist in reversed(chain):
+            self._orders[dist] = (dist,) + self._orders[curdist]
+            curdist = dist
+
+        return list(self._orders[name])
+
+    def dist_metadata(self, order: List[str]) -> Dict[str, Any]:
+        """Merged distribution specific variables along a dist order. The
+        returned data is shared and must not be modified.
+
+        Args:
+            order (list): Hierarchical order of the distribution.
+
+        Returns:
+            dict: Distribution specific variables.
+
+        """
+        from packateerlib import Dist # avoid circular dependency
+
+        key = tuple(order)
+        if key in self._dist_metadata:
+            return self._dist_metadata[key]
+
+        if key:
+            data = dict(self.dist_metadata(order[1:]))
+            for dist_key in Dist.distkeys:
+                with suppress(KeyError):
+                    data[dist_key] = self._dist(order[0])[dist_key]
+        else:
+            data = dict()
+
+        self._dist_metadata[key] = data
+        return data
+
+    def _control(self, pkgname: str, distname: str) -> Dict[str, Any]:
+        """Loads the control file of a package for a distribution.
+
+        Args:
+            pkgname (str): Name of the package.
+            distname (str): Name of the distribution.
+
+        Returns:
+            dict: Content of the control file, empty if there is none.
+
+        """
+        if pkgname not in self._indexes:
+            self._indexes[pkgname] = self._files.index(self._pkgpath / pkgname)
+        control_file = self._indexes[pkgname].meta_file(distname,
+                "control.yaml")
+        if not control_file:
+            return dict()
+
+        try:
+            control = self._files.yaml(control_file) or dict()
+            if not isinstance(control, dict):
+                raise ValueError("{} contains no key-value data"
+                        .format(control_file))
+            return control
+        except Exception as e:
+            # there is no file with loadable data
+            print(e, file=sys.stderr)
+            return dict()
+
+    def _package(self, pkgname: str, order: List[str]
+            ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Merges metadata and vars of a package along a dist order, the
+        vars are still part of the metadata.
+
+        Args:
+            pkgname (str): Name of the package.
+            order (list): Hierarchical order of the distribution.
+
+        Returns:
+            tuple: Metadata and vars of the package.
+
+        """
+        key = (pkgname, tuple(order))
+        if key in self._packages:
+            return self._packages[key]
+
+        if not order:
+            # top level package data is the base of all dists
+            package = (self._data.get('packages') or dict()).get(pkgname) \
+                    or dict()
+            metadata = dict(package)
+            variables = dict(self._data.get("vars") or dict())
+            variables.update(package.get('vars') or dict())
+        else:
+            cur_dist = order[0]
+            metadata, variables = self._package(pkgname, order[1:])
+            metadata, variables = dict(metadata), dict(variables)
+
+            dist = self._dist(cur_dist)
+            override = (dist.get("packages") or dict()).get(pkgname) or dict()
+            control = self._control(pkgname, cur_dist)
+
+            metadata.update(override)
+            metadata.update(control)
+
+            variables.update(dist.get("vars") or dict())
+            variables.update(override.get("vars") or dict())
+            variables.update(control.get("vars") or dict())
+
+        self._packages[key] = (metadata, variables)
+        return metadata, variables
+
+    def forget(self, pkgname: str) -> None:
+        """Drops the merged data of a package, so that changed control files
+        are read again.
+
+        Args:
+            pkgname (str): Name of the package.
+
+        """
+        for key in [key for key in self._packages if key[0] == pkgname]:
+            del self._packages[key]
+        self._indexes.pop(pkgname, None)
+
+    def package_metadata(self, pkgname: str, order: List[str]
+            ) -> Dict[str, Any]:
+        """Merged metadata of a package, the vars are handled separately. The
+        returned data is shared and must not be modified.
+
+        Args:
+            pkgname (str): Name of the package.
+            order (list): Hierarchical order of the distribution.
+
+        Returns:
+            dict: The metadata of the package.
+
+        """
+        metadata = self._package(pkgname, order)[0]
+        if metadata.get('vars'):
+            metadata = {key: val for key, val in metadata.items()
+                    if key != 'vars'}
+        return metadata
+
+    def package_vars(self, pkgname: str, order: List[str]) -> Dict[str, Any]:
+        """Merged vars of a package. The returned data is shared and must not
+        be modified.
+
+        Args:
+            pkgname (str): Name of the package.
+            order (list): Hierarchical order of the distribution.
+
+        Returns:
+            dict: The vars of the package.
+
+        """
+        return self._package(pkgname, order)[1]
@@ -0,0 +1,236 @@
+import hashlib
+import os
+import struct
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Tuple
+
+LEAD_SIZE = 96
+LEAD_MAGIC = b"\xed\xab\xee\xdb"
+HEADER_MAGIC = b"\x8e\xad\xe8\x01"
+
+# data types of header entries
+RPM_CHAR = 1
+RPM_INT8 = 2
+RPM_INT16 = 3
+RPM_INT32 = 4
+RPM_INT64 = 5
+RPM_STRING = 6
+RPM_BIN = 7
+RPM_STRING_ARRAY = 8
+RPM_I18NSTRING = 9
+
+_int_formats = {RPM_CHAR: "B", RPM_INT8: "B", RPM_INT16: "H", RPM_INT32: "I",
+        RPM_INT64: "Q"}
+
+# header tags, see rpmtag.h
+TAGS: Dict[str, int] = {
+        'name': 1000, 'version': 1001, 'release': 1002, 'epoch': 1003,
+        'summary': 1004, 'description': 1005, 'buildtime': 1006,
+        'buildhost': 1007, 'size': 1009, 'vendor': 1011, 'license': 1014,
+        'packager': 1015, 'group': 1016, 'url': 1020, 'arch': 1022,
+        'filesizes': 1028, 'filemodes': 1030, 'fileflags': 1037,
+        'sourcerpm': 1044, 'archivesize': 1046, 'providename': 1047,
+        'requireflags': 1048, 'requirename': 1049, 'requireversion': 1050,
+        'conflictflags': 1053, 'conflictname': 1054, 'conflictversion': 1055,
+        'changelogtime': 1080, 'changelogname': 1081, 'changelogtext': 1082,
+        'obsoletename': 1090, 'provideflags': 1112, 'provideversion': 1113,
+        'obsoleteflags': 1114, 'obsoleteversion': 1115, 'dirindexes': 1116,
+        'basenames': 1117, 'dirnames': 1118, 'oldfilenames': 1027,
+        }
+
+# parts of the dependency flags
+RPMSENSE_LESS = 2
+RPMSENSE_GREATER = 4
+RPMSENSE_EQUAL = 8
+RPMSENSE_PREREQ = 64
+RPMSENSE_SCRIPT_PRE = 512
+RPMSENSE_SCRIPT_POST = 1024
+
+RPMFILE_GHOST = 64
+
+
+class RpmError(Exception):
+
+    """Raised when a file is no valid rpm package."""
+
+
+def _read(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise RpmError("Truncated rpm file")
+    return data
+
+
+def read_header(stream: BinaryIO) -> Tuple[bytes, int]:
+    """Reads a header structure, the signature or the main header.
+
+    Args:
+        stream (BinaryIO): Stream positioned at the header.
+
+    Returns:
+        tuple: The raw header, index and data store, and its length.
+
+    Raises:
+        RpmError: If there is no header at the position.
+
+    """
+    intro = _read(stream, 16)
+    if intro[:4] != HEADER_MAGIC:
+        raise RpmError("No rpm header")
+    count, size = struct.unpack(">II", intro[8:])
+    return intro + _read(stream, count * 16 + size), 16 + count * 16 + size
+
+
+def parse_header(data: bytes) -> Dict[int, Any]:
+    """Decodes the entries of a header structure.
+
+    Args:
+        data (bytes): Header as returned by read_header.
+
+    Returns:
+        dict: Value of every tag, lists for arrays and strings for strings.
+
+    """
+    count, _ = struct.unpack(">II", data[8:16])
+    store = 16 + count * 16
+    entries: Dict[int, Any] = dict()
+
+    for num in range(count):
+        tag, kind, offset, items = struct.unpack(">iIiI",
+                data[16 + num * 16:32 + num * 16])
+        start = store + offset
+        if kind in _int_formats:
+            fmt = ">{}{}".format(items, _int_formats[kind])
+            entries[tag] = list(struct.unpack_from(fmt, data, start))
+        elif kind == RPM_BIN:
+            entries[tag] = data[start:start + items]
+        elif kind in (RPM_STRING, RPM_STRING_ARRAY, RPM_I18NSTRING):
+            values = list()
+            for _ in range(items):
+                end = data.index(b"\0", start)
+                values.append(data[start:end].decode("utf-8", "replace"))
+                start = end + 1
+            entries[tag] = values[0] if kind == RPM_STRING else values
+    return entries
+
+
+def _dependencies(header: Dict[int, Any], kind: str) -> List[Dict[str, Any]]:
+    """Collects the dependencies of one kind, like requires.
+
+    Returns:
+        list: Name, flags and version of every dependency.
+
+    """
+    names = header.get(TAGS[kind + 'name'], list())
+    flags = header.get(TAGS[kind + 'flags'], [0] * len(names))
+    versions = header.get(TAGS[kind + 'version'], [""] * len(names))
+    return [{'name': name, 'flags': flag, 'version': version}
+            for name, flag, version in zip(names, flags, versions)]
+
+
+def _files(header: Dict[int, Any]) -> List[Tuple[str, str]]:
+    """Collects the files of a package.
+
+    Returns:
+        list: Path and type (file, dir or ghost) of every file.
+
+    """
+    if TAGS['basenames'] in header:
+        dirnames = header[TAGS['dirnames']]
+        paths = [dirnames[index] + name for index, name in
+                zip(header[TAGS['dirindexes']], header[TAGS['basenames']])]
+    else:
+        paths = header.get(TAGS['oldfilenames'], list())
+
+    modes = header.get(TAGS['filemodes'], [0] * len(paths))
+    flags = header.get(TAGS['fileflags'], [0] * len(paths))
+    files = list()
+    for path, mode, flag in zip(paths, modes, flags):
+        if flag & RPMFILE_GHOST:
+            kind = "ghost"
+        elif mode & 0o170000 == 0o040000:
+            kind = "dir"
+        else:
+            kind = "file"
+        files.append((path, kind))
+    return files
+
+
+def read_package(path: Path) -> Dict[str, Any]:
+    """Reads everything a repository needs to know about an rpm package. Only
+    the headers are parsed, the payload is just hashed while streaming
+    through it.
+
+    Args:
+        path (Path): Path to the rpm file.
+
+    Returns:
+        dict: Package data, with the tag values, the sha256 checksum of the
+            file and the byte range of the main header.
+
+    Raises:
+        RpmError: If the file is no valid rpm package.
+
+    """
+    hasher = hashlib.sha256()
+    with open(str(path), 'rb') as stream:
+        lead = _read(stream, LEAD_SIZE)
+        if lead[:4] != LEAD_MAGIC:
+            raise RpmError("{} is no rpm file".format(path))
+        _, sigsize = read_header(stream)
+        # the main header is aligned to 8 bytes
+        padding = (8 - sigsize % 8) % 8
+        _read(stream, padding)
+        start = LEAD_SIZE + sigsize + padding
+        data, size = read_header(stream)
+
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(1 << 20), b""):
+            hasher.update(chunk)
+        stat = os.fstat(stream.fileno())
+
+    header = parse_header(data)
+
+    def value(tag: str, default: Any = "") -> Any:
+        val = header.get(TAGS[tag], default)
+        if isinstance(val, list):
+            # numbers and translated strings, only the first one counts
+            return val[0] if val else default
+        return val
+
+    if TAGS['name'] not in header:
+        raise RpmError("{} has no package name".format(path))
+
+    return {
+            'name': value('name'),
+            'arch': value('arch'),
+            'epoch': value('epoch', 0),
+            'version': value('version'),
+            'release': value('release'),
+            'summary': value('summary'),
+            'description': value('description'),
+            'packager': value('packager'),
+            'url': value('url'),
+            'license': value('license'),
+            'vendor': value('vendor'),
+            'group': value('group'),
+            'buildhost': value('buildhost'),
+            'sourcerpm': value('sourcerpm'),
+            'buildtime': value('buildtime', 0),
+            'installed_size': value('size', 0),
+            'archive_size': value('archivesize', 0),
+            'filetime': int(stat.st_mtime),
+            'filesize': stat.st_size,
+            'sha256': hasher.hexdigest(),
+            'header_range': [start, start + size],
+            'provides': _dependencies(header, 'provide'),
+            'requires': _dependencies(header, 'require'),
+            'conflicts': _dependencies(header, 'conflict'),
+            'obsoletes': _dependencies(header, 'obsolete'),
+            'files': _files(header),
+            'changelogs': [{'author': author, 'date': date, 'text': text}
+                for author, date, text in zip(
+                    header.get(TAGS['changelogname'], list()),
+                    header.get(TAGS['changelogtime'], list()),
+                    header.get(TAGS['changelogtext'], list()))],
+            }
@@ -0,0 +1,275 @@
+import gzip
+import hashlib
+import os
+import time
+from glob import glob
+from pathlib import Path
+from typing import Any, Dict
+from xml.sax.saxutils import escape, quoteattr
+
+from packateerlib import Dist, Metadata, RepoCreater
+from packateerlib.indexcache import IndexCache
+from packateerlib.rpm import (RPMSENSE_EQUAL, RPMSENSE_GREATER, RPMSENSE_LESS,
+        RPMSENSE_PREREQ, RPMSENSE_SCRIPT_POST, RPMSENSE_SCRIPT_PRE,
+        read_package)
+from packateerlib.trace import run
+
+_flags = {RPMSENSE_LESS: "LT", RPMSENSE_GREATER: "GT", RPMSENSE_EQUAL: "EQ",
+        RPMSENSE_LESS | RPMSENSE_EQUAL: "LE",
+        RPMSENSE_GREATER | RPMSENSE_EQUAL: "GE"}
+
+_namespaces = {
+        'common': "http://linux.duke.edu/metadata/common",
+        'filelists': "http://linux.duke.edu/metadata/filelists",
+        'other': "http://linux.duke.edu/metadata/other",
+        'repo': "http://linux.duke.edu/metadata/repo",
+        'rpm': "http://linux.duke.edu/metadata/rpm",
+        }
+
+
+def _primary_file(path: str) -> bool:
+    """Checks if a file is listed in primary.xml, like createrepo does."""
+    return "bin/" in path or path.startswith("/etc/") or \
+            path == "/usr/lib/sendmail"
+
+
+def _version(package: Dict[str, Any]) -> str:
+    return '<version epoch="{}" ver={} rel={}/>'.format(package['epoch'],
+            quoteattr(package['version']), quoteattr(package['release']))
+
+
+def _entry(dependency: Dict[str, Any]) -> str:
+    """Formats a dependency like foo >= 1:2.0-3.
+
+    Returns:
+        str: The rpm:entry element.
+
+    """
+    attrs = "name=" + quoteattr(dependency['name'])
+    flags = _flags.get(dependency['flags'] & 0xf)
+    if flags and dependency['version']:
+        epoch, _, version = dependency['version'].rpartition(":")
+        version, _, release = version.partition("-")
+        attrs += ' flags="{}" epoch="{}" ver={}'.format(flags, epoch or 0,
+                quoteattr(version))
+        if release:
+            attrs += " rel=" + quoteattr(release)
+    if dependency['flags'] & (RPMSENSE_PREREQ | RPMSENSE_SCRIPT_PRE
+            | RPMSENSE_SCRIPT_POST):
+        attrs += ' pre="1"'
+    return "      <rpm:entry {}/>\n".format(attrs)
+
+
+class RpmRepoCreater(RepoCreater):
+
+    """Creates a yum/dnf repository for rpm dists by writing the repodata
+    directly, without createrepo. The headers of every rpm are cached, so
+    only new and changed rpms are read again."""
+
+    def __init__(self, dist: Dist, conf: Metadata) -> None:
+        """Initializes all variables that are needed to create the Repository.
+
+        Args:
+            dist (Dist): Distribution to build the repository for.
+            conf (Metadata): Metadata configuration of this project.
+
+        """
+        super().__init__(dist=dist, conf=conf)
+        self._cache = IndexCache(self._repopath / "db" / "rpms.json")
+
+    def _scan(self, rpm: str) -> Dict[str, Any]:
+        """Reads the headers and checksum of a package, unchanged packages are
+        served from the cache.
+
+        Args:
+            rpm (str): Path to the package file.
+
+        Returns:
+            dict: The package data.
+
+        """
+        entry = self._cache.get(rpm)
+        if entry:
+            return entry
+
+        entry = read_package(Path(rpm))
+        self._cache.put(rpm, entry)
+        return entry
+
+    @staticmethod
+    def _primary(package: Dict[str, Any], href: str) -> str:
+        xml = '<package type="rpm">\n'
+        xml += "  <name>{}</name>\n".format(escape(package['name']))
+        xml += "  <arch>{}</arch>\n".format(escape(package['arch']))
+        xml += "  {}\n".format(_version(package))
+        xml += ('  <checksum type="sha256" pkgid="YES">{}</checksum>\n'
+                .format(package['sha256']))
+        for field in ('summary', 'description', 'packager', 'url'):
+            xml += "  <{0}>{1}</{0}>\n".format(field, escape(package[field]))
+        xml += '  <time file="{}" build="{}"/>\n'.format(package['filetime'],
+                package['buildtime'])
+        xml += '  <size package="{}" installed="{}" archive="{}"/>\n'.format(
+                package['filesize'], package['installed_size'],
+                package['archive_size'])
+        xml += "  <location href={}/>\n".format(quoteattr(href))
+
+        xml += "  <format>\n"
+        for field in ('license', 'vendor', 'group', 'buildhost', 'sourcerpm'):
+            xml += "    <rpm:{0}>{1}</rpm:{0}>\n".format(field,
+                    escape(package[field]))
+        xml += '    <rpm:header-range start="{}" end="{}"/>\n'.format(
+                *package['header_range'])
+        for kind in ('provides', 'requires', 'conflicts', 'obsoletes'):
+            entries = [dependency for dependency in package[kind]
+                    if not dependency['name'].startswith("rpmlib(")]
+            if entries:
+                xml += "    <rpm:{}>\n".format(kind)
+                xml += "".join("  " + _entry(dependency)
+                        for dependency in entries)
+                xml += "    </rpm:{}>\n".format(kind)
+        for path, kind in package['files']:
+            if _primary_file(path):
+                xml += "    <file{}>{}</file>\n".format("" if kind == "file"
+                        else ' type="{}"'.format(kind), escape(path))
+        xml += "  </format>\n</package>\n"
+        return xml
+
+    @staticmethod
+    def _filelists(package: Dict[str, Any]) -> str:
+        xml = '<package pkgid="{}" name={} arch={}>\n'.format(package['sha256'],
+                quoteattr(package['name']), quoteattr(package['arch']))
+        xml += "  {}\n".format(_version(package))
+        for path, kind in package['files']:
+            xml += "  <file{}>{}</file>\n".format("" if kind == "file"
+                    else ' type="{}"'.format(kind), escape(path))
+        return xml + "</package>\n"
+
+    @staticmethod
+    def _other(package: Dict[str, Any]) -> str:
+        xml = '<package pkgid="{}" name={} arch={}>\n'.format(package['sha256'],
+                quoteattr(package['name']), quoteattr(package['arch']))
+        xml += "  {}\n".format(_version(package))
+        for changelog in package['changelogs']:
+            xml += '  <changelog author={} date="{}">{}</changelog>\n'.format(
+                    quoteattr(changelog['author']), changelog['date'],
+                    escape(changelog['text']))
+        return xml + "</package>\n"
+
+    def _write_data(self, repodata: Path, kind: str, content: bytes
+            ) -> Dict[str, Any]:
+        """Writes a compressed metadata file, named by its checksum.
+
+        Args:
+            repodata (Path): The repodata directory.
+            kind (str): primary, filelists or other.
+            content (bytes): Uncompressed XML.
+
+        Returns:
+            dict: Values for repomd.xml.
+
+        """
+        data = gzip.compress(content, mtime=0)
+        checksum = hashlib.sha256(data).hexdigest()
+        path = repodata / "{}-{}.xml.gz".format(checksum, kind)
+        if not path.exists():
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(data)
+            os.replace(str(tmp), str(path))
+
+        return {
+                'checksum': checksum,
+                'open-checksum': hashlib.sha256(content).hexdigest(),
+                'location': path.relative_to(repodata.parent),
+                'size': len(data),
+                'open-size': len(content),
+                }
+
+    def build(self, force: bool = False) -> None:
+        """Creates the repository, the packages go into Packages/ and the
+        metadata into repodata/.
+
+        Args:
+            force (bool): Read all packages again instead of using the cached
+                headers.
+
+        """
+        if force:
+            self._cache.clear()
+
+        pool = self._repopath / "Packages"
+        repodata = self._repopath / "repodata"
+        repodata.mkdir(parents=True, exist_ok=True)
+
+        primary, filelists, other = list(), list(), list()
+        published = set()
+        for rpm in sorted(glob(str(self._dist.distpath / "*.rpm"))):
+            package = self._scan(rpm)
+            poolfile = pool / os.path.basename(rpm)
+            self._publish(rpm, poolfile)
+            published.add(poolfile.name)
+
+            href = str(poolfile.relative_to(self._repopath))
+            primary.append(self._primary(package, href))
+            filelists.append(self._filelists(package))
+            other.append(self._other(package))
+
+        # drop packages that are no longer built
+        if pool.exists():
+            for poolfile in pool.iterdir():
+                if poolfile.name not in published:
+                    poolfile.unlink()
+
+        count = len(primary)
+        head = '<?xml version="1.0" encoding="UTF-8"?>\n'
+        files = {
+                'primary': head + ('<metadata xmlns="{common}" '
+                    'xmlns:rpm="{rpm}" '.format(**_namespaces) +
+                    'packages="{}">\n'.format(count) + "".join(primary) +
+                    "</metadata>\n"),
+                'filelists': head + ('<filelists xmlns="{filelists}" '
+                    .format(**_namespaces) + 'packages="{}">\n'.format(count)
+                    + "".join(filelists) + "</filelists>\n"),
+                'other': head + ('<otherdata xmlns="{other}" '
+                    .format(**_namespaces) + 'packages="{}">\n'.format(count)
+                    + "".join(other) + "</otherdata>\n"),
+                }
+
+        timestamp = int(time.time())
+        repomd = head + '<repomd xmlns="{repo}" xmlns:rpm="{rpm}">\n'.format(
+                **_namespaces)
+        repomd += "  <revision>{}</revision>\n".format(timestamp)
+        written = set()
+        for kind, content in files.items():
+            data = self._write_data(repodata, kind, content.encode())
+            written.add(data['location'].name)
+            repomd += '  <data type="{}">\n'.format(kind)
+            for field in ('checksum', 'open-checksum'):
+                repomd += '    <{0} type="sha256">{1}</{0}>\n'.format(field,
+                        data[field])
+            repomd += '    <location href="{}"/>\n'.format(data['location'])
+            repomd += "    <timestamp>{}</timestamp>\n".format(timestamp)
+            for field in ('size', 'open-size'):
+                repomd += "    <{0}>{1}</{0}>\n".format(field, data[field])
+            repomd += "  </data>\n"
+        repomd += "</repomd>\n"
+
+        repomd_file = repodata / "repomd.xml"
+        tmp = repomd_file.with_name("repomd.xml.tmp")
+        tmp.write_text(repomd)
+        os.replace(str(tmp), str(repomd_file))
+
+        signature = repodata / "repomd.xml.asc"
+        if self._repodata.get('SignWith'):
+            run(["gpg", "--batch", "--yes", "--local-user",
+                self._repodata['SignWith'], "--armor", "--detach-sign",
+                "--output", str(signature), str(repomd_file)], check=True)
+        elif signature.exists():
+            # would no longer match the metadata
+            signature.unlink()
+
+        # metadata of earlier runs, after clients can see the new one
+        for path in repodata.iterdir():
+            if path.name.endswith(".xml.gz") and path.name not in written:
+                path.unlink()
+
+        self._cache.save()
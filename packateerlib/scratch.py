@@ -0,0 +1,110 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from contextlib import suppress
+from pathlib import Path
+from typing import List
+
+from packateerlib.overlay import overlay
+
+# deletions still running in the background
+_removals: List[threading.Thread] = list()
+_lock = threading.Lock()
+
+
+def _trash_name(path: Path) -> Path:
+    return path.with_name(".{}.trash-{}".format(path.name, uuid.uuid4().hex))
+
+
+def remove_later(path: Path) -> None:
+    """Removes a directory in the background. The directory is renamed aside
+    first, so its path can be used again right away. If the path is a
+    symbolic link, the link is removed and the directory it points to is
+    deleted. Leftovers of deletions that were interrupted are removed as
+    well.
+
+    Args:
+        path (Path): Directory or link to a directory, ignored if missing.
+
+    """
+    path = Path(path)
+    if path.is_symlink():
+        target = Path(os.readlink(str(path)))
+        path.unlink()
+        path = path.parent / target
+    if not path.parent.is_dir():
+        return
+
+    trash = list(path.parent.glob(".{}.trash-*".format(path.name)))
+    with suppress(FileNotFoundError):
+        moved = _trash_name(path)
+        os.rename(str(path), str(moved))
+        trash.append(moved)
+    if not trash:
+        return
+
+    def remove() -> None:
+        for directory in trash:
+            shutil.rmtree(str(directory), ignore_errors=True)
+
+    # not a daemon thread, the deletion finishes before the program exits
+    thread = threading.Thread(target=remove, name="remove " + path.name)
+    with _lock:
+        _removals[:] = [cur for cur in _removals if cur.is_alive()]
+        _removals.append(thread)
+    thread.start()
+
+
+def wait_removals() -> None:
+    """Waits until all background deletions are done."""
+    with _lock:
+        removals = list(_removals)
+        _removals.clear()
+    for thread in removals:
+        thread.join()
+
+
+def tree_size(layers: List[Path]) -> int:
+    """Calculates the size of the files that are assembled from layers.
+
+    Args:
+        layers (list): Directories, files of later ones replace earlier ones.
+
+    Returns:
+        int: Size of all files in bytes.
+
+    """
+    files, _ = overlay(layers)
+    size = 0
+    for path in files.values():
+        with suppress(OSError):
+            size += path.stat().st_size
+    return size
+
+
+def scratch_dir(root: Path, pkgpath: Path, distname: str,
+        size: int) -> Path:
+    """Chooses a directory below a scratch root, like a tmpfs, for the
+    workdir of a package.
+
+    Args:
+        root (Path): Scratch root of the package.
+        pkgpath (Path): Directory of the package.
+        distname (str): Name of the dist the package is built for.
+        size (int): Expected size of the workdir in bytes.
+
+    Returns:
+        Path: The directory, None if the scratch root doesn't have enough
+            free space.
+
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    if shutil.disk_usage(str(root)).free < size:
+        return None
+
+    # packages of different projects may have the same name
+    project = hashlib.sha1(str(Path(pkgpath).absolute()).encode()).hexdigest()
+    return root / "{}-{}".format(Path(pkgpath).name, project[:12]) / distname
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, List
+
+
+class SourceError(Exception):
+
+    """Raised when a source can't be downloaded or has the wrong checksum."""
+
+
+def check_sources(sources: List[Dict[str, str]]) -> None:
+    """Checks the source declarations of a package.
+
+    Args:
+        sources (list): Source declarations with url, sha256 and an optional
+            file name.
+
+    Raises:
+        SourceError: If a declaration is incomplete.
+
+    """
+    if not isinstance(sources, list):
+        raise SourceError("sources must be a list")
+
+    for source in sources:
+        if not isinstance(source, dict) or not source.get('url') \
+                or not source.get('sha256'):
+            raise SourceError("Source without url or sha256: {}"
+                    .format(source))
+
+
+def source_name(source: Dict[str, str]) -> str:
+    """File name of a source inside the sources directory of a build.
+
+    Args:
+        source (dict): Source declaration.
+
+    Returns:
+        str: The declared name or the last part of the url.
+
+    """
+    return source.get('name') or \
+            os.path.basename(urllib.request.urlparse(source['url']).path)
+
+
+class SourceCache(object):
+
+    """Content addressed cache for the files that build scripts need. Every
+    file is stored by its sha256 checksum, so it is downloaded once per
+    machine, no matter how many dists and packages use it."""
+
+    def __init__(self, root: Path, jobs: int = 8, timeout: float = 30) -> None:
+        """Initializes the cache.
+
+        Args:
+            root (Path): Directory of the cache.
+            jobs (int): Number of parallel downloads.
+            timeout (float): Seconds without data after which a download
+                fails.
+
+        """
+        self._root = Path(root)
+        self._jobs = jobs
+        self._timeout = timeout
+
+    def path(self, sha256: str) -> Path:
+        """Path of a file inside the cache.
+
+        Args:
+            sha256 (str): Checksum of the file.
+
+        Returns:
+            Path: Where the file is stored.
+
+        """
+        return self._root / "sha256" / sha256.lower()
+
+    def fetch(self, source: Dict[str, str]) -> Path:
+        """Downloads a source into the cache, unless it is already there.
+
+        Args:
+            source (dict): Source declaration with url and sha256.
+
+        Returns:
+            Path: Path to the verified file in the cache.
+
+        Raises:
+            SourceError: If the download fails or the checksum doesn't match.
+
+        """
+        target = self.path(source['sha256'])
+        if target.exists():
+            return target
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmpname = tempfile.mkstemp(dir=str(target.parent), suffix=".tmp")
+        try:
+            hasher = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as stream, \
+                    urllib.request.urlopen(source['url'],
+                        timeout=self._timeout) as response:
+                for chunk in iter(lambda: response.read(1 << 20), b""):
+                    hasher.update(chunk)
+                    stream.write(chunk)
+
+            if hasher.hexdigest() != source['sha256'].lower():
+                raise SourceError("Checksum mismatch for {}: expected {}, got "
+                        "{}".format(source['url'], source['sha256'],
+                            hasher.hexdigest()))
+
+            os.chmod(tmpname, 0o444)
+            os.replace(tmpname, str(target))
+        except SourceError:
+            raise
+        except Exception as e:
+            raise SourceError("Can't download {}: {}".format(
+                source['url'], e)) from e
+        finally:
+            with suppress(FileNotFoundError):
+                os.unlink(tmpname)
+
+        return target
+
+    def prefetch(self, sources: List[Dict[str, str]]) -> Dict[str, str]:
+        """Downloads several sources at the same time. Each checksum is only
+        downloaded once.
+
+        Args:
+            sources (list): Source declarations.
+
+        Returns:
+            dict: Error message per checksum of every failed download, in
+                lower case, so every url of a checksum is covered.
+
+        """
+        unique = {source['sha256'].lower(): source for source in sources}
+        errors: Dict[str, str] = dict()
+
+        def fetch(source):
+            try:
+                self.fetch(source)
+            except SourceError as e:
+                errors[source['sha256'].lower()] = str(e)
+
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            list(executor.map(fetch, unique.values()))
+
+        return errors
+
+    def link(self, sources: List[Dict[str, str]], target: Path) -> None:
+        """Creates a directory with links to the cached sources, named like
+        the sources.
+
+        Args:
+            sources (list): Source declarations.
+            target (Path): Directory to create, replaced if it exists.
+
+        """
+        shutil.rmtree(str(target), ignore_errors=True)
+        target.mkdir(parents=True)
+        for source in sources:
+            (target / source_name(source)).symlink_to(self.fetch(source))
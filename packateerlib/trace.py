@@ -0,0 +1,192 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+# the active tracer, spans are only recorded while one is set
+_tracer = None
+_local = threading.local()
+
+
+class Tracer(object):
+
+    """Records timed spans of a run. Every span has the wall time, the CPU
+    time of the child processes started inside of it and the bytes it
+    wrote. The spans are written in the Chrome trace event format, which
+    Perfetto and chrome://tracing can load."""
+
+    def __init__(self) -> None:
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._spans: List[Dict[str, Any]] = list()
+        # the thread that started tracing is shown first
+        self._threads: Dict[int, int] = {threading.get_ident(): 1}
+
+    @property
+    def spans(self) -> List[Dict[str, Any]]:
+        """All finished spans, in the order they finished."""
+        return self._spans
+
+    def _now(self) -> float:
+        """Microseconds since the tracer was created."""
+        return (time.perf_counter() - self._start) * 1e6
+
+    def _record(self, span: Dict[str, Any]) -> None:
+        """Adds a finished span.
+
+        Args:
+            span (dict): The span.
+
+        """
+        ident = threading.get_ident()
+        with self._lock:
+            span['tid'] = self._threads.setdefault(ident,
+                    len(self._threads) + 1)
+            self._spans.append(span)
+
+    def events(self) -> Dict[str, Any]:
+        """All spans as Chrome trace events.
+
+        Returns:
+            dict: The trace, ready to be written as JSON.
+
+        """
+        pid = os.getpid()
+        events = [dict(name="thread_name", ph="M", pid=pid, tid=tid,
+            args=dict(name="main" if tid == 1 else "job {}".format(tid - 1)))
+            for tid in sorted(self._threads.values())]
+
+        for span in self._spans:
+            events.append(dict(name=span['name'], cat=span['cat'], ph="X",
+                ts=round(span['ts'], 3), dur=round(span['dur'], 3), pid=pid,
+                tid=span['tid'], args=dict(span['args'],
+                    cpu_children_ms=round(span['cpu'] * 1000, 3),
+                    bytes_written=span['bytes'])))
+
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def write(self, path: str) -> None:
+        """Writes the trace to a file.
+
+        Args:
+            path (str): Path of the trace file.
+
+        """
+        with open(path, 'w') as stream:
+            json.dump(self.events(), stream)
+
+    def summary(self, limit: int = 10) -> str:
+        """Table of the slowest steps of the run. Spans that only group
+        other spans are left out.
+
+        Args:
+            limit (int): Maximum number of rows.
+
+        Returns:
+            str: The table.
+
+        """
+        steps = [span for span in self._spans if span['cat'] != "package"]
+        steps.sort(key=lambda span: span['dur'], reverse=True)
+
+        lines = ["{:<24} {:<32} {:>10} {:>10} {:>12}".format("step",
+            "dist/package", "wall (s)", "cpu (s)", "bytes")]
+        for span in steps[:limit]:
+            args = span['args']
+            pair = "/".join(str(args[key]) for key in ("dist", "package")
+                    if key in args)
+            lines.append("{:<24} {:<32} {:>10.3f} {:>10.3f} {:>12}".format(
+                span['name'], pair or "-", span['dur'] / 1e6, span['cpu'],
+                span['bytes']))
+        return "\n".join(lines)
+
+
+def start() -> Tracer:
+    """Starts recording spans for the rest of the run.
+
+    Returns:
+        Tracer: The tracer that records the spans.
+
+    """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop() -> None:
+    """Stops recording spans."""
+    global _tracer
+    _tracer = None
+
+
+@contextmanager
+def span(name: str, cat: str, **args: Any) -> Iterator[Dict[str, Any]]:
+    """Records the enclosed code as a span, if tracing was started.
+
+    Args:
+        name (str): Name of the step.
+        cat (str): Category of the step.
+        **args: Additional information, like dist and package.
+
+    Yields:
+        dict: The span, the enclosed code can add to its 'bytes'.
+
+    """
+    tracer = _tracer
+    current: Dict[str, Any] = dict(name=name, cat=cat, args=args, cpu=0.0,
+            bytes=0)
+    if tracer is None:
+        yield current
+        return
+
+    stack = _local.__dict__.setdefault('stack', list())
+    stack.append(current)
+    current['ts'] = tracer._now()
+    try:
+        yield current
+    finally:
+        current['dur'] = tracer._now() - current['ts']
+        stack.pop()
+        if stack:
+            stack[-1]['cpu'] += current['cpu']
+            stack[-1]['bytes'] += current['bytes']
+        tracer._record(current)
+
+
+def run(args: List[Any], check: bool = False,
+        **kwargs: Any) -> subprocess.CompletedProcess:
+    """Runs a command like subprocess.run. While tracing, the CPU time and
+    the disk writes of the command are added to the innermost span.
+
+    Args:
+        args (list): The command.
+        check (bool): Raise CalledProcessError if the command fails.
+        **kwargs: Further arguments of subprocess.Popen, output can't be
+            captured.
+
+    Returns:
+        subprocess.CompletedProcess: The finished command.
+
+    """
+    stack = getattr(_local, 'stack', None)
+    if _tracer is None or not stack:
+        return subprocess.run(args, check=check, **kwargs)
+
+    with subprocess.Popen(args, **kwargs) as process:
+        try:
+            # reap the process here, to get its resource usage
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+        except BaseException:
+            process.kill()
+            raise
+
+    stack[-1]['cpu'] += usage.ru_utime + usage.ru_stime
+    stack[-1]['bytes'] += usage.ru_oublock * 512
+
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args)
+    return subprocess.CompletedProcess(args, process.returncode)
@@ -0,0 +1,243 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Set, Tuple
+
+# inotify event flags, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+        | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+_EVENT = struct.Struct("iIII")
+
+
+def _libc():
+    """Loads the C library if it provides inotify.
+
+    Returns:
+        The C library, None if inotify isn't available.
+
+    """
+    name = ctypes.util.find_library("c")
+    if not name:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        libc.inotify_init1 # raises AttributeError without inotify
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class Watcher(object):
+
+    """Reports changes below files and directory trees. Uses inotify where
+    the system has it and compares the file states at an interval
+    otherwise."""
+
+    def __init__(
+            self,
+            paths: List[Path],
+            ignore: Callable[[Path], bool] = None,
+            interval: float = None
+            ) -> None:
+        """Starts watching.
+
+        Args:
+            paths (list): Files and directories to watch, directories with
+                all their subdirectories.
+            ignore (callable): Called with every directory, its content isn't
+                watched if it returns True.
+            interval (float): Compare file states every interval seconds
+                instead of using inotify.
+
+        """
+        self._files = [Path(path).absolute() for path in paths
+                if not Path(path).is_dir()]
+        self._trees = [Path(path).absolute() for path in paths
+                if Path(path).is_dir()]
+        self._ignore = ignore if ignore else lambda path: False
+        self._interval = interval
+        self._libc = None if interval else _libc()
+        self._fd = -1
+
+        # watch descriptor -> directory and if it is watched recursively
+        self._watches: Dict[int, Tuple[Path, bool]] = dict()
+        self._states: Dict[str, Tuple[int, int]] = dict()
+
+        if self._libc:
+            self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if self._fd < 0:
+                self._libc = None
+
+        if self._libc:
+            for path in self._files:
+                self._add_watch(path.parent, recursive=False)
+            for path in self._trees:
+                self._add_tree(path)
+        else:
+            self._interval = interval or 1.0
+            self._states = self._scan()
+
+    @property
+    def uses_inotify(self) -> bool:
+        """True if changes are reported by inotify."""
+        return self._libc is not None
+
+    def _add_watch(self, path: Path, recursive: bool) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(path)),
+                _MASK)
+        if wd >= 0:
+            self._watches[wd] = (path, recursive)
+
+    def _add_tree(self, root: Path) -> None:
+        """Watches a directory and all its subdirectories."""
+        for dirpath, dirnames, _ in os.walk(str(root)):
+            dirnames[:] = [name for name in dirnames
+                    if not self._ignore(Path(dirpath) / name)]
+            self._add_watch(Path(dirpath), recursive=True)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Collects the states of all watched files.
+
+        Returns:
+            dict: Modification time and size by path.
+
+        """
+        states: Dict[str, Tuple[int, int]] = dict()
+        for path in self._files:
+            try:
+                stat = os.stat(str(path))
+                states[str(path)] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+
+        for root in self._trees:
+            for dirpath, dirnames, filenames in os.walk(str(root)):
+                dirnames[:] = [name for name in dirnames
+                        if not self._ignore(Path(dirpath) / name)]
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.lstat(path)
+                    except OSError:
+                        continue
+                    states[path] = (stat.st_mtime_ns, stat.st_size)
+        return states
+
+    def _poll(self) -> Set[str]:
+        """Compares the current file states with the last ones."""
+        states = self._scan()
+        changed = {path for path in set(states) | set(self._states)
+                if states.get(path) != self._states.get(path)}
+        self._states = states
+        return changed
+
+    def _read(self) -> Set[str]:
+        """Reads all pending inotify events.
+
+        Returns:
+            set: Paths of the changed files and directories.
+
+        """
+        changed: Set[str] = set()
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT.size:
+                offset + _EVENT.size + length].rstrip(b"\0"))
+            offset += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, everything may have changed
+                changed.update(str(path) for path in self._files + self._trees)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if wd not in self._watches:
+                continue
+
+            directory, recursive = self._watches[wd]
+            path = directory / name if name else directory
+            if not recursive and path not in self._files:
+                continue
+            if recursive and self._ignore(path):
+                continue
+
+            changed.add(str(path))
+            if recursive and mask & IN_ISDIR and mask & (IN_CREATE
+                    | IN_MOVED_TO):
+                self._add_tree(path)
+                # files created before the watch existed
+                for dirpath, _, filenames in os.walk(str(path)):
+                    changed.update(os.path.join(dirpath, filename)
+                            for filename in filenames)
+        return changed
+
+    def wait(self, timeout: float = None, settle: float = 0.2) -> List[str]:
+        """Waits for changes. Changes that follow each other closely, like
+        the files of a saved editor session, are reported together.
+
+        Args:
+            timeout (float): Maximum time to wait in seconds, forever if
+                None.
+            settle (float): Time without changes after the last change.
+
+        Returns:
+            list: Sorted paths of all changed files and directories, empty
+                after the timeout.
+
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed: Set[str] = set()
+
+        while True:
+            if changed:
+                wait = settle
+            elif deadline is None:
+                wait = None
+            else:
+                wait = max(0, deadline - time.monotonic())
+
+            if self._libc:
+                ready, _, _ = select.select([self._fd], [], [], wait)
+                new = self._read() if ready else set()
+            else:
+                time.sleep(min(self._interval, wait) if wait is not None
+                        else self._interval)
+                new = self._poll()
+
+            if new:
+                changed.update(new)
+            elif changed:
+                return sorted(changed)
+            elif deadline is not None and time.monotonic() >= deadline:
+                return list()
+
+    def close(self) -> None:
+        """Stops watching."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
@@ -1,3 +1,4 @@
+import os
 import pytest
 
 minimal = """
@@ -71,3 +72,36 @@ def minimal_yaml():
 @pytest.fixture()
 def normal_yaml():
     return normal
+
+@pytest.fixture(autouse=True)
+def cache_home(tmpdir_factory, monkeypatch):
+    """Keeps the caches of the tests out of the home directory."""
+    cache = tmpdir_factory.mktemp("cache")
+    monkeypatch.setenv("PACKATEER_CACHE", str(cache))
+    return cache
+
+@pytest.fixture()
+def make_project(tmpdir, monkeypatch):
+    """Writes a project into the test directory and changes into it.
+
+    The returned function takes the content of metadata.yaml, the content of
+    files below the packages directory by path and the scripts of stub tools
+    by name. The stubs come first in the PATH, and $log is a file of their
+    own to record calls in, like fpm.log.
+    """
+    def make(metadata, files=None, tools=None):
+        tmpdir.join("metadata.yaml").write(metadata)
+        for path, content in (files or dict()).items():
+            tmpdir.join("packages", *path.split("/")).write(content,
+                    ensure=True)
+        for name, script in (tools or dict()).items():
+            tool = tmpdir.join("bin", name)
+            tool.write("#!/bin/sh\nlog={}\n{}".format(
+                tmpdir.join(name + ".log"), script), ensure=True)
+            tool.chmod(0o755)
+        if tools:
+            monkeypatch.setenv("PATH", "{}:{}".format(tmpdir.join("bin"),
+                os.environ["PATH"]))
+        monkeypatch.chdir(tmpdir)
+        return tmpdir
+    return make
@@ -0,0 +1,133 @@
+import subprocess
+import pytest
+from packateerlib import Dist, Metadata
+from packateerlib.affected import affected_pairs, changed_pairs
+
+@pytest.fixture()
+def conf(tmpdir, monkeypatch, normal_yaml):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(normal_yaml)
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    return m, [Dist(name, m) for name in m.dists]
+
+def pairs(conf, *paths):
+    m, dists = conf
+    return sorted((dist.name, pkgname) for dist, pkgname in
+            affected_pairs(m, dists, [m.pkgpath / path for path in paths]))
+
+def test_layer_affects_children(conf):
+    m, dists = conf
+    children = sorted((dist.name, "aptly") for dist in dists
+            if "debian" in dist.order)
+    assert children
+    assert pairs(conf, "aptly/files/debian/usr/bin/aptly") == children
+    assert pairs(conf, "aptly/metadata/debian/buildpkg") == children
+
+def test_alldists_affects_all(conf):
+    m, dists = conf
+    assert pairs(conf, "fpm/metadata/alldists/control.yaml") == sorted(
+            (dist.name, "fpm") for dist in dists)
+
+def test_output_ignored(conf):
+    assert pairs(conf, "fpm/workdir/ubuntu1604/usr",
+            "fpm/storage/ubuntu1604/x", "/elsewhere/file") == []
+
+def test_whole_tree(conf):
+    m, dists = conf
+    assert len(pairs(conf, ".")) == len(dists) * len(m.packages)
+
+project = """
+packages:
+    hello:
+        Version: 1.0
+    world:
+        Version: 1.0
+
+dists:
+    debian:
+        abstract: true
+    ubuntu1604:
+        parent: debian
+    ubuntu1804:
+        parent: debian
+    centos7: {}
+"""
+
+def git(tmpdir, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c",
+        "user.email=test@example.com"] + list(args), cwd=str(tmpdir),
+        check=True, stdout=subprocess.DEVNULL)
+
+@pytest.fixture()
+def repo(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(project)
+    for pkgname in ("hello", "world"):
+        tmpdir.join("packages", pkgname, "metadata", "alldists",
+                "buildpkg").write("#!/bin/sh\n", ensure=True)
+        tmpdir.join("packages", pkgname, "files", "debian",
+                "README").write("readme\n", ensure=True)
+    git(tmpdir, "init", "-q")
+    git(tmpdir, "add", ".")
+    git(tmpdir, "commit", "-q", "-m", "initial")
+
+    def changed():
+        m = Metadata(tmpdir.join("metadata.yaml"))
+        return sorted((dist.name, pkgname) for dist, pkgname in
+                changed_pairs(m, [Dist(name, m) for name in m.dists], "HEAD"))
+    return changed
+
+def test_nothing_changed(repo):
+    assert repo() == []
+
+def test_changed_layers(repo, tmpdir):
+    tmpdir.join("packages", "hello", "files", "debian", "README").write("new")
+    assert repo() == [("ubuntu1604", "hello"), ("ubuntu1804", "hello")]
+
+    # untracked files count as well
+    tmpdir.join("packages", "world", "metadata", "centos7",
+            "control.yaml").write("Section: net\n", ensure=True)
+    assert repo() == [("centos7", "world"), ("ubuntu1604", "hello"),
+            ("ubuntu1804", "hello")]
+
+    git(tmpdir, "add", ".")
+    git(tmpdir, "commit", "-q", "-m", "change")
+    assert repo() == []
+    tmpdir.join("packages", "world", "metadata", "alldists",
+            "buildpkg").remove()
+    assert repo() == [("centos7", "world"), ("ubuntu1604", "world"),
+            ("ubuntu1804", "world")]
+
+def test_moved_file(repo, tmpdir):
+    tmpdir.join("packages", "world", "files", "centos7").ensure(dir=True)
+    git(tmpdir, "mv", "packages/hello/files/debian/README",
+            "packages/world/files/centos7/README")
+    assert repo() == [("centos7", "world"), ("ubuntu1604", "hello"),
+            ("ubuntu1804", "hello")]
+
+def test_changed_metadata(repo, tmpdir):
+    metadata = tmpdir.join("metadata.yaml")
+    metadata.write(project.replace("    centos7: {}",
+        "    centos7:\n        packages:\n            world:\n"
+        "                Version: 2.0"))
+    assert repo() == [("centos7", "world")]
+
+    metadata.write(project.replace("        abstract: true",
+        "        abstract: true\n        compression: xz"))
+    assert repo() == [("ubuntu1604", "hello"), ("ubuntu1604", "world"),
+            ("ubuntu1804", "hello"), ("ubuntu1804", "world")]
+
+    metadata.write(project.replace("    hello:\n        Version: 1.0",
+        "    hello:\n        Version: 1.1"))
+    assert repo() == [("centos7", "hello"), ("ubuntu1604", "hello"),
+            ("ubuntu1804", "hello")]
+
+    metadata.write(project + "vars:\n    pkgversion: 2\n")
+    assert len(repo()) == 6
+
+def test_unknown_revision(tmpdir, monkeypatch, normal_yaml):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(normal_yaml)
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    with pytest.raises(ValueError):
+        changed_pairs(m, [], "HEAD")
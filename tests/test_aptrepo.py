@@ -0,0 +1,107 @@
+import gzip
+import pytest
+from packateerlib import AptRepoCreater, Builder, Dist, Metadata, RepoCreater
+import packateerlib.aptrepo
+
+project = """
+packages:
+    hello:
+        Version: 1.0
+        Architecture: all
+    world:
+        Version: 2.0
+        Architecture: amd64
+
+dists:
+    xenial:
+        distname: xenial
+        origin: Packateer
+        backend: native
+        repobackend: native
+"""
+
+@pytest.fixture()
+def repo(tmpdir, monkeypatch):
+    tmpdir.join("metadata.yaml").write(project)
+    for pkgname in ("hello", "world"):
+        tmpdir.join("packages", pkgname, "files", "alldists", "usr", "share",
+                pkgname).write(pkgname, ensure=True)
+    monkeypatch.chdir(tmpdir)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    dist = Dist("xenial", m)
+    Builder(m, [dist]).build()
+    repo = RepoCreater.for_dist(dist, m)
+    assert isinstance(repo, AptRepoCreater)
+    repo.build()
+    return tmpdir.join("repos", "xenial")
+
+def test_packages_index(repo):
+    distdir = repo.join("dists", "xenial")
+    amd64 = distdir.join("main", "binary-amd64", "Packages").read()
+    i386 = distdir.join("main", "binary-i386", "Packages").read()
+
+    assert "Package: hello\n" in amd64 and "Package: world\n" in amd64
+    assert "Package: hello\n" in i386 and "Package: world\n" not in i386
+    assert "Filename: pool/main/world_2.0-0_amd64.deb\n" in amd64
+    assert "Filename: pool/main/hello_1.0-0_all.deb\n" in i386
+    assert repo.join("pool", "main", "world_2.0-0_amd64.deb").exists()
+    assert gzip.decompress(distdir.join("main", "binary-amd64",
+        "Packages.gz").read_binary()).decode() == amd64
+
+def test_release(repo):
+    release = repo.join("dists", "xenial", "Release").read()
+    assert "Origin: Packateer\n" in release
+    assert "Codename: xenial\n" in release
+    assert " main/binary-amd64/Packages.xz\n" in release
+
+def test_unchanged_debs_not_reopened(repo, tmpdir, monkeypatch):
+    def read_control(path):
+        raise AssertionError("{} was read again".format(path))
+    monkeypatch.setattr(packateerlib.aptrepo, "read_control", read_control)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    RepoCreater.for_dist(Dist("xenial", m), m).build()
+
+def test_removed_deb(repo, tmpdir):
+    tmpdir.join("dists", "xenial", "world_2.0-0_amd64.deb").remove()
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    RepoCreater.for_dist(Dist("xenial", m), m).build()
+
+    amd64 = repo.join("dists", "xenial", "main", "binary-amd64", "Packages")
+    assert "Package: world\n" not in amd64.read()
+    assert not repo.join("pool", "main", "world_2.0-0_amd64.deb").exists()
+
+def build_arm64(tmpdir, architectures=""):
+    tmpdir.join("metadata.yaml").write(project.replace("amd64", "arm64") +
+            architectures)
+    tmpdir.join("packages", "world", "files", "alldists", "usr", "share",
+            "world").write("world", ensure=True)
+    m = Metadata(tmpdir.join("metadata.yaml"), packages="world")
+    dist = Dist("xenial", m)
+    Builder(m, [dist]).build()
+    RepoCreater.for_dist(dist, m).build()
+    return tmpdir.join("repos", "xenial", "dists", "xenial")
+
+def test_built_architectures_added(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    distdir = build_arm64(tmpdir)
+    assert "Package: world\n" in distdir.join("main", "binary-arm64",
+            "Packages").read()
+    assert "Architectures: i386 amd64 arm64\n" in distdir.join(
+            "Release").read()
+
+def test_other_architectures_skipped(tmpdir, monkeypatch, capsys):
+    monkeypatch.chdir(tmpdir)
+    distdir = build_arm64(tmpdir, "        architectures: [amd64]\n")
+    assert distdir.join("main", "binary-amd64", "Packages").read() == ""
+    assert "architecture arm64 is not one of amd64" in \
+            capsys.readouterr().err
+
+def test_stale_signature_removed(repo, tmpdir):
+    signature = repo.join("dists", "xenial", "InRelease")
+    signature.write("old signature")
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    RepoCreater.for_dist(Dist("xenial", m), m).build()
+    assert not signature.exists()
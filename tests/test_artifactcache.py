@@ -0,0 +1,122 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import pytest
+from packateerlib import Builder, Dist, Metadata, Package, PkgCreater
+from packateerlib.artifactcache import (ArtifactCache, ArtifactCacheError,
+        LocalStore)
+
+project = """
+vars:
+    counter: {counter}
+packages:
+    pkg:
+        Version: 1.0.0
+
+dists:
+    ubuntu1604:
+        distname: xenial
+        backend: native
+"""
+
+buildpkg = """#!/bin/sh
+echo built >> "$counter"
+"""
+
+@pytest.fixture()
+def server():
+    """HTTP store that keeps the package files in memory."""
+    files = dict()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in files:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(files[self.path])))
+            self.end_headers()
+            self.wfile.write(files[self.path])
+
+        def do_PUT(self):
+            length = int(self.headers["Content-Length"])
+            files[self.path] = self.rfile.read(length)
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}/cache".format(httpd.server_address[1]), files
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_local_lru(tmpdir):
+    store = LocalStore(Path(tmpdir / "store"), max_size=250)
+    artifact = Path(tmpdir / "pkg.deb")
+    for num, key in enumerate(("aa1", "bb2", "cc3")):
+        artifact.write_bytes(bytes(100))
+        store.put(key, artifact)
+        os.utime(str(store.path(key)), ns=(num, num))
+
+    # aa1 was evicted when cc3 was added
+    assert not store.path("aa1").exists()
+    # bb2 is used, so cc3 is the least recently used one now
+    assert store.get("bb2", Path(tmpdir / "got.deb"))
+    assert tmpdir.join("got.deb").read_binary() == bytes(100)
+    store.put("dd4", artifact)
+    assert store.path("bb2").exists() and not store.path("cc3").exists()
+    assert not store.get("aa1", Path(tmpdir / "got.deb"))
+
+def test_http_store(tmpdir, server):
+    url, files = server
+    cache = ArtifactCache(url)
+    artifact = Path(tmpdir / "pkg.deb")
+    assert not cache.get("abc", artifact)
+    assert tmpdir.listdir() == []
+
+    artifact.write_bytes(b"deb")
+    cache.put("abc", artifact)
+    assert files == {"/cache/abc": b"deb"}
+    assert cache.get("abc", Path(tmpdir / "got.deb"))
+    assert tmpdir.join("got.deb").read_binary() == b"deb"
+
+    with pytest.raises(ArtifactCacheError):
+        ArtifactCache("http://127.0.0.1:1/cache").get("abc", artifact)
+
+def build(root, cache):
+    root.join("metadata.yaml").write(project.format(
+        counter=root.dirpath("counter")), ensure=True)
+    root.join("packages", "pkg", "files", "alldists", "usr", "share",
+            "pkg").write("content", ensure=True)
+    root.join("packages", "pkg", "metadata", "alldists",
+            "buildpkg").write(buildpkg, ensure=True)
+    os.chdir(str(root))
+    m = Metadata(root.join("metadata.yaml"))
+    Builder(m, [Dist(name, m) for name in m.dists], cache=cache).build()
+    return root.join(str(PkgCreater.for_package(Package("pkg",
+        Dist("ubuntu1604", m), m)).artifact))
+
+@pytest.mark.parametrize("store", ["directory", "http"])
+def test_builds_share_cache(tmpdir, monkeypatch, server, capsys, store):
+    monkeypatch.chdir(tmpdir)
+    location = str(tmpdir / "store") if store == "directory" else server[0]
+
+    # two checkouts of the same project
+    first = build(tmpdir / "one", ArtifactCache(location))
+    second = build(tmpdir / "two", ArtifactCache(location))
+
+    assert tmpdir.join("counter").read() == "built\n"
+    assert first.read_binary() == second.read_binary()
+    assert "Cached: ubuntu1604/pkg" in capsys.readouterr().out
+
+def test_unreachable_cache(tmpdir, monkeypatch, capsys):
+    monkeypatch.chdir(tmpdir)
+    artifact = build(tmpdir / "one", ArtifactCache("http://127.0.0.1:1/"))
+    assert artifact.check(file=True)
+    assert "Can't read the artifact cache" in capsys.readouterr().err
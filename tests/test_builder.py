@@ -0,0 +1,169 @@
+import pytest
+from packateerlib import Builder, BuildError, Dist, Metadata
+
+project = """
+packages:
+    good:
+        Version: 1.0.0
+    bad:
+        Version: 1.0.0
+
+dists:
+    ubuntu1604:
+        distname: xenial
+    ubuntu1804:
+        distname: bionic
+"""
+
+# stub fpm that records its arguments and creates an empty package
+fpm_stub = """echo "$@" >> "$log"
+while [ $# -gt 0 ]; do
+    [ "$1" = "--package" ] && touch "$2"
+    shift
+done
+"""
+
+@pytest.fixture()
+def project_dir(make_project):
+    return make_project(project, {
+        "{}/metadata/alldists/buildpkg".format(pkgname):
+            "#!/bin/sh\necho building {}\nexit {}\n".format(pkgname, status)
+        for pkgname, status in (("good", 0), ("bad", 1))}, {'fpm': fpm_stub})
+
+def test_builder_collects_failures(project_dir):
+    m = Metadata(project_dir.join("metadata.yaml"))
+    dists = [Dist(name, m) for name in m.dists]
+    builder = Builder(m, dists, jobs=4)
+
+    with pytest.raises(BuildError) as e:
+        builder.build()
+
+    assert set(e.value.failures) == {("ubuntu1604", "bad"),
+            ("ubuntu1804", "bad")}
+    assert builder.failed(dists[0])
+    assert project_dir.join("fpm.log").exists()
+
+def test_builder_logs(project_dir):
+    m = Metadata(project_dir.join("metadata.yaml"), packages="good")
+    dists = [Dist(name, m) for name in m.dists]
+    Builder(m, dists, jobs=2).build()
+
+    # one dist shares the package file of the other one
+    logs = [project_dir.join("logs", name, "good.log") for name in m.dists]
+    logs = [log for log in logs if log.exists()]
+    assert len(logs) == 1
+    assert logs[0].read().startswith("building good")
+
+def test_builder_sequential(project_dir):
+    m = Metadata(project_dir.join("metadata.yaml"), packages="good good")
+    dists = [Dist(name, m) for name in m.dists]
+    builder = Builder(m, dists)
+    builder.build()
+
+    assert not builder.failures
+    assert not project_dir.join("logs").exists()
+
+def test_builder_shares_identical_builds(project_dir):
+    m = Metadata(project_dir.join("metadata.yaml"), packages="good")
+    dists = [Dist(name, m) for name in m.dists]
+    Builder(m, dists).build()
+
+    assert len(project_dir.join("fpm.log").readlines()) == 1
+    debs = [project_dir.join("dists", name).listdir(lambda p: p.ext == ".deb")
+            for name in m.dists]
+    assert debs[0][0].basename == debs[1][0].basename
+    assert debs[0][0].stat().ino == debs[1][0].stat().ino
+
+    # both dists are up to date on the next run
+    Builder(m, dists).build()
+    assert len(project_dir.join("fpm.log").readlines()) == 1
+
+    # a change in only one dist builds both dists on their own
+    project_dir.join("packages", "good", "files", "ubuntu1804", "extra") \
+            .write("extra", ensure=True)
+    Builder(m, dists).build()
+    assert len(project_dir.join("fpm.log").readlines()) == 2
+    debs = [project_dir.join("dists", name).listdir(lambda p: p.ext == ".deb")
+            for name in m.dists]
+    assert debs[0][0].stat().ino != debs[1][0].stat().ino
+
+def test_builder_skips_unchanged(project_dir):
+    m = Metadata(project_dir.join("metadata.yaml"), "ubuntu1604", "good")
+    dists = [Dist(name, m) for name in m.dists]
+    Builder(m, dists).build()
+    Builder(m, dists).build()
+    assert len(project_dir.join("fpm.log").readlines()) == 1
+
+    Builder(m, dists, force=True).build()
+    assert len(project_dir.join("fpm.log").readlines()) == 2
+
+def test_builder_rebuilds_changed(project_dir):
+    m = Metadata(project_dir.join("metadata.yaml"), "ubuntu1604", "good")
+    dists = [Dist(name, m) for name in m.dists]
+    Builder(m, dists).build()
+
+    project_dir.join("packages", "good", "metadata", "ubuntu1604",
+            "control.yaml").write("Depends: bar", ensure=True)
+    Builder(m, dists).build()
+    assert len(project_dir.join("fpm.log").readlines()) == 2
+
+    # a modified package file is rebuilt as well
+    project_dir.join("dists", "ubuntu1604").listdir(
+            lambda p: p.ext == ".deb")[0].write("tampered")
+    Builder(m, dists).build()
+    assert len(project_dir.join("fpm.log").readlines()) == 3
+
+ordered_project = """
+packages:
+    app:
+        Depends: libfoo (>= 1.0)
+    libfoo:
+        Provides: libfoo-api
+    plugin:
+        build-depends: libfoo-api
+    broken:
+        Version: 1.0.0
+    user:
+        Depends: broken
+    ping:
+        Depends: pong
+    pong:
+        Depends: ping
+
+dists:
+    ubuntu1604:
+        distname: xenial
+"""
+
+@pytest.fixture()
+def ordered_dir(project_dir):
+    project_dir.join("metadata.yaml").write(ordered_project)
+    for pkgname in ("app", "libfoo", "plugin", "user", "ping", "pong",
+            "broken"):
+        project_dir.join("packages", pkgname, "metadata", "alldists",
+                "buildpkg").write("#!/bin/sh\nsleep 0.{}\necho {} >> {}\n"
+                    "exit {}\n".format(2 if pkgname == "libfoo" else 0,
+                        pkgname, project_dir.join("order"),
+                        int(pkgname == "broken")), ensure=True)
+    return project_dir
+
+def test_builder_dependency_order(ordered_dir):
+    m = Metadata(ordered_dir.join("metadata.yaml"))
+    dists = [Dist(name, m) for name in m.dists]
+    builder = Builder(m, dists, jobs=4)
+
+    with pytest.raises(BuildError) as e:
+        builder.build()
+
+    order = ordered_dir.join("order").read().split()
+    assert order.index("libfoo") < order.index("app")
+    assert order.index("libfoo") < order.index("plugin")
+
+    # only the dependents of the failed package and the cycle are skipped
+    assert set(e.value.failures) == {("ubuntu1604", name)
+            for name in ("broken", "user", "ping", "pong")}
+    assert e.value.failures[("ubuntu1604", "user")] == \
+            "Dependency failed: ubuntu1604/broken"
+    assert e.value.failures[("ubuntu1604", "ping")].startswith(
+            "Dependency cycle: ")
+    assert not {"user", "ping", "pong"} & set(order)
@@ -0,0 +1,118 @@
+import subprocess
+import sys
+from pathlib import Path
+from packateerlib import Metadata
+from packateerlib.checker import Checker
+
+packateer = str(Path(__file__).absolute().parent.parent / "packateer")
+
+project = """
+packages:
+    good:
+        Version: 1.0
+    noversion: {}
+    badcontrol:
+        Version: 1.0
+    noshebang:
+        Version: 1.0
+    badsources:
+        Version: 1.0
+        vars:
+            sources:
+                - url: http://example.com/a.tar.gz
+
+dists:
+    debian:
+        abstract: true
+        backend: native
+        repobackend: native
+    ubuntu1604:
+        parent: debian
+    ubuntu1804:
+        parent: debian
+    centos7:
+        pkgformat: rpm
+        backend: fpm
+    weird:
+        backend: docker
+        repobackend: native
+"""
+
+def write_project(tmpdir, content=project):
+    tmpdir.join("metadata.yaml").write(content)
+    tmpdir.join("packages", "badcontrol", "metadata", "debian",
+            "control.yaml").write("- no\n- mapping\n", ensure=True)
+    tmpdir.join("packages", "noshebang", "metadata", "alldists",
+            "buildpkg").write("echo missing interpreter\n", ensure=True)
+    tmpdir.join("packages", "good", "metadata", "alldists",
+            "buildpkg").write("#!/bin/sh\n", ensure=True)
+    for pkgname in ("noversion", "badsources"):
+        tmpdir.join("packages", pkgname).ensure(dir=True)
+    return str(tmpdir.join("metadata.yaml"))
+
+def test_all_problems_reported(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    monkeypatch.setenv("PATH", str(tmpdir.join("bin").ensure(dir=True)))
+    m = Metadata(write_project(tmpdir), "ubuntu1604 ubuntu1804 centos7 weird "
+            "missing")
+    problems = Checker(m).check()
+
+    control = str(tmpdir.join("packages", "badcontrol", "metadata", "debian",
+        "control.yaml"))
+    buildpkg = str(tmpdir.join("packages", "noshebang", "metadata",
+        "alldists", "buildpkg"))
+    assert set(problems) == {
+            "missing: unknown dist",
+            "centos7: 'fpm' is not installed",
+            "ubuntu1604/noversion: no Version",
+            "ubuntu1804/noversion: no Version",
+            "centos7/noversion: no Version",
+            "weird/noversion: Unknown package backend: docker",
+            "ubuntu1604/badsources: Source without url or sha256: "
+                "{'url': 'http://example.com/a.tar.gz'}",
+            "ubuntu1804/badsources: Source without url or sha256: "
+                "{'url': 'http://example.com/a.tar.gz'}",
+            "centos7/badsources: Source without url or sha256: "
+                "{'url': 'http://example.com/a.tar.gz'}",
+            "weird/badsources: Source without url or sha256: "
+                "{'url': 'http://example.com/a.tar.gz'}",
+            "weird/good: Unknown package backend: docker",
+            "weird/badcontrol: Unknown package backend: docker",
+            "weird/noshebang: Unknown package backend: docker",
+            control + ": contains no key-value data",
+            buildpkg + ": no #! line",
+            }
+    # every file is reported once
+    assert len(problems) == len(set(problems))
+
+def test_unknown_parent(tmpdir):
+    m = Metadata(write_project(tmpdir, "dists:\n    a:\n        parent: b\n"))
+    assert Checker(m).check()[0] == "Unknown parent of dist a: b"
+
+def test_good_project(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    m = Metadata(write_project(tmpdir), "ubuntu1604", "good")
+    assert Checker(m).check() == list()
+    # nothing is written
+    assert sorted(tmpdir.listdir()) == [tmpdir.join("metadata.yaml"),
+            tmpdir.join("packages")]
+
+def test_build_checks_first(tmpdir):
+    path = write_project(tmpdir)
+    result = subprocess.run([sys.executable, packateer, "-m", path, "-d",
+        "ubuntu1604"], cwd=str(tmpdir), stderr=subprocess.PIPE,
+        universal_newlines=True)
+    assert result.returncode != 0
+    assert "4 problem(s) found" in result.stderr
+    assert "ubuntu1604/noversion: no Version" in result.stderr
+    assert not tmpdir.join("packages", "good", "workdir").exists()
+    assert not tmpdir.join("dists").exists()
+
+def test_undeclared_package(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    write_project(tmpdir)
+    tmpdir.join("packages", "undeclared", "metadata", "alldists",
+            "control.yaml").write("Version: 1.0\n", ensure=True)
+    m = Metadata(str(tmpdir.join("metadata.yaml")), "ubuntu1604",
+            "undeclared missing")
+    assert Checker(m).check() == ["missing: unknown package"]
@@ -0,0 +1,143 @@
+import shutil
+import subprocess
+import pytest
+from packateerlib import Builder, DebCreater, Dist, Metadata, Package, PkgCreater
+from packateerlib.deb import read_ar_members
+
+project = """
+packages:
+    hello:
+        Version: 2.0
+        Description: |
+            Says hello
+            Prints a greeting.
+
+            Nothing else.
+
+dists:
+    xenial:
+        backend: native
+        packages:
+            hello:
+                Breaks: goodbye
+    centos7:
+        pkgformat: rpm
+        backend: native
+"""
+
+@pytest.fixture()
+def project_dir(make_project):
+    tmpdir = make_project(project, {
+        "hello/metadata/alldists/control.yaml":
+            "Depends: libc6\nArchitecture: all\n",
+        "hello/metadata/alldists/conffiles": "etc/hello.conf\n",
+        "hello/metadata/alldists/postinst": "#!/bin/sh\n",
+        "hello/files/alldists/etc/hello.conf": "greeting=hi\n",
+        "hello/files/alldists/usr/bin/hello": "#!/bin/sh\necho hello\n",
+        })
+    tmpdir.join("packages", "hello", "files", "alldists", "usr", "bin",
+            "hello").chmod(0o755)
+    return tmpdir
+
+def build(project_dir):
+    m = Metadata(project_dir.join("metadata.yaml"), "xenial")
+    pkg = Package("hello", Dist("xenial", m), m)
+    pkgcreater = PkgCreater.for_package(pkg)
+    assert isinstance(pkgcreater, DebCreater)
+    pkg.build()
+    pkgcreater.build()
+    return pkgcreater.artifact
+
+def test_ar_layout(project_dir):
+    artifact = build(project_dir)
+    assert artifact.name == "hello_2.0-0_all.deb"
+
+    with open(artifact, 'rb') as stream:
+        members = [name for name, _ in read_ar_members(stream)]
+    assert members == ["debian-binary", "control.tar.gz", "data.tar.gz"]
+
+@pytest.mark.skipif(not shutil.which("dpkg-deb"), reason="needs dpkg-deb")
+def test_control(project_dir):
+    artifact = build(project_dir)
+
+    control = subprocess.run(["dpkg-deb", "--field", str(artifact)],
+            check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    assert "Package: hello\n" in control
+    assert "Version: 2.0-0\n" in control
+    assert "Depends: libc6\n" in control
+    assert "Breaks: goodbye\n" in control
+    # the same on every machine
+    assert "Maintainer: <packateer@localhost>\n" in control
+    assert "Description: Says hello\n Prints a greeting.\n .\n Nothing else.\n" \
+            in control
+
+    conffiles = subprocess.run(["dpkg-deb", "--info", str(artifact),
+        "conffiles"], check=True, stdout=subprocess.PIPE).stdout
+    assert conffiles == b"/etc/hello.conf\n"
+
+@pytest.mark.skipif(not shutil.which("dpkg-deb"), reason="needs dpkg-deb")
+def test_contents(project_dir):
+    artifact = build(project_dir)
+
+    contents = subprocess.run(["dpkg-deb", "--contents", str(artifact)],
+            check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    assert "-rwxr-xr-x root/root" in contents
+    assert "./usr/bin/hello" in contents
+    assert "./etc/hello.conf" in contents
+
+def test_rpm_unsupported(project_dir):
+    m = Metadata(project_dir.join("metadata.yaml"), "centos7")
+    pkg = Package("hello", Dist("centos7", m), m)
+    with pytest.raises(ValueError):
+        PkgCreater.for_package(pkg)
+
+def test_builder_native(project_dir):
+    m = Metadata(project_dir.join("metadata.yaml"), "xenial")
+    Builder(m, [Dist("xenial", m)]).build()
+    assert project_dir.join("dists", "xenial", "hello_2.0-0_all.deb").exists()
+
+@pytest.mark.parametrize("compression,member", [("none", "data.tar"),
+    ("gzip", "data.tar.gz"), ("xz", "data.tar.xz"), ("zstd", "data.tar.zst")])
+def test_compression(project_dir, compression, member):
+    if compression in ("xz", "zstd") and not shutil.which(compression):
+        pytest.skip("needs " + compression)
+    project_dir.join("metadata.yaml").write(project.replace(
+        "backend: native\n        packages:",
+        "backend: native\n        compression: {}\n        compression-level: 3"
+        "\n        compression-threads: 2\n        packages:"
+        .format(compression)))
+
+    artifact = build(project_dir)
+    with open(artifact, 'rb') as stream:
+        members = [name for name, _ in read_ar_members(stream)]
+    assert members == ["debian-binary", "control.tar.gz", member]
+
+    if shutil.which("dpkg-deb"):
+        contents = subprocess.run(["dpkg-deb", "--contents", str(artifact)],
+                check=True, stdout=subprocess.PIPE,
+                universal_newlines=True).stdout
+        assert "./usr/bin/hello" in contents
+
+def test_compression_fpm_arguments(project_dir):
+    project_dir.join("metadata.yaml").write(project.replace(
+        "pkgformat: rpm\n        backend: native",
+        "pkgformat: rpm\n        compression: xz\n        compression-level: 9"))
+    m = Metadata(project_dir.join("metadata.yaml"))
+
+    pkg = Package("hello", Dist("centos7", m), m)
+    args = PkgCreater.for_package(pkg).arguments
+    assert args[args.index("--rpm-compression") + 1] == "xzmt"
+    assert args[args.index("--rpm-compression-level") + 1] == "9"
+
+    # the vars of a package override the dist
+    pkg.vars['compression'] = "bzip2"
+    pkg.vars['compression-level'] = 1
+    args = PkgCreater(pkg).arguments
+    assert args[args.index("--rpm-compression") + 1] == "bzip2"
+    assert args[args.index("--rpm-compression-level") + 1] == "1"
+
+    # fpm can't compress rpm payloads with zstd
+    for compression in ("zstd", "lz4"):
+        pkg.vars['compression'] = compression
+        with pytest.raises(ValueError):
+            PkgCreater(pkg)
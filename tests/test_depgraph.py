@@ -0,0 +1,58 @@
+import pytest
+from packateerlib import Dist, Metadata
+from packateerlib.depgraph import DepGraph, parse_relations
+
+project = """
+packages:
+    app:
+        Depends: libfoo (>= 1.0), mail-transport-agent | sendmail
+    libfoo:
+        Version: 1.0.0
+    postfix:
+        Provides: mail-transport-agent
+    tool:
+        build-depends: [app]
+    ping:
+        Depends: pong
+    pong:
+        Depends: ping
+
+dists:
+    ubuntu1604:
+        distname: xenial
+    ubuntu1804:
+        distname: bionic
+"""
+
+@pytest.fixture()
+def graph(tmpdir):
+    tmpdir.join("metadata.yaml").write(project)
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    dists = [Dist(name, m) for name in m.dists]
+    pairs = [(dist, pkgname) for dist in dists for pkgname in m.packages]
+    return DepGraph(m, pairs), dists
+
+def names(nodes):
+    return sorted((dist.name, pkgname) for dist, pkgname in nodes)
+
+def test_parse_relations():
+    assert parse_relations("foo (>= 1.0), bar | baz:any [amd64]") == \
+            ["foo", "bar", "baz"]
+    assert parse_relations(["foo", "bar (<< 2)"]) == ["foo", "bar"]
+    assert parse_relations(None) == []
+
+def test_dependencies(graph):
+    graph, (xenial, bionic) = graph
+    assert names(graph.dependencies((xenial, "app"))) == [
+            ("ubuntu1604", "libfoo"), ("ubuntu1604", "postfix")]
+    assert names(graph.dependencies((bionic, "tool"))) == [
+            ("ubuntu1804", "app")]
+    assert names(graph.dependents((xenial, "libfoo"))) == [
+            ("ubuntu1604", "app")]
+
+def test_cycles(graph):
+    graph, _ = graph
+    cycles = [names(cycle) for cycle in graph.cycles()]
+    assert sorted(cycles) == [
+            [("ubuntu1604", "ping"), ("ubuntu1604", "pong")],
+            [("ubuntu1804", "ping"), ("ubuntu1804", "pong")]]
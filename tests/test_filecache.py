@@ -0,0 +1,105 @@
+import os
+import pytest
+from packateerlib import Metadata, Dist, Package
+from packateerlib.filecache import FileCache, parse_size
+
+def test_yaml_parsed_once(tmpdir):
+    control = tmpdir.join("control.yaml")
+    control.write("Depends: foo")
+
+    cache = FileCache()
+    assert cache.yaml(control) == {"Depends": "foo"}
+    assert cache.yaml(control) == {"Depends": "foo"}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_refresh_rereads_changed(tmpdir):
+    conffiles = tmpdir.join("conffiles")
+    conffiles.write("/etc/foo\n")
+
+    cache = FileCache()
+    assert cache.lines(conffiles) == ["/etc/foo"]
+
+    conffiles.write("/etc/foo\n/etc/bar\n")
+    os.utime(conffiles, ns=(0, 0))
+    cache.refresh()
+    assert cache.lines(conffiles) == ["/etc/foo", "/etc/bar"]
+    assert cache.misses == 2
+
+def test_missing_file(tmpdir):
+    cache = FileCache()
+    assert not cache.exists(tmpdir.join("missing"))
+    with pytest.raises(FileNotFoundError):
+        cache.yaml(tmpdir.join("missing"))
+
+def test_broken_yaml_cached(tmpdir):
+    control = tmpdir.join("control.yaml")
+    control.write("Depends: [foo")
+
+    cache = FileCache()
+    for _ in range(2):
+        with pytest.raises(Exception):
+            cache.yaml(control)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_shared_parent_parsed_once(tmpdir, monkeypatch, normal_yaml):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(normal_yaml)
+    tmpdir.join("packages", "test", "metadata", "debian",
+            "control.yaml").write("Depends: foo", ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    for distname in ("ubuntu1604", "ubuntu1804", "foodist"):
+        p = Package("test", Dist(distname, m), m)
+        assert p.metadata["Depends"] == "foo"
+
+    assert m.files.misses == 1
+
+def test_package_index(tmpdir):
+    pkg = tmpdir.join("pkg")
+    pkg.join("metadata", "debian", "buildpkg").write("", ensure=True)
+    pkg.join("metadata", "alldists", "postinst").write("", ensure=True)
+    pkg.join("files", "debian", "etc").ensure(dir=True)
+
+    cache = FileCache()
+    index = cache.index(pkg)
+    assert cache.index(pkg) is index
+    assert index.meta_file("debian", "buildpkg") == pkg.join("metadata",
+            "debian", "buildpkg")
+    assert index.meta_file("debian", "postinst") is None
+    assert index.meta_file("missing", "buildpkg") is None
+    assert index.has_files("debian") and not index.has_files("alldists")
+
+    # new files and layers are found without a refresh
+    pkg.join("metadata", "debian", "postinst").write("")
+    assert cache.index(pkg).meta_file("debian", "postinst")
+    pkg.join("files", "alldists").ensure(dir=True)
+    assert cache.index(pkg).has_files("alldists")
+    pkg.join("metadata", "debian", "postinst").remove()
+    assert cache.index(pkg).meta_file("debian", "postinst") is None
+
+def test_package_lookups_without_stat(tmpdir, monkeypatch, normal_yaml):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(normal_yaml)
+    meta = tmpdir.join("packages", "test", "metadata")
+    meta.join("debian", "conffiles").write("/etc/foo\n", ensure=True)
+    meta.join("ubuntu1604", "postinst").write("", ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    p = Package("test", Dist("ubuntu1604", m), m)
+    p.conffiles
+
+    calls = list()
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda *args, **kwargs:
+            calls.append(args) or real_stat(*args, **kwargs))
+    assert p.meta_file("postinst") == meta.join("ubuntu1604", "postinst")
+    assert p.meta_file("prerm") is None
+    assert p.conffiles == ["/etc/foo"]
+    assert calls == []
+
+def test_parse_size():
+    assert parse_size("1024") == 1024
+    assert parse_size("512M") == 512 << 20
+    assert parse_size("1.5g") == 3 << 29
+    with pytest.raises(ValueError):
+        parse_size("big")
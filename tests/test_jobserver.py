@@ -0,0 +1,86 @@
+import os
+import shutil
+import threading
+import pytest
+from packateerlib import Builder, Dist, Metadata
+from packateerlib.jobserver import JobServer
+
+project = """
+vars:
+    running: {running}
+packages:
+    one:
+        Version: 1.0.0
+    two:
+        Version: 1.0.0
+
+dists:
+    ubuntu1604:
+        distname: xenial
+        backend: native
+"""
+
+# every target records how many targets of all packages run at the same time
+makefile = """
+all: t1 t2 t3 t4 t5 t6
+t%:
+\t@mkdir $(running)/$(Name)-$@
+\t@ls $(running) | wc -l >> $(running).count
+\t@sleep 0.2
+\t@rmdir $(running)/$(Name)-$@
+"""
+
+buildpkg = """#!/bin/sh
+pkgpath=$(dirname "$(dirname "$storage")")
+make -s -f "$pkgpath/Makefile" running="$running" Name="$(basename "$pkgpath")"
+"""
+
+def test_slots():
+    jobserver = JobServer(3)
+    try:
+        tokens = [jobserver.acquire() for _ in range(3)]
+        assert tokens == [False, True, True]
+
+        # a fourth slot is only free after one was released
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: (jobserver.acquire(),
+            acquired.set()))
+        thread.start()
+        assert not acquired.wait(0.1)
+        jobserver.release(tokens.pop())
+        assert acquired.wait(5)
+        thread.join()
+    finally:
+        jobserver.close()
+
+def test_environment():
+    jobserver = JobServer(4)
+    try:
+        flags = jobserver.environment("-k")['MAKEFLAGS']
+        assert flags.startswith("-k -j4 ")
+        assert "--jobserver-auth={},{}".format(*jobserver.fds) in flags
+    finally:
+        jobserver.close()
+
+@pytest.mark.skipif(not shutil.which("make"), reason="make is not installed")
+@pytest.mark.parametrize("packages,jobs", [("one two", 2), ("one", 3)])
+def test_make_shares_jobs(tmpdir, monkeypatch, packages, jobs):
+    monkeypatch.chdir(tmpdir)
+    running = tmpdir.join("running")
+    running.ensure(dir=True)
+    tmpdir.join("metadata.yaml").write(project.format(running=running))
+    for pkgname in ("one", "two"):
+        tmpdir.join("packages", pkgname, "Makefile").write(makefile,
+                ensure=True)
+        tmpdir.join("packages", pkgname, "metadata", "alldists",
+                "buildpkg").write(buildpkg, ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"), packages=packages)
+    Builder(m, [Dist(name, m) for name in m.dists], jobs=jobs).build()
+
+    counts = [int(line) for line in tmpdir.join("running.count").readlines()]
+    assert len(counts) == 6 * len(packages.split())
+    assert max(counts) <= jobs
+    if len(packages.split()) == 1:
+        # a single package gets all jobs
+        assert max(counts) > 1
@@ -0,0 +1,104 @@
+import pytest
+from packateerlib import Dist, Metadata, Package
+from packateerlib.layercache import LayerCache, layer_keys
+
+project = """
+vars:
+    counter: {counter}
+    layer-cache: true
+packages:
+    pkg:
+        Version: 1.0.0
+
+dists:
+    debian:
+        abstract: true
+        vars:
+            release: debian
+    ubuntu1604:
+        parent: debian
+    foodist:
+        parent: ubuntu1604
+        vars:
+            release: foo
+"""
+
+# every layer records that it ran and what it saw
+buildpkg = """#!/bin/sh
+echo {layer} >> "$counter"
+echo "$release" > "$workdir/{layer}"
+echo {layer} >> "$storage/layers"
+"""
+
+@pytest.fixture()
+def pkgs(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    monkeypatch.setenv("PACKATEER_CACHE", str(tmpdir.join("cache")))
+    tmpdir.join("metadata.yaml").write(project.format(
+        counter=tmpdir.join("counter")))
+    for layer in ("alldists", "ubuntu1604", "foodist"):
+        tmpdir.join("packages", "pkg", "metadata", layer, "buildpkg").write(
+                buildpkg.format(layer=layer), ensure=True)
+    tmpdir.join("packages", "pkg", "files", "foodist", "alldists").write(
+            "replaced", ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    return {name: Package("pkg", Dist(name, m), m)
+            for name in ("ubuntu1604", "foodist")}
+
+def test_keys_shared_with_parents(pkgs):
+    ubuntu = layer_keys(pkgs["ubuntu1604"])
+    foo = layer_keys(pkgs["foodist"])
+    assert [name for name, _ in foo] == ["alldists", "debian", "ubuntu1604",
+            "foodist"]
+    # foodist sees another release var, but not in the parent layers
+    assert foo[:3] == ubuntu
+
+def test_parent_layers_reused(pkgs, tmpdir):
+    pkgs["ubuntu1604"].build()
+    pkgs["foodist"].build()
+    assert tmpdir.join("counter").read().split() == ["alldists",
+            "ubuntu1604", "foodist"]
+
+    workdir = tmpdir.join("packages", "pkg", "workdir", "foodist")
+    assert workdir.join("ubuntu1604").read() == "debian\n"
+    assert workdir.join("foodist").read() == "foo\n"
+    # files of a layer replace the output of the scripts below
+    assert workdir.join("alldists").read() == "replaced"
+    # the storage of the skipped layers is restored as well
+    assert tmpdir.join("packages", "pkg", "storage", "foodist",
+            "layers").read().split() == ["alldists", "ubuntu1604", "foodist"]
+
+    pkgs["foodist"].build()
+    assert len(tmpdir.join("counter").read().split()) == 3
+
+def test_changed_layer_rebuilt(pkgs, tmpdir):
+    pkgs["foodist"].build()
+    tmpdir.join("packages", "pkg", "metadata", "ubuntu1604", "buildpkg") \
+            .write(buildpkg.format(layer="changed"))
+    pkgs["ubuntu1604"].build()
+    assert tmpdir.join("counter").read().split() == ["alldists",
+            "ubuntu1604", "foodist", "changed"]
+
+def test_eviction(tmpdir):
+    cache = LayerCache(tmpdir.join("cache"), max_size=150)
+    workdir = tmpdir.join("workdir")
+    workdir.join("file").write("x" * 100, ensure=True)
+    cache.store("aa1", {'workdir': workdir})
+    cache.store("bb2", {'workdir': workdir})
+    assert not cache.path("aa1").exists()
+    empty = tmpdir.join("empty").ensure(dir=True)
+    assert cache.restore("aa1", {'workdir': empty}) is None
+    assert cache.restore("bb2", {'workdir': empty}) == 100
+    assert empty.join("file").read() == "x" * 100
+
+def test_sources_in_keys(pkgs, tmpdir):
+    foo = layer_keys(pkgs["foodist"])
+    # the sources are declared in the top layer, but every layer sees them
+    tmpdir.join("metadata.yaml").write(project.format(
+        counter=tmpdir.join("counter")) +
+        "            sources:\n                - url: http://example.com/a\n"
+        "                  sha256: {}\n".format("0" * 64))
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    changed = layer_keys(Package("pkg", Dist("foodist", m), m))
+    assert all(old != new for old, new in zip(foo, changed))
@@ -1,4 +1,5 @@
 import pytest
+import packateerlib.metadata
 from packateerlib import Metadata
 
 
@@ -47,3 +48,45 @@ def test_normal_no_params(tmpdir, normal_yaml):
     m = Metadata(yaml)
     assert set(m.packages) == set(["aptly", "fpm", "emptypkg", "testpkg"])
     assert set(m.dists) == set(["ubuntu1604", "ubuntu1804", "foodist", "centos7"])
+
+def test_patterns(tmpdir, normal_yaml):
+    yaml = tmpdir.join("metadata.yaml")
+    yaml.write(normal_yaml)
+
+    m = Metadata(yaml, dists="ubuntu* deb* missing", packages="*pkg fpm")
+    # abstract dists are left out, unknown names kept for the checks
+    assert m.dists == ["ubuntu1604", "ubuntu1804", "missing"]
+    assert m.packages == ["testpkg", "emptypkg", "fpm"]
+
+def test_snapshot(tmpdir, monkeypatch, normal_yaml):
+    yaml = tmpdir.join("metadata.yaml")
+    yaml.write(normal_yaml)
+    data = Metadata(yaml).data
+
+    def load_yaml(stream):
+        raise AssertionError("metadata file was parsed again")
+    monkeypatch.setattr(packateerlib.metadata, "load_yaml", load_yaml)
+    assert Metadata(yaml).data == data
+
+def test_snapshot_changed_file(tmpdir, normal_yaml):
+    yaml = tmpdir.join("metadata.yaml")
+    yaml.write(normal_yaml)
+    Metadata(yaml)
+
+    yaml.write(normal_yaml + "\n    newdist: {}\n")
+    assert "newdist" in Metadata(yaml).dists
+
+def test_empty_entries(tmpdir):
+    yaml = tmpdir.join("metadata.yaml")
+    yaml.write("packages:\n    foo:\ndists:\n    bar:\n")
+
+    m = Metadata(yaml)
+    assert m.packages == ["foo"]
+    assert m.dists == ["bar"]
+
+def test_invalid_structure(tmpdir):
+    yaml = tmpdir.join("metadata.yaml")
+    yaml.write("dists:\n    - foo\n")
+
+    with pytest.raises(ValueError):
+        Metadata(yaml)
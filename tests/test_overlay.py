@@ -0,0 +1,74 @@
+import os
+import pytest
+from packateerlib import Dist, Metadata, Package
+from packateerlib.overlay import assemble, overlay
+
+@pytest.fixture()
+def layers(tmpdir):
+    base = tmpdir.join("alldists")
+    base.join("etc", "foo.conf").write("base", ensure=True)
+    base.join("usr", "bin", "foo").write("binary", ensure=True)
+    base.join("usr", "bin", "foo").chmod(0o755)
+    base.join("var", "empty").ensure(dir=True)
+
+    child = tmpdir.join("foodist")
+    child.join("etc", "foo.conf").write("child", ensure=True)
+    return [base, child]
+
+def test_overlay_top_layer_wins(layers, tmpdir):
+    files, dirs = overlay(layers + [tmpdir.join("missing")])
+    assert files["etc/foo.conf"] == layers[1].join("etc", "foo.conf")
+    assert files["usr/bin/foo"] == layers[0].join("usr", "bin", "foo")
+    assert set(dirs) == {"etc", "usr", "usr/bin", "var", "var/empty"}
+
+def test_assemble(layers, tmpdir):
+    target = tmpdir.join("workdir").ensure(dir=True)
+    copied = assemble(layers, target)
+
+    assert target.join("etc", "foo.conf").read() == "child"
+    assert target.join("var", "empty").isdir()
+    assert os.stat(target.join("usr", "bin", "foo")).st_mode & 0o777 == 0o755
+    assert os.stat(target.join("usr", "bin", "foo")).st_mtime == \
+            os.stat(layers[0].join("usr", "bin", "foo")).st_mtime
+    assert copied == len("child") + len("binary")
+
+def test_assemble_hardlinks(layers, tmpdir):
+    target = tmpdir.join("workdir").ensure(dir=True)
+    assert assemble(layers, target, hardlink=True) == 0
+    assert os.path.samefile(target.join("etc", "foo.conf"),
+            layers[1].join("etc", "foo.conf"))
+
+def test_repeated_builds(tmpdir, monkeypatch, normal_yaml):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(normal_yaml)
+    tmpdir.join("packages", "fpm", "files", "debian", "etc",
+            "fpm.conf").write("conf", ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    pkg = Package("fpm", Dist("ubuntu1804", m), m)
+    for _ in range(2):
+        pkg.build()
+        assert pkg.vars['workdir'].joinpath("etc", "fpm.conf").exists()
+
+@pytest.mark.parametrize("value, linked", [("true", True), ("'yes'", True),
+    ("'false'", False), ("no", False), ("'0'", False)])
+def test_hardlinks_var(tmpdir, monkeypatch, value, linked):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write("vars:\n    hardlinks: {}\n"
+            "packages:\n    pkg: {{}}\ndists:\n    foodist: {{}}\n"
+            .format(value))
+    source = tmpdir.join("packages", "pkg", "files", "alldists", "file")
+    source.write("content", ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    pkg = Package("pkg", Dist("foodist", m), m)
+    pkg.build()
+    assert os.path.samefile(str(pkg.vars['workdir'] / "file"),
+            str(source)) == linked
+
+def test_invalid_flag(tmpdir):
+    tmpdir.join("metadata.yaml").write("vars:\n    hardlinks: maybe\n"
+            "packages:\n    pkg: {}\ndists:\n    foodist: {}\n")
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    with pytest.raises(ValueError):
+        Package("pkg", Dist("foodist", m), m).flag('hardlinks')
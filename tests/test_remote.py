@@ -0,0 +1,245 @@
+import io
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tarfile
+import time
+from pathlib import Path
+import pytest
+from packateerlib import Builder, Dist, Metadata, Package, PkgCreater
+from packateerlib.remote import (_FRAME, Coordinator, Worker, pack_tree,
+        parse_address, receive_message, send_message, unpack_tree)
+
+packateer = str(Path(__file__).absolute().parent.parent / "packateer")
+
+project = """
+vars:
+    marker: {marker}
+packages:
+    one:
+        Version: 1.0.0
+    two:
+        Version: 1.0.0
+    three:
+        Version: 1.0.0
+
+dists:
+    ubuntu1604:
+        distname: xenial
+        backend: native
+"""
+
+# the first worker that builds it dies while building
+buildpkg = """#!/bin/sh
+if [ ! -e "$marker" ]; then
+    touch "$marker"
+    kill -9 $PPID
+    sleep 10
+fi
+echo built > "$storage/built"
+"""
+
+def test_messages():
+    left, right = socket.socketpair()
+    with left, right:
+        payload = io.BytesIO()
+        send_message(left, {'type': "job", 'number': 1},
+                io.BytesIO(b"\0" * 100000))
+        send_message(left, {'type': "empty"})
+        assert receive_message(right, payload) == {'type': "job", 'number': 1}
+        assert payload.getvalue() == b"\0" * 100000
+        assert receive_message(right) == {'type': "empty"}
+
+        left.close()
+        with pytest.raises(ConnectionError):
+            receive_message(right)
+
+def test_message_limits():
+    left, right = socket.socketpair()
+    with left, right:
+        # the announced sizes are refused before anything is allocated
+        left.sendall(_FRAME.pack(1 << 31, 0))
+        with pytest.raises(ValueError):
+            receive_message(right, max_header=4096)
+        left.sendall(_FRAME.pack(2, 1 << 33))
+        with pytest.raises(ValueError):
+            receive_message(right)
+
+def test_parse_address():
+    assert parse_address("build1:7000") == ("build1", 7000)
+    assert parse_address("build1") == ("build1", 7480)
+    assert parse_address("0.0.0.0:0") == ("0.0.0.0", 0)
+
+def test_pack_tree_skips_output(tmpdir):
+    tmpdir.join("one", "files", "alldists", "file").write("", ensure=True)
+    tmpdir.join("one", "workdir", "ubuntu1604", "file").write("", ensure=True)
+    stream = io.BytesIO()
+    pack_tree(Path(tmpdir) / "one", stream)
+    stream.seek(0)
+    with tarfile.open(fileobj=stream) as tar:
+        names = tar.getnames()
+    assert "files/alldists/file" in names
+    assert not any(name.startswith("workdir") for name in names)
+
+def tree(*members):
+    stream = io.BytesIO()
+    with tarfile.open(fileobj=stream, mode="w:gz") as tar:
+        for name, linkname in members:
+            info = tarfile.TarInfo(name)
+            if linkname is None:
+                tar.addfile(info, io.BytesIO())
+            else:
+                info.type = tarfile.SYMTYPE
+                info.linkname = linkname
+                tar.addfile(info)
+    return stream
+
+def test_unpack_tree(tmpdir):
+    target = tmpdir.join("pkg").ensure(dir=True)
+    unpack_tree(tree(("files/alldists/file", None),
+        ("files/alldists/lib", "/usr/lib")), Path(target))
+    assert target.join("files", "alldists", "file").check(file=True)
+    assert target.join("files", "alldists", "lib").readlink() == "/usr/lib"
+
+    for members in ([("../escaped", None)], [("/tmp/escaped", None)],
+            [("link", "/tmp"), ("link/escaped", None)]):
+        with pytest.raises(ValueError):
+            unpack_tree(tree(*members), Path(target))
+    assert not tmpdir.join("escaped").exists()
+
+def test_wrong_token(tmpdir):
+    tmpdir.join("metadata.yaml").write(project.format(marker="marker"))
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    coordinator = Coordinator(m, "127.0.0.1:0", "secret")
+    try:
+        with pytest.raises(PermissionError):
+            Worker("{}:{}".format(*coordinator.address), "guess").run()
+        assert coordinator.workers == 0
+    finally:
+        coordinator.close()
+
+def artifact(m, pkgname):
+    return PkgCreater.for_package(Package(pkgname, Dist("ubuntu1604", m),
+        m)).artifact
+
+@pytest.mark.skipif(not shutil.which("dpkg-deb"), reason="needs dpkg-deb")
+def test_workers_build(tmpdir, monkeypatch, cache_home):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(project.format(
+        marker=tmpdir.join("marker")))
+    for pkgname in ("one", "two", "three"):
+        tmpdir.join("packages", pkgname, "files", "alldists", "usr", "share",
+                pkgname).write(pkgname, ensure=True)
+    tmpdir.join("packages", "two", "metadata", "alldists",
+            "buildpkg").write(buildpkg, ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    dists = [Dist(name, m) for name in m.dists]
+    coordinator = Coordinator(m, "127.0.0.1:0")
+    address = "{}:{}".format(*coordinator.address)
+    workers = [subprocess.Popen([sys.executable, packateer, "worker",
+        "--connect", address, "--token", coordinator.token], cwd=str(tmpdir),
+        stdout=subprocess.DEVNULL) for _ in range(2)]
+    try:
+        Builder(m, dists, jobs=3, remote=coordinator).build()
+    finally:
+        coordinator.close()
+        for worker in workers:
+            worker.wait(10)
+
+    # one worker was lost, the other one built its package
+    assert sorted(worker.returncode for worker in workers) == [-9, 0]
+    for pkgname in ("one", "two", "three"):
+        assert artifact(m, pkgname).is_file()
+    contents = subprocess.run(["dpkg-deb", "-c", str(artifact(m, "two"))],
+        stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    assert "./usr/share/two" in contents
+    # one metadata snapshot of the project and one per package, the retry
+    # of a package reuses it
+    assert len(cache_home.join("metadata").listdir()) == 4
+
+def test_worker_failure(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(project.format(
+        marker=tmpdir.join("marker")))
+    tmpdir.join("packages", "one", "metadata", "alldists",
+            "buildpkg").write("#!/bin/sh\nexit 3\n", ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"), packages="one")
+    coordinator = Coordinator(m, "127.0.0.1:0")
+    worker = subprocess.Popen([sys.executable, packateer, "worker",
+        "--connect", "{}:{}".format(*coordinator.address)], cwd=str(tmpdir),
+        stdout=subprocess.DEVNULL, env=dict(os.environ,
+            PACKATEER_TOKEN=coordinator.token))
+    try:
+        builder = Builder(m, [Dist(name, m) for name in m.dists],
+                remote=coordinator)
+        with pytest.raises(Exception):
+            builder.build()
+    finally:
+        coordinator.close()
+        worker.wait(10)
+    assert "exit status 3" in builder.failures[("ubuntu1604", "one")]
+
+def test_no_workers(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(project.format(
+        marker=tmpdir.join("marker")))
+    # every worker that builds it dies
+    tmpdir.join("packages", "two", "metadata", "alldists",
+            "buildpkg").write("#!/bin/sh\nkill -9 $PPID\nsleep 10\n",
+                    ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    dist = Dist("ubuntu1604", m)
+    coordinator = Coordinator(m, "127.0.0.1:0", timeout=0.5)
+    try:
+        # nobody connects
+        builder = Builder(m, [dist], pairs=[(dist, "one")],
+                remote=coordinator)
+        with pytest.raises(Exception):
+            builder.build()
+        assert "No worker" in builder.failures[("ubuntu1604", "one")]
+
+        # the only worker is lost, its job is not handed out again
+        worker = subprocess.Popen([sys.executable, packateer, "worker",
+            "--connect", "{}:{}".format(*coordinator.address), "--token",
+            coordinator.token], cwd=str(tmpdir), stdout=subprocess.DEVNULL)
+        while not coordinator.workers and worker.poll() is None:
+            time.sleep(0.1)
+        builder = Builder(m, [dist], pairs=[(dist, "two")],
+                remote=coordinator)
+        with pytest.raises(Exception):
+            builder.build()
+        assert worker.wait(10) == -9
+        assert "No worker" in builder.failures[("ubuntu1604", "two")]
+    finally:
+        coordinator.close()
+
+def test_worker_cleans_scratch(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(project.format(
+        marker=tmpdir.join("marker")).replace("vars:\n",
+            "vars:\n    scratch: {}\n    scratch-size: 1K\n".format(
+                tmpdir.join("scratch"))))
+    tmpdir.join("packages", "one", "files", "alldists", "usr", "share",
+            "one").write("one", ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"), packages="one")
+    coordinator = Coordinator(m, "127.0.0.1:0")
+    worker = subprocess.Popen([sys.executable, packateer, "worker",
+        "--connect", "{}:{}".format(*coordinator.address), "--token",
+        coordinator.token], cwd=str(tmpdir), stdout=subprocess.DEVNULL)
+    try:
+        Builder(m, [Dist(name, m) for name in m.dists],
+                remote=coordinator).build()
+    finally:
+        coordinator.close()
+        worker.wait(10)
+    assert artifact(m, "one").is_file()
+    # the workdir on the scratch root was deleted with the job
+    assert tmpdir.join("scratch").check(dir=True)
+    assert not [path for path in tmpdir.join("scratch").visit()
+            if not path.check(dir=True)]
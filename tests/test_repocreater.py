@@ -0,0 +1,83 @@
+import os
+import pytest
+from packateerlib import Builder, Dist, Metadata, RepoCreater
+
+project = """
+packages:
+    hello:
+        Version: 1.0
+    world:
+        Version: 2.0
+
+dists:
+    xenial:
+        distname: xenial
+        backend: native
+"""
+
+@pytest.fixture()
+def project_dir(make_project):
+    # stub reprepro that only records its commands
+    return make_project(project, {
+        "{}/metadata/alldists/buildpkg".format(pkgname):
+            '#!/bin/sh\necho {} > "$workdir/{}"\n'.format(pkgname, pkgname)
+        for pkgname in ("hello", "world")},
+        {'reprepro': 'shift 3\necho "$@" >> "$log"\n'})
+
+def publish(project_dir, force=False):
+    m = Metadata(project_dir.join("metadata.yaml"))
+    dist = Dist("xenial", m)
+    Builder(m, [dist]).build()
+    RepoCreater.for_dist(dist, m).build(force=force)
+
+    log = project_dir.join("reprepro.log")
+    commands = [line.split(" ")[0] + " " + " ".join(
+        os.path.basename(arg) for arg in line.split(" ")[2:])
+        for line in log.read().splitlines()] if log.exists() else []
+    if log.exists():
+        log.remove()
+    return commands
+
+def test_initial(project_dir):
+    assert publish(project_dir) == [
+            "includedeb hello_1.0-0_amd64.deb world_2.0-0_amd64.deb"]
+    assert project_dir.join("repos", "xenial", "conf",
+            "distributions").read().startswith("Origin: xenial\n")
+
+def test_unchanged(project_dir):
+    publish(project_dir)
+    assert publish(project_dir) == []
+
+def test_changed_and_removed(project_dir):
+    publish(project_dir)
+    project_dir.join("packages", "hello", "metadata", "alldists",
+            "buildpkg").write('#!/bin/sh\necho changed > "$workdir/hello"\n')
+    project_dir.join("metadata.yaml").write(
+            project.replace("    world:\n        Version: 2.0\n", ""))
+    project_dir.join("dists", "xenial", "world_2.0-0_amd64.deb").remove()
+
+    assert publish(project_dir) == ["remove hello world",
+            "includedeb hello_1.0-0_amd64.deb"]
+
+def test_changed_configuration(project_dir):
+    publish(project_dir)
+    project_dir.join("metadata.yaml").write(
+            project.replace("backend: native", "backend: native\n"
+                "        origin: Packateer"))
+    assert publish(project_dir) == [
+            "includedeb hello_1.0-0_amd64.deb world_2.0-0_amd64.deb"]
+
+def test_force(project_dir):
+    publish(project_dir)
+    assert len(publish(project_dir, force=True)) == 1
+
+def test_removed_architecture(project_dir):
+    publish(project_dir)
+    distpath = project_dir.join("dists", "xenial")
+    distpath.join("hello_1.0-0_amd64.deb").copy(
+            distpath.join("hello_1.0-0_i386.deb"))
+    assert publish(project_dir) == ["includedeb hello_1.0-0_i386.deb"]
+
+    distpath.join("hello_1.0-0_i386.deb").remove()
+    assert publish(project_dir) == ["remove hello",
+            "includedeb hello_1.0-0_amd64.deb"]
@@ -0,0 +1,80 @@
+import pytest
+from packateerlib import Dist, Metadata, Package
+from packateerlib.resolver import DistError
+
+def write_project(tmpdir, monkeypatch, data):
+    monkeypatch.chdir(tmpdir)
+    yaml = tmpdir.join("metadata.yaml")
+    yaml.write(data)
+    return Metadata(yaml)
+
+def test_orders_shared(tmpdir, monkeypatch, normal_yaml):
+    m = write_project(tmpdir, monkeypatch, normal_yaml)
+    assert m.resolver.order("foodist") == ["foodist", "ubuntu1604", "debian",
+            "alldists"]
+    assert m.resolver.order("ubuntu1804") == ["ubuntu1804", "debian",
+            "alldists"]
+    assert m.resolver.order("unknown") == ["unknown", "alldists"]
+
+def test_cycle(tmpdir, monkeypatch):
+    m = write_project(tmpdir, monkeypatch, """
+dists:
+    a:
+        parent: b
+    b:
+        parent: a
+""")
+    with pytest.raises(DistError):
+        Dist("a", m)
+
+def test_unknown_parent(tmpdir, monkeypatch):
+    m = write_project(tmpdir, monkeypatch, """
+dists:
+    a:
+        parent: missing
+""")
+    with pytest.raises(DistError):
+        m.resolver
+
+def test_package_layers(tmpdir, monkeypatch, normal_yaml):
+    m = write_project(tmpdir, monkeypatch, normal_yaml)
+    metadir = tmpdir.join("packages", "test", "metadata")
+    metadir.join("alldists", "control.yaml").write(
+            "Depends: metaa\nvars:\n    alldistsvar: all\n", ensure=True)
+    metadir.join("ubuntu1604", "control.yaml").write(
+            "Conflicts: bardist\nvars:\n    ubuntuvar: 1604var\n", ensure=True)
+    metadir.join("foodist", "control.yaml").write(
+            "Depends: foo\nvars:\n    alldistsvar: foo\n", ensure=True)
+
+    foodist = Package("test", Dist("foodist", m), m)
+    assert foodist.metadata['Depends'] == "foo"
+    assert foodist.metadata['Conflicts'] == "bardist"
+    assert foodist.metadata['Breaks'] == "breaker"
+    assert foodist.metadata['pkg-rev'] == 0
+    assert 'vars' not in foodist.metadata
+    assert foodist.vars['alldistsvar'] == "foo"
+    assert foodist.vars['metaubuntu'] == "erben"
+    assert foodist.vars['une'] == "does"
+    assert foodist.vars['pkgpath'] == "./packages/"
+
+    ubuntu = Package("test", Dist("ubuntu1604", m), m)
+    assert ubuntu.metadata['Depends'] == "metaa"
+    assert ubuntu.vars['alldistsvar'] == "all"
+    assert 'une' not in ubuntu.vars
+
+    centos = Package("test", Dist("centos7", m), m)
+    assert centos.vars['httpdusername'] == "apache"
+    assert 'Conflicts' not in centos.metadata
+
+def test_forget(tmpdir, monkeypatch, normal_yaml):
+    m = write_project(tmpdir, monkeypatch, normal_yaml)
+    order = m.resolver.order("ubuntu1604")
+    assert "Depends" not in m.resolver.package_metadata("fpm", order)
+
+    tmpdir.join("packages", "fpm", "metadata", "debian",
+            "control.yaml").write("Depends: ruby", ensure=True)
+    m.files.refresh()
+    assert "Depends" not in m.resolver.package_metadata("fpm", order)
+
+    m.resolver.forget("fpm")
+    assert m.resolver.package_metadata("fpm", order)["Depends"] == "ruby"
@@ -0,0 +1,184 @@
+import gzip
+import hashlib
+import struct
+import xml.etree.ElementTree as ET
+import pytest
+from packateerlib import Dist, Metadata, RepoCreater, RpmRepoCreater
+import packateerlib.rpmrepo
+from packateerlib.rpm import (HEADER_MAGIC, LEAD_MAGIC, RPM_I18NSTRING,
+        RPM_INT16, RPM_INT32, RPM_STRING, RPM_STRING_ARRAY, TAGS,
+        read_package)
+
+project = """
+packages:
+    hello:
+        Version: 1.0
+
+dists:
+    centos7:
+        pkgformat: rpm
+"""
+
+namespaces = {
+        'repo': "http://linux.duke.edu/metadata/repo",
+        'common': "http://linux.duke.edu/metadata/common",
+        'rpm': "http://linux.duke.edu/metadata/rpm",
+        'filelists': "http://linux.duke.edu/metadata/filelists",
+        }
+
+def header(entries):
+    """Creates a header structure from (tag, type, value) entries."""
+    index, store = b"", b""
+    for tag, kind, value in sorted(entries):
+        if kind in (RPM_INT16, RPM_INT32):
+            width = 2 if kind == RPM_INT16 else 4
+            store += bytes(-len(store) % width)
+            data = struct.pack(">{}{}".format(len(value),
+                "H" if kind == RPM_INT16 else "I"), *value)
+            count = len(value)
+        elif kind == RPM_STRING:
+            data, count = value.encode() + b"\0", 1
+        else:
+            data = b"".join(item.encode() + b"\0" for item in value)
+            count = len(value)
+        index += struct.pack(">iIiI", tag, kind, len(store), count)
+        store += data
+    return (HEADER_MAGIC + bytes(4) + struct.pack(">II", len(entries),
+        len(store)) + index + store)
+
+def write_rpm(path, name, version, requires=()):
+    """Writes an rpm file with a header like rpmbuild creates and a dummy
+    payload."""
+    main = header([
+        (TAGS['name'], RPM_STRING, name),
+        (TAGS['version'], RPM_STRING, version),
+        (TAGS['release'], RPM_STRING, "1"),
+        (TAGS['summary'], RPM_I18NSTRING, ["The {} tool".format(name)]),
+        (TAGS['description'], RPM_I18NSTRING, ["Says <{}>".format(name)]),
+        (TAGS['buildtime'], RPM_INT32, [1500000000]),
+        (TAGS['size'], RPM_INT32, [1234]),
+        (TAGS['license'], RPM_STRING, "MIT"),
+        (TAGS['arch'], RPM_STRING, "x86_64"),
+        (TAGS['dirnames'], RPM_STRING_ARRAY, ["/usr/bin/", "/usr/share/"]),
+        (TAGS['dirindexes'], RPM_INT32, [0, 1]),
+        (TAGS['basenames'], RPM_STRING_ARRAY, [name, name]),
+        (TAGS['filemodes'], RPM_INT16, [0o100755, 0o040755]),
+        (TAGS['fileflags'], RPM_INT32, [0, 0]),
+        (TAGS['providename'], RPM_STRING_ARRAY, [name]),
+        (TAGS['provideflags'], RPM_INT32, [8]),
+        (TAGS['provideversion'], RPM_STRING_ARRAY, [version + "-1"]),
+        (TAGS['requirename'], RPM_STRING_ARRAY,
+            ["rpmlib(CompressedFileNames)"] + [dep for dep, _ in requires]),
+        (TAGS['requireflags'], RPM_INT32,
+            [16777226] + [12 for _ in requires]),
+        (TAGS['requireversion'], RPM_STRING_ARRAY,
+            ["3.0.4-1"] + [ver for _, ver in requires]),
+        ])
+    signature = header([(1000, RPM_INT32, [len(main)])])
+    lead = LEAD_MAGIC + bytes([3, 0]) + bytes(90)
+    path.write_binary(lead + signature + bytes(-len(signature) % 8) + main
+            + gzip.compress(b"payload"), ensure=True)
+    return len(lead) + len(signature) + (-len(signature) % 8), len(main)
+
+def test_read_package(tmpdir):
+    rpm = tmpdir.join("hello-1.0-1.x86_64.rpm")
+    start, size = write_rpm(rpm, "hello", "1.0", [("world", "1:2.0")])
+    package = read_package(rpm)
+
+    assert (package['name'], package['version'], package['arch']) == \
+            ("hello", "1.0", "x86_64")
+    assert package['summary'] == "The hello tool"
+    assert package['header_range'] == [start, start + size]
+    assert package['sha256'] == hashlib.sha256(rpm.read_binary()).hexdigest()
+    assert package['files'] == [("/usr/bin/hello", "file"),
+            ("/usr/share/hello", "dir")]
+    assert package['requires'][1] == {'name': "world", 'flags': 12,
+            'version': "1:2.0"}
+
+@pytest.fixture()
+def repo(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(project)
+    write_rpm(tmpdir.join("dists", "centos7", "hello-1.0-1.x86_64.rpm"),
+            "hello", "1.0", [("world", "1:2.0")])
+    write_rpm(tmpdir.join("dists", "centos7", "world-2.0-1.x86_64.rpm"),
+            "world", "2.0")
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    return lambda: RepoCreater.for_dist(Dist("centos7", m), m)
+
+def read_data(repodir, kind):
+    repomd = ET.parse(str(repodir.join("repodata", "repomd.xml")))
+    data = repomd.find("repo:data[@type='{}']".format(kind), namespaces)
+    location = data.find("repo:location", namespaces).get("href")
+    content = repodir.join(location).read_binary()
+    assert hashlib.sha256(content).hexdigest() == \
+            data.find("repo:checksum", namespaces).text
+    return ET.fromstring(gzip.decompress(content))
+
+def test_repodata(repo, tmpdir):
+    creater = repo()
+    assert isinstance(creater, RpmRepoCreater)
+    creater.build()
+
+    repodir = tmpdir.join("repos", "centos7")
+    assert repodir.join("Packages", "hello-1.0-1.x86_64.rpm").exists()
+
+    primary = read_data(repodir, "primary")
+    assert primary.get("packages") == "2"
+    hello = primary.find("common:package", namespaces)
+    assert hello.find("common:name", namespaces).text == "hello"
+    assert hello.find("common:description", namespaces).text == "Says <hello>"
+    assert hello.find("common:location", namespaces).get("href") == \
+            "Packages/hello-1.0-1.x86_64.rpm"
+    requires = hello.findall("common:format/rpm:requires/rpm:entry",
+            namespaces)
+    # rpmlib dependencies are left out
+    assert [entry.attrib for entry in requires] == [{'name': "world",
+        'flags': "GE", 'epoch': "1", 'ver': "2.0"}]
+    assert [node.text for node in hello.findall("common:format/common:file",
+        namespaces)] == ["/usr/bin/hello"]
+
+    filelists = read_data(repodir, "filelists")
+    files = filelists.find("filelists:package", namespaces)
+    assert [(node.text, node.get("type")) for node in files.findall(
+        "filelists:file", namespaces)] == [("/usr/bin/hello", None),
+                ("/usr/share/hello", "dir")]
+
+def test_only_changed_rpms_read(repo, tmpdir, monkeypatch):
+    repo().build()
+    read = list()
+    original = packateerlib.rpmrepo.read_package
+    monkeypatch.setattr(packateerlib.rpmrepo, "read_package",
+            lambda path: read.append(path.name) or original(path))
+
+    write_rpm(tmpdir.join("dists", "centos7", "world-2.0-1.x86_64.rpm"),
+            "world", "2.1")
+    tmpdir.join("dists", "centos7", "hello-1.0-1.x86_64.rpm").remove()
+    repo().build()
+
+    assert read == ["world-2.0-1.x86_64.rpm"]
+    repodir = tmpdir.join("repos", "centos7")
+    assert [path.basename for path in repodir.join("Packages").listdir()] \
+            == ["world-2.0-1.x86_64.rpm"]
+    primary = read_data(repodir, "primary")
+    assert primary.get("packages") == "1"
+    assert len(repodir.join("repodata").listdir("*.xml.gz")) == 3
+
+def test_repobackend(tmpdir):
+    for backend, valid in (("native", True), ("reprepro", False)):
+        tmpdir.join("metadata.yaml").write(project +
+                "        repobackend: {}\n".format(backend))
+        m = Metadata(tmpdir.join("metadata.yaml"))
+        if valid:
+            assert isinstance(RepoCreater.for_dist(Dist("centos7", m), m),
+                    RpmRepoCreater)
+        else:
+            with pytest.raises(ValueError):
+                RepoCreater.for_dist(Dist("centos7", m), m)
+
+def test_signature_removed(repo, tmpdir):
+    signature = tmpdir.join("repos", "centos7", "repodata", "repomd.xml.asc")
+    signature.write("old signature", ensure=True)
+    repo().build()
+    assert not signature.exists()
@@ -0,0 +1,83 @@
+import os
+from pathlib import Path
+from packateerlib import Builder, Dist, Metadata, Package, PkgCreater
+from packateerlib.scratch import remove_later, scratch_dir, wait_removals
+
+project = """
+vars:
+    scratch: {scratch}
+    scratch-size: {size}
+packages:
+    pkg:
+        Version: 1.0.0
+
+dists:
+    ubuntu1604:
+        distname: xenial
+        backend: native
+"""
+
+def test_remove_later(tmpdir):
+    workdir = tmpdir.join("workdir")
+    workdir.join("usr", "file").write("", ensure=True)
+    tmpdir.join(".workdir.trash-old", "file").write("", ensure=True)
+
+    remove_later(Path(workdir))
+    # the path can be used again right away
+    workdir.ensure(dir=True)
+    wait_removals()
+    assert tmpdir.listdir() == [workdir]
+
+def test_remove_later_link(tmpdir):
+    target = tmpdir.join("scratch", "pkg")
+    target.join("file").write("", ensure=True)
+    workdir = tmpdir.join("workdir")
+    workdir.mksymlinkto(target)
+
+    remove_later(Path(workdir))
+    wait_removals()
+    assert not workdir.check(link=True) and not target.check()
+    assert tmpdir.join("scratch").listdir() == []
+
+def test_scratch_dir(tmpdir):
+    root = Path(tmpdir / "scratch")
+    one = scratch_dir(root, Path(tmpdir / "one" / "pkg"), "ubuntu1604", 0)
+    two = scratch_dir(root, Path(tmpdir / "two" / "pkg"), "ubuntu1604", 0)
+    assert one.parent.parent == root and one != two
+    assert scratch_dir(root, Path(tmpdir / "one" / "pkg"), "ubuntu1604",
+            1 << 60) is None
+
+def build(tmpdir, size, keep_workdirs=True):
+    tmpdir.join("metadata.yaml").write(project.format(
+        scratch=tmpdir.join("scratch"), size=size))
+    tmpdir.join("packages", "pkg", "files", "alldists", "usr", "share",
+            "pkg").write("content", ensure=True)
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    Builder(m, [Dist(name, m) for name in m.dists],
+            force=True, keep_workdirs=keep_workdirs).build()
+    wait_removals()
+    return Package("pkg", Dist("ubuntu1604", m), m)
+
+def test_workdir_on_scratch(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    for _ in range(2):
+        pkg = build(tmpdir, 0)
+        workdir = pkg.vars['workdir']
+        assert workdir.is_symlink()
+        target = Path(os.readlink(str(workdir)))
+        assert str(target).startswith(str(tmpdir.join("scratch")))
+        assert (workdir / "usr" / "share" / "pkg").read_text() == "content"
+        # the workdir of the first build is gone
+        assert len(os.listdir(str(target.parent))) == 1
+    assert PkgCreater.for_package(pkg).artifact.is_file()
+
+def test_scratch_full(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    workdir = build(tmpdir, "100000000T").vars['workdir']
+    assert workdir.is_dir() and not workdir.is_symlink()
+
+def test_workdir_removed(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    pkg = build(tmpdir, 0, keep_workdirs=False)
+    assert not os.path.lexists(str(pkg.vars['workdir']))
+    assert tmpdir.join("scratch").listdir()[0].listdir() == []
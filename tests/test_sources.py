@@ -0,0 +1,136 @@
+import hashlib
+import http.server
+import os
+import socket
+import threading
+import pytest
+from pathlib import Path
+from packateerlib import Builder, Dist, Metadata
+from packateerlib.sources import SourceCache, SourceError, check_sources
+
+content = b"source tarball\n"
+checksum = hashlib.sha256(content).hexdigest()
+
+project = """
+packages:
+    tool:
+        Version: 1.0.0
+        vars:
+            sources:
+                - url: {url}
+                  sha256: {sha256}
+                  name: tool.tar.gz
+
+dists:
+    ubuntu1604:
+        distname: xenial
+    ubuntu1804:
+        distname: bionic
+        packages:
+            tool:
+                Version: 1.0.1
+"""
+
+buildpkg = """#!/bin/sh
+cp "$sources/tool.tar.gz" "$workdir/"
+"""
+
+fpm_stub = """while [ $# -gt 0 ]; do
+    [ "$1" = "--package" ] && touch "$2"
+    shift
+done
+"""
+
+@pytest.fixture()
+def server(tmpdir):
+    """Local HTTP server that counts the requests per path."""
+    tmpdir.join("www", "tool.tar.gz").write_binary(content, ensure=True)
+    requests = list()
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=str(tmpdir.join("www")),
+                    **kwargs)
+
+        def do_GET(self):
+            requests.append(self.path)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(httpd.server_port), requests
+    httpd.shutdown()
+
+def test_fetch_file_url(tmpdir):
+    tmpdir.join("tool.tar.gz").write_binary(content)
+    cache = SourceCache(tmpdir / "cache")
+    path = cache.fetch(dict(url="file://" + str(tmpdir / "tool.tar.gz"),
+        sha256=checksum))
+
+    assert path == cache.path(checksum)
+    assert path.read_bytes() == content
+
+def test_fetch_checksum_mismatch(tmpdir):
+    tmpdir.join("tool.tar.gz").write_binary(b"tampered")
+    cache = SourceCache(tmpdir / "cache")
+    with pytest.raises(SourceError):
+        cache.fetch(dict(url="file://" + str(tmpdir / "tool.tar.gz"),
+            sha256=checksum))
+
+    assert not cache.path(checksum).exists()
+    assert os.listdir(str(cache.path(checksum).parent)) == []
+
+def test_prefetch_downloads_once(tmpdir, server):
+    url, requests = server
+    cache = SourceCache(tmpdir / "cache")
+    source = dict(url=url + "/tool.tar.gz", sha256=checksum)
+
+    assert cache.prefetch([source, dict(source), source]) == dict()
+    assert cache.prefetch([source]) == dict()
+    assert requests == ["/tool.tar.gz"]
+
+def test_prefetch_errors(tmpdir, server):
+    url, _ = server
+    cache = SourceCache(tmpdir / "cache")
+    errors = cache.prefetch([dict(url=url + "/missing.tar.gz",
+        sha256=checksum), dict(url=url + "/mirror.tar.gz", sha256=checksum)])
+
+    # one error for all urls of the checksum
+    assert list(errors) == [checksum]
+    assert "missing.tar.gz" in errors[checksum] or \
+            "mirror.tar.gz" in errors[checksum]
+
+def test_stalled_download(tmpdir):
+    with socket.socket() as stalled:
+        # accepts the connection, but never answers
+        stalled.bind(("127.0.0.1", 0))
+        stalled.listen()
+        cache = SourceCache(tmpdir / "cache", timeout=0.2)
+        with pytest.raises(SourceError):
+            cache.fetch(dict(url="http://127.0.0.1:{}/tool.tar.gz".format(
+                stalled.getsockname()[1]), sha256=checksum))
+
+def test_check_sources():
+    check_sources([dict(url="file:///a", sha256=checksum)])
+    with pytest.raises(SourceError):
+        check_sources([dict(url="file:///a")])
+    with pytest.raises(SourceError):
+        check_sources(dict(url="file:///a", sha256=checksum))
+
+def test_build_uses_shared_cache(tmpdir, make_project, server):
+    url, requests = server
+    make_project(project.format(url=url + "/tool.tar.gz", sha256=checksum),
+            {"tool/metadata/alldists/buildpkg": buildpkg}, {'fpm': fpm_stub})
+
+    meta = Metadata(str(tmpdir.join("metadata.yaml")))
+    dists = [Dist(name=distname, conf=meta) for distname in meta.dists]
+    Builder(conf=meta, dists=dists, jobs=2, keep_workdirs=True).build()
+
+    assert requests == ["/tool.tar.gz"]
+    for dist in ("ubuntu1604", "ubuntu1804"):
+        workdir = tmpdir.join("packages", "tool", "workdir", dist)
+        assert workdir.join("tool.tar.gz").read_binary() == content
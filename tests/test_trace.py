@@ -0,0 +1,76 @@
+import json
+import subprocess
+import sys
+import pytest
+from packateerlib import Builder, Dist, Metadata, trace
+
+project = """
+packages:
+    good:
+        Version: 1.0.0
+
+dists:
+    ubuntu1604:
+        distname: xenial
+        backend: native
+"""
+
+@pytest.fixture()
+def tracer():
+    tracer = trace.start()
+    yield tracer
+    trace.stop()
+
+def test_span_without_tracer():
+    with trace.span("step", "test") as current:
+        current['bytes'] += 1
+    assert trace.run(["true"], check=True).returncode == 0
+
+def test_span_records_children(tracer):
+    with trace.span("outer", "test", dist="d", package="p"):
+        with trace.span("inner", "test") as current:
+            trace.run([sys.executable, "-c",
+                "sum(range(3000000))"], check=True)
+            current['bytes'] += 10
+
+    inner, outer = tracer.spans
+    assert inner['name'] == "inner" and outer['name'] == "outer"
+    assert inner['cpu'] > 0 and outer['cpu'] == inner['cpu']
+    assert outer['bytes'] >= 10
+    assert outer['dur'] >= inner['dur']
+
+def test_run_check(tracer):
+    with trace.span("step", "test"):
+        with pytest.raises(subprocess.CalledProcessError):
+            trace.run(["false"], check=True)
+        assert trace.run(["false"]).returncode == 1
+
+def test_builder_trace(tmpdir, monkeypatch, tracer):
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join("metadata.yaml").write(project)
+    tmpdir.join("packages", "good", "files", "alldists", "data") \
+            .write("x" * 1000, ensure=True)
+    tmpdir.join("packages", "good", "metadata", "alldists", "buildpkg") \
+            .write("#!/bin/sh\necho built\n", ensure=True)
+
+    m = Metadata(tmpdir.join("metadata.yaml"))
+    Builder(m, [Dist(name, m) for name in m.dists]).build()
+
+    names = [span['name'] for span in tracer.spans]
+    for name in ("resolve", "fingerprint", "assemble", "buildpkg alldists",
+            "create", "package"):
+        assert name in names
+    assemble = tracer.spans[names.index("assemble")]
+    assert assemble['bytes'] == 1000
+    assert assemble['args'] == dict(dist="ubuntu1604", package="good")
+
+    tracer.write(str(tmpdir.join("trace.json")))
+    events = json.loads(tmpdir.join("trace.json").read())['traceEvents']
+    complete = [event for event in events if event['ph'] == "X"]
+    assert len(complete) == len(tracer.spans)
+    assert all(event['dur'] >= 0 and "cpu_children_ms" in event['args']
+            for event in complete)
+
+    summary = tracer.summary().splitlines()
+    assert summary[0].split()[0] == "step"
+    assert not any(line.startswith("package ") for line in summary)
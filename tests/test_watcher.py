@@ -0,0 +1,46 @@
+import threading
+import pytest
+from pathlib import Path
+from packateerlib.watcher import Watcher
+
+@pytest.fixture(params=["inotify", "polling"])
+def watcher(request, tmpdir):
+    tmpdir.join("metadata.yaml").write("packages:\n")
+    tmpdir.join("packages", "pkg", "files", "alldists").ensure(dir=True)
+    tmpdir.join("packages", "pkg", "workdir").ensure(dir=True)
+
+    watcher = Watcher([tmpdir.join("metadata.yaml"), tmpdir.join("packages")],
+            ignore=lambda path: path.name == "workdir",
+            interval=0.05 if request.param == "polling" else None)
+    if request.param == "inotify" and not watcher.uses_inotify:
+        pytest.skip("inotify is not available")
+    yield watcher
+    watcher.close()
+
+def change_later(action):
+    timer = threading.Timer(0.1, action)
+    timer.start()
+    return timer
+
+def test_file_change(watcher, tmpdir):
+    data = tmpdir.join("packages", "pkg", "files", "alldists", "data")
+    change_later(lambda: data.write("new"))
+    assert str(data) in watcher.wait(timeout=5)
+
+def test_new_directory(watcher, tmpdir):
+    layer = tmpdir.join("packages", "pkg", "files", "xenial")
+    change_later(lambda: layer.join("etc", "conf").write("x", ensure=True))
+    assert str(layer.join("etc", "conf")) in watcher.wait(timeout=5)
+
+    # files in the new directory are watched as well
+    change_later(lambda: layer.join("etc", "conf").write("y"))
+    assert str(layer.join("etc", "conf")) in watcher.wait(timeout=5)
+
+def test_metadata_file(watcher, tmpdir):
+    change_later(lambda: tmpdir.join("metadata.yaml").write("dists:\n"))
+    assert watcher.wait(timeout=5) == [str(tmpdir.join("metadata.yaml"))]
+
+def test_ignored_and_timeout(watcher, tmpdir):
+    tmpdir.join("other.txt").write("x")
+    tmpdir.join("packages", "pkg", "workdir", "out").write("x")
+    assert watcher.wait(timeout=0.3) == []